@@ -1,38 +1,135 @@
-from flask import Flask, render_template, request, jsonify, redirect, flash, url_for
-from werkzeug.utils import secure_filename
+from flask import Flask, Response, render_template, request, jsonify, redirect, flash, url_for, stream_with_context, send_file
 from datetime import datetime
 import json
 import os
 import subprocess
-from models.ai_agents import agente_avaliar_entrevista, agente_entrevistador, agente_triagem_cvs
-from utils.tts import speak
+from models.ai_agents import agente_avaliar_entrevista, agente_entrevistador, agente_entrevistador_stream, agente_triagem_cvs, prompt_entrevistador
+from models.sessao_entrevista import criar_sessao, registrar_resposta, registrar_pergunta, prompt_sessao, precisa_compactar, compactar
+from models.llm_cache import metricas_cache
+from models.orcamento_prompt import metricas_orcamento
+from models.saida_estruturada import ErroSaidaEstruturada, metricas_saida
+from models import prefetch_entrevista
+from models.embeddings import texto_vaga
+from models.vector_index import IndiceCandidatos
+from utils.tts import speak, obter_audio, ler_em_sequencia, audio_registrado, AudioIndisponivel
 from utils.stt import listen
+from utils.paginacao import Paginador
+from utils.cache_respostas import cache_resposta, invalidar, metricas_respostas
+from utils.extracao_pdf import extrair_texto_pdf, PDFInvalido, MAX_MB as PDF_MAX_MB
+from utils.uploads import ArmazenamentoUploads, registrar_upload, coletar_se_necessario
+from utils.fila import tarefa, tarefa_atual, ErroDefinitivo, enfileirar, obter_tarefa, metricas_fila, iniciar_workers, CONCLUIDA, ERRO
 from sqlalchemy.sql import exists
 
-from db.database import db, Job, Applicant, Prospect, InterviewRecord, MatchResult, TryItUser, HRInterview
-import fitz 
+from db.database import db, Job, Applicant, Prospect, InterviewRecord, MatchResult, TryItUser, HRInterview, ArquivoUpload, SessaoEntrevista, SITUACOES_FECHAMENTO
+from db.migrations import migrar
 
-def extract_text_from_pdf(filepath):
-    text = ""
-    try:
-        with fitz.open(filepath) as doc:
-            for page in doc:
-                text += page.get_text()
-    except Exception as e:
-        print(f"Erro ao extrair texto do PDF: {e}")
-    return text.strip()
+def montar_job_dict(job):
+    return {
+        "informacoes_basicas": {
+            "titulo_vaga": job.titulo,
+            "cliente": job.cliente,
+            "objetivo_vaga": job.objetivo_vaga,
+            "tipo_contratacao": job.tipo_contratacao,
+        },
+        "perfil_vaga": {
+            "nivel_profissional": job.nivel_profissional,
+            "nivel_academico": job.nivel_academico,
+            "nivel_ingles": job.nivel_ingles,
+            "nivel_espanhol": job.nivel_espanhol,
+            "principais_atividades": job.atividades,
+            "competencia_tecnicas_e_comportamentais": job.competencias,
+        }
+    }
+
+def montar_applicant_dict(applicant):
+    return {
+        "nome": applicant.nome,
+        "area_atuacao": getattr(applicant, "area_atuacao", ""),
+        "conhecimentos_tecnicos": getattr(applicant, "conhecimentos_tecnicos", ""),
+        "certificacoes": getattr(applicant, "certificacoes", ""),
+        "nivel_ingles": getattr(applicant, "nivel_ingles", ""),
+        "nivel_espanhol": getattr(applicant, "nivel_espanhol", ""),
+        "nivel_academico": getattr(applicant, "nivel_academico", ""),
+        "cv_pt": getattr(applicant, "cv_pt", getattr(applicant, "keywords", "")) 
+    }
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 basedir = os.path.abspath(os.path.dirname(__file__))
 db_path = os.path.join(basedir, "data", "appdata.db")
 app.config['UPLOAD_FOLDER'] = os.path.join(basedir, "uploads")
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+app.config['MAX_CONTENT_LENGTH'] = int(PDF_MAX_MB * 1024 * 1024)
+armazenamento_uploads = ArmazenamentoUploads(app.config['UPLOAD_FOLDER'])
+app.jinja_env.globals['prefetch_perguntas'] = prefetch_entrevista.ATIVO
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL", f"sqlite:///{db_path}")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
 with app.app_context():
     db.create_all()
+    migrar()
+
+#############################################
+######### TAREFAS EM SEGUNDO PLANO ##########
+#############################################
+
+@tarefa("triagem_tryit")
+def processar_triagem_tryit(payload):
+    """Extrai o texto do PDF enviado em /tryit/apply, faz a triagem e cria o TryItUser."""
+    with app.app_context():
+        job = Job.query.get(payload["job_id"])
+        if not job:
+            raise ValueError(f"Vaga {payload['job_id']} não encontrada")
+
+        # Retentativa de uma execução que já gravou o candidato (ex.: worker morto antes de concluir).
+        # Os IDs vêm de data/fila.db, que pode ser recriado: o arquivo e a vaga também precisam bater
+        tarefa_id = tarefa_atual()
+        entry = TryItUser.query.filter_by(
+            tarefa_id=tarefa_id, arquivo_sha256=payload["arquivo_sha256"], job_id=job.id
+        ).first() if tarefa_id else None
+        if entry:
+            return {"job_id": job.id, "user_id": entry.id}
+
+        # O texto fica no blob: o mesmo PDF enviado para outra vaga não é extraído de novo
+        blob = ArquivoUpload.query.get(payload["arquivo_sha256"])
+        if blob.texto is None:
+            try:
+                blob.texto = extrair_texto_pdf(armazenamento_uploads.caminho(blob.sha256))
+            except PDFInvalido as e:
+                # Arquivo acima dos limites ou ilegível: repetir só gastaria o orçamento de extração de novo
+                raise ErroDefinitivo(str(e)) from e
+            db.session.commit()
+
+        # Saída inválida mesmo após a correção levanta ErroSaidaEstruturada e a fila tenta de novo
+        parsed = agente_triagem_cvs(montar_job_dict(job), blob.texto)
+
+        entry = TryItUser(
+            nome=parsed.get("nome"),
+            job_id=job.id,
+            arquivo_sha256=blob.sha256,
+            score=parsed.get("score"),
+            keywords=parsed.get("keywords"),
+            tarefa_id=tarefa_id,
+        )
+        db.session.add(entry)
+        db.session.commit()
+
+        # A limpeza dos uploads não faz a triagem (já gravada) falhar nem ser repetida
+        try:
+            coletar_se_necessario(armazenamento_uploads)
+        except Exception as e:
+            print(f"⚠️ Falha na coleta dos uploads: {e}")
+        return {"job_id": job.id, "user_id": entry.id}
+
+@tarefa("compactar_sessao")
+def processar_compactacao_sessao(payload):
+    """Resume os turnos antigos de uma sessão de entrevista (models/sessao_entrevista.py)."""
+    with app.app_context():
+        return compactar(payload["sessao_id"])
+
+# As threads de worker embutidas não são iniciadas no import (benchmarks, scripts e o
+# processo pai do reloader também importam o app): quem serve o app as inicia, no
+# __main__ abaixo ou no hook post_worker_init de gunicorn.conf.py
 
 #############################################
 ############### ROTAS FUNÇÕES ###############
@@ -40,18 +137,51 @@ with app.app_context():
 
 @app.route("/speak", methods=["POST"])
 def speak_text():
+    """
+    Agenda a síntese das frases do texto e responde imediatamente.
+    `audio_url` é um único MP3 servido em streaming (começa a tocar quando a
+    primeira frase fica pronta); `playlist` traz as frases separadas.
+    """
     data = request.get_json()
     text = data.get("text", "")
     if text:
-        audio_path = speak(text)
-        return jsonify({"status": "ok", "audio_url": audio_path})
+        chaves = speak(text)
+        return jsonify({
+            "status": "ok",
+            "audio_url": url_for("speak_stream", chunks=",".join(chaves)),
+            "playlist": [url_for("speak_audio", chave=c) for c in chaves]
+        })
     return jsonify({"error": "Texto vazio"}), 400
 
+@app.route("/speak/audio/<chave>.mp3")
+def speak_audio(chave):
+    try:
+        caminho = obter_audio(chave)
+    except AudioIndisponivel as e:
+        return jsonify({"error": "Falha ao sintetizar o áudio", "details": str(e)}), 503
+    if not caminho:
+        return jsonify({"error": "Áudio não encontrado"}), 404
+    return send_file(caminho, mimetype="audio/mpeg", max_age=86400)
+
+@app.route("/speak/stream")
+def speak_stream():
+    chaves = [c for c in request.args.get("chunks", "").split(",") if c]
+    if not chaves:
+        return jsonify({"error": "Nenhum trecho informado"}), 400
+    if not all(audio_registrado(c) for c in chaves):
+        return jsonify({"error": "Áudio não encontrado"}), 404
+    # Os trechos ainda podem falhar no meio do stream (que então é interrompido):
+    # sem cache, para que um áudio incompleto não fique guardado no navegador ou em proxies
+    return Response(stream_with_context(ler_em_sequencia(chaves)), mimetype="audio/mpeg", headers={
+        "Cache-Control": "no-store"
+    })
+
 @app.route("/transcribe", methods=["POST"])
 def transcribe():
     """
     Endpoint simplificado para transcrição de áudio.
-    Recebe áudio WAV diretamente do cliente, sem necessidade de conversão com ffmpeg.
+    Recebe áudio WAV diretamente do cliente, sem necessidade de conversão com ffmpeg,
+    e o transcreve em memória.
     """
     try:
         # Verificar se o arquivo de áudio foi enviado
@@ -62,23 +192,10 @@ def transcribe():
         if file.filename == '':
             return jsonify({"error": "Nome de arquivo vazio"}), 400
             
-        # Garantir que os diretórios existam
-        os.makedirs("audio", exist_ok=True)
-        
-        # Definir caminho do arquivo
-        audio_path = os.path.join("audio", "user_input.wav")
-        
-        # Salvar o arquivo de áudio recebido
+        # Transcrever o áudio direto do stream da requisição, sem arquivo
+        # compartilhado em disco (requisições simultâneas não se sobrescrevem)
         try:
-            file.save(audio_path)
-            print(f"Arquivo de áudio salvo em: {audio_path}")
-        except Exception as e:
-            print(f"Erro ao salvar arquivo de áudio: {str(e)}")
-            return jsonify({"error": "Erro ao salvar arquivo de áudio", "details": str(e)}), 500
-        
-        # Transcrever o áudio
-        try:
-            text = listen(audio_path)
+            text = listen(file.stream)
             print("Transcrição concluída com sucesso")
             return jsonify({"text": text})
             
@@ -134,6 +251,7 @@ def resumo():
 
     db.session.add(record)
     db.session.commit()
+    invalidar("entrevistas")
 
     return jsonify({
         "summary": summary,
@@ -144,8 +262,24 @@ def resumo():
 ############### ROTAS API  ###############
 #############################################
 
+paginador_triagem = Paginador(
+    chave=MatchResult.id,
+    colunas={
+        "job_id": MatchResult.job_id,
+        "applicant_id": MatchResult.applicant_id,
+        "titulo": Job.titulo,
+        "nome": Applicant.nome,
+        "score": MatchResult.score,
+        "recrutador": Prospect.recrutador
+    },
+    busca=[Job.titulo, Applicant.nome, MatchResult.job_id, MatchResult.applicant_id],
+    filtros={"recrutador": Prospect.recrutador}
+)
+
 @app.route("/api/triagem", methods=["GET"])
+@cache_resposta("vagas", "candidatos", "prospects", "triagem", "entrevistas")
 def api_triagem():
+    """Paginável: ver utils/paginacao.py (DataTables com `draw`, keyset com `limite`/`apos`)."""
     recrutador = request.args.get("recrutador")
 
     query = db.session.query(
@@ -161,13 +295,7 @@ def api_triagem():
          Prospect.applicant_id == MatchResult.applicant_id,
          Prospect.job_id == MatchResult.job_id
      ))\
-     .filter(~Job.id.in_(
-         db.session.query(Prospect.job_id)
-         .filter(Prospect.situacao.in_([
-             "Contratado como Hunting",
-             "Contratado pela Decision"
-         ]))
-     ))\
+     .filter(Job.fechada.is_(False))\
      .filter(~exists().where(
          db.and_(
              InterviewRecord.job_id == MatchResult.job_id,
@@ -178,36 +306,35 @@ def api_triagem():
     if recrutador:
         query = query.filter(Prospect.recrutador == recrutador)
 
-    results = query.all()
-
-    data = [{
-        "job_id": r.job_id,
-        "applicant_id": r.applicant_id,
-        "titulo": r.titulo,
-        "nome": r.nome,
-        "score": r.score,
-        "recrutador": r.recrutador
-    } for r in results]
+    def serializar(r):
+        return {
+            "job_id": r.job_id,
+            "applicant_id": r.applicant_id,
+            "titulo": r.titulo,
+            "nome": r.nome,
+            "score": r.score,
+            "recrutador": r.recrutador
+        }
 
-    return jsonify(data)
+    return paginador_triagem.responder(query, request.args, serializar)
 
 
 @app.route("/api/recrutadores", methods=["GET"])
+@cache_resposta("prospects", "triagem")
 def api_recrutadores():
     subquery = db.session.query(
         Prospect.recrutador
     ).join(MatchResult, db.and_(
         Prospect.applicant_id == MatchResult.applicant_id,
         Prospect.job_id == MatchResult.job_id
-    )).filter(~Prospect.situacao.in_([
-        "Contratado como Hunting",
-        "Contratado pela Decision"
-    ])).distinct()
+    )).join(Job, Job.id == Prospect.job_id)\
+     .filter(Job.fechada.is_(False)).distinct()
 
     recrutadores = [r[0] for r in subquery if r[0]]
     return jsonify(recrutadores)
 
 @app.route("/api/candidatos_por_vaga/<job_id>")
+@cache_resposta("vagas", "candidatos", "prospects")
 def api_candidatos_por_vaga(job_id):
     """
     Endpoint que retorna todos os candidatos (prospects) inscritos para uma vaga específica.
@@ -230,7 +357,7 @@ def api_candidatos_por_vaga(job_id):
         ).filter(
             Prospect.job_id == job_id,
             # Exclui candidatos já contratados ou em situações finais
-            ~Prospect.situacao.in_(["Contratado como Hunting", "Contratado pela Decision"])
+            ~Prospect.situacao.in_(SITUACOES_FECHAMENTO)
         ).all()
         
         # Formata os dados para o frontend
@@ -247,9 +374,60 @@ def api_candidatos_por_vaga(job_id):
         return jsonify({"error": "Erro ao buscar candidatos"}), 500
 
 
+@app.route("/api/melhores_candidatos/<job_id>")
+def api_melhores_candidatos(job_id):
+    """
+    Top-N candidatos de toda a base mais aderentes à vaga, pela similaridade
+    entre a descrição da vaga e o currículo (índice vetorial em disco,
+    ver indexar_candidatos.py).
+
+    Query params:
+        n: quantidade de candidatos (padrão 20, máximo 200)
+        nprobe: listas do índice visitadas (mais = mais preciso e mais lento)
+    """
+    try:
+        n = int(request.args.get("n", 20))
+        nprobe = int(request.args["nprobe"]) if request.args.get("nprobe") else None
+    except ValueError:
+        return jsonify({"error": "n e nprobe devem ser números inteiros"}), 400
+    if n < 1 or (nprobe is not None and nprobe < 1):
+        return jsonify({"error": "n e nprobe devem ser maiores que zero"}), 400
+    n = min(n, 200)
+
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({"error": "Vaga não encontrada"}), 404
+    if not IndiceCandidatos.existe():
+        return jsonify({"error": "Índice de candidatos não construído (rode indexar_candidatos.py)"}), 503
+
+    ranking = IndiceCandidatos.abrir().buscar(texto_vaga(job), n=n, nprobe=nprobe)
+
+    ids = [applicant_id for applicant_id, _ in ranking]
+    applicants = {
+        a.id: a for a in db.session.query(
+            Applicant.id, Applicant.nome, Applicant.email, Applicant.titulo_profissional
+        ).filter(Applicant.id.in_(ids))
+    }
+    inscritos = {
+        row.applicant_id for row in db.session.query(Prospect.applicant_id)
+        .filter(Prospect.job_id == job_id, Prospect.applicant_id.in_(ids))
+    }
+
+    data = [{
+        "id": applicant_id,
+        "nome": applicants[applicant_id].nome,
+        "email": applicants[applicant_id].email,
+        "titulo": applicants[applicant_id].titulo_profissional or "",
+        "similaridade": round(similaridade, 4),
+        "inscrito": applicant_id in inscritos
+    } for applicant_id, similaridade in ranking if applicant_id in applicants]
+
+    return jsonify(data)
+
+
 @app.route("/api/vagas_fechadas", methods=["GET"])
+@cache_resposta("vagas", "candidatos", "prospects")
 def api_vagas_fechadas():
-    fechamento = ["Contratado como Hunting", "Contratado pela Decision"]
     results = db.session.query(
         Prospect.job_id,
         Prospect.applicant_id,
@@ -259,7 +437,7 @@ def api_vagas_fechadas():
         Prospect.situacao
     ).join(Job, Job.id == Prospect.job_id) \
      .join(Applicant, Applicant.id == Prospect.applicant_id) \
-     .filter(Prospect.situacao.in_(fechamento)) \
+     .filter(Prospect.situacao.in_(SITUACOES_FECHAMENTO)) \
      .limit(100) \
      .all()
 
@@ -274,54 +452,122 @@ def api_vagas_fechadas():
 
     return jsonify(data)
 
+# Seções de /api/detalhes: campo do JSON -> coluna
+SECOES_DETALHES = {
+    "job": {
+        "titulo": Job.titulo,
+        "cliente": Job.cliente,
+        "cidade": Job.cidade,
+        "estado": Job.estado,
+        "pais": Job.pais,
+        "tipo_contratacao": Job.tipo_contratacao,
+        "atividades": Job.atividades,
+        "competencias": Job.competencias
+    },
+    "applicant": {
+        "nome": Applicant.nome,
+        "email": Applicant.email,
+        "telefone": Applicant.telefone,
+        "titulo_profissional": Applicant.titulo_profissional,
+        "area_atuacao": Applicant.area_atuacao
+    },
+    "cv": {
+        "cv": Applicant.cv_pt
+    },
+    "match": {
+        "score": MatchResult.score,
+        "keywords": MatchResult.keywords
+    },
+    "interview": {
+        "score": InterviewRecord.score,
+        "summary": InterviewRecord.summary
+    },
+    "hr_interview": {
+        "status": HRInterview.status,
+        "notes": HRInterview.notes,
+        "created_at": HRInterview.created_at
+    }
+}
+
+def resposta_condicional(dados):
+    """JSON com ETag; responde 304 se o cliente já tem a mesma versão (If-None-Match)."""
+    resp = jsonify(dados)
+    resp.add_etag()
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
 @app.route("/api/detalhes/<job_id>/<applicant_id>")
+@cache_resposta("vagas", "candidatos", "triagem", "entrevistas", "rh")
 def api_detalhes(job_id, applicant_id):
-    job = Job.query.get(job_id)
-    applicant = Applicant.query.get(applicant_id)
-    match = MatchResult.query.filter_by(job_id=job_id, applicant_id=applicant_id).first()
-    interview = InterviewRecord.query.filter_by(job_id=job_id, applicant_id=applicant_id).first()
-    hr_interview = HRInterview.query.filter_by(job_id=job_id, applicant_id=applicant_id).first()
+    """
+    Vaga, candidato, triagem e entrevistas do par em uma única consulta.
 
-    if not job or not applicant:
+    Query params:
+        fields: seções separadas por vírgula (job, applicant, cv, match,
+            interview, hr_interview); padrão: todas. O dashboard omite `cv`
+            e carrega o currículo sob demanda em /api/cv/<applicant_id>.
+    """
+    campos = request.args.get("fields")
+    secoes = [s for s in campos.split(",") if s in SECOES_DETALHES] if campos else list(SECOES_DETALHES)
+
+    colunas = [
+        coluna.label(f"{secao}__{campo}")
+        for secao in secoes
+        for campo, coluna in SECOES_DETALHES[secao].items()
+    ]
+    query = db.session.query(Job.id, Applicant.id, *colunas)\
+        .select_from(Job)\
+        .join(Applicant, Applicant.id == applicant_id)\
+        .filter(Job.id == job_id)
+
+    # Só junta as tabelas das seções pedidas
+    for secao, modelo in (("match", MatchResult), ("interview", InterviewRecord), ("hr_interview", HRInterview)):
+        if secao in secoes:
+            query = query.outerjoin(modelo, db.and_(modelo.job_id == Job.id, modelo.applicant_id == Applicant.id))
+
+    row = query.first()
+    if not row:
         return jsonify({"error": "Dados não encontrados"}), 404
 
-    return jsonify({
-        "job": {
-            "titulo": job.titulo,
-            "cliente": job.cliente,
-            "cidade": job.cidade,
-            "estado": job.estado,
-            "pais": job.pais,
-            "tipo_contratacao": job.tipo_contratacao,
-            "atividades": job.atividades,
-            "competencias": job.competencias
-        },
-        "applicant": {
-            "nome": applicant.nome,
-            "email": applicant.email,
-            "telefone": applicant.telefone,
-            "titulo_profissional": applicant.titulo_profissional,
-            "area_atuacao": applicant.area_atuacao,
-            "cv": applicant.cv_pt
-        },
-        "match": {
-            "score": match.score if match else None,
-            "keywords": match.keywords if match else None
-        },
-        "interview": {
-            "score": interview.score if interview else None,
-            "summary": interview.summary if interview else None
-        },
-        "hr_interview": {
-            "status": hr_interview.status if hr_interview else None,
-            "notes": hr_interview.notes if hr_interview else None,
-            "created_at": hr_interview.created_at.strftime("%d/%m/%Y %H:%M") if hr_interview and hr_interview.created_at else None
-        }
-    })
+    valores = row._mapping
+    dados = {}
+    for secao in secoes:
+        destino = "applicant" if secao == "cv" else secao
+        for campo in SECOES_DETALHES[secao]:
+            dados.setdefault(destino, {})[campo] = valores[f"{secao}__{campo}"]
+
+    hr = dados.get("hr_interview")
+    if hr and hr["created_at"]:
+        hr["created_at"] = hr["created_at"].strftime("%d/%m/%Y %H:%M")
+
+    return resposta_condicional(dados)
+
+@app.route("/api/cv/<applicant_id>")
+@cache_resposta("candidatos")
+def api_cv(applicant_id):
+    """Currículo do candidato, carregado sob demanda pelo modal de detalhes."""
+    cv = db.session.query(Applicant.cv_pt).filter(Applicant.id == applicant_id).first()
+    if not cv:
+        return jsonify({"error": "Candidato não encontrado"}), 404
+    return resposta_condicional({"cv": cv.cv_pt})
 
 
+paginador_entrevistas = Paginador(
+    chave=InterviewRecord.id,
+    colunas={
+        "job_id": InterviewRecord.job_id,
+        "applicant_id": InterviewRecord.applicant_id,
+        "titulo": Job.titulo,
+        "nome": Applicant.nome,
+        "score": InterviewRecord.score
+    },
+    busca=[Job.titulo, Applicant.nome, InterviewRecord.job_id, InterviewRecord.applicant_id]
+)
+
 @app.route("/api/entrevistas_chatbot", methods=["GET"])
+@cache_resposta("vagas", "candidatos", "entrevistas", "rh")
 def api_entrevistas_chatbot():
+    """Paginável: ver utils/paginacao.py."""
     entrevistas = db.session.query(
         InterviewRecord.job_id,
         InterviewRecord.applicant_id,
@@ -338,19 +584,37 @@ def api_entrevistas_chatbot():
          )
      ))
 
-    data = [{
-        "job_id": e.job_id,
-        "applicant_id": e.applicant_id,
-        "titulo": e.titulo,
-        "nome": e.nome,
-        "score": e.score,
-        "summary": e.summary
-    } for e in entrevistas]
+    def serializar(e):
+        return {
+            "job_id": e.job_id,
+            "applicant_id": e.applicant_id,
+            "titulo": e.titulo,
+            "nome": e.nome,
+            "score": e.score,
+            "summary": e.summary
+        }
 
-    return jsonify(data)
+    return paginador_entrevistas.responder(entrevistas, request.args, serializar)
+
+paginador_hr_entrevistas = Paginador(
+    chave=HRInterview.id,
+    colunas={
+        "job_id": HRInterview.job_id,
+        "applicant_id": HRInterview.applicant_id,
+        "titulo": Job.titulo,
+        "nome": Applicant.nome,
+        "match_score": MatchResult.score,
+        "chatbot_score": InterviewRecord.score,
+        "status": HRInterview.status
+    },
+    busca=[Job.titulo, Applicant.nome, HRInterview.job_id, HRInterview.applicant_id],
+    filtros={"status": HRInterview.status}
+)
 
 @app.route("/api/hr-entrevistas_chatbot", methods=["GET"])
-def api_hr_entrevistas_chatbot(): 
+@cache_resposta("vagas", "candidatos", "triagem", "entrevistas", "rh")
+def api_hr_entrevistas_chatbot():
+    """Paginável: ver utils/paginacao.py."""
     entrevistas = db.session.query(
         HRInterview.job_id,
         HRInterview.applicant_id,
@@ -363,37 +627,39 @@ def api_hr_entrevistas_chatbot():
     ).join(Job, Job.id == HRInterview.job_id) \
      .join(Applicant, Applicant.id == HRInterview.applicant_id) \
      .outerjoin(MatchResult, (MatchResult.job_id == HRInterview.job_id) & (MatchResult.applicant_id == HRInterview.applicant_id)) \
-     .outerjoin(InterviewRecord, (InterviewRecord.job_id == HRInterview.job_id) & (InterviewRecord.applicant_id == HRInterview.applicant_id)) \
-     .all()
-
-    data = [{
-        "job_id": e.job_id,
-        "applicant_id": e.applicant_id,
-        "titulo": e.titulo,
-        "nome": e.nome,
-        "match_score": e.match_score,
-        "chatbot_score": e.chatbot_score,
-        "status": e.status,
-        "notes": e.notes
-    } for e in entrevistas]
+     .outerjoin(InterviewRecord, (InterviewRecord.job_id == HRInterview.job_id) & (InterviewRecord.applicant_id == HRInterview.applicant_id))
+
+    def serializar(e):
+        return {
+            "job_id": e.job_id,
+            "applicant_id": e.applicant_id,
+            "titulo": e.titulo,
+            "nome": e.nome,
+            "match_score": e.match_score,
+            "chatbot_score": e.chatbot_score,
+            "status": e.status,
+            "notes": e.notes
+        }
 
-    return jsonify(data)
+    return paginador_hr_entrevistas.responder(entrevistas, request.args, serializar)
 
 
-@app.route("/api/next_question", methods=["POST"])
-def api_next_question():
-    data = request.get_json()
-
+def carregar_contexto_entrevista(data):
+    """
+    Valida o payload de /api/next_question e monta os dicionários de vaga,
+    candidato e histórico esperados pelo agente entrevistador.
+    Retorna (contexto, None) ou (None, resposta_de_erro).
+    """
     job_id = data.get("job_id")
     applicant_id = data.get("applicant_id")
     history = data.get("history", [])
 
     if not job_id or not applicant_id:
-        return jsonify({"error": "job_id e applicant_id são obrigatórios"}), 400
+        return None, (jsonify({"error": "job_id e applicant_id são obrigatórios"}), 400)
 
     job = Job.query.get(job_id)
     if not job:
-        return jsonify({"error": "Vaga não encontrada"}), 404
+        return None, (jsonify({"error": "Vaga não encontrada"}), 404)
 
     if applicant_id.startswith("tryit-"):
         user_id = applicant_id.split("-")[1]
@@ -402,70 +668,184 @@ def api_next_question():
         applicant = Applicant.query.get(applicant_id)
 
     if not applicant:
-        return jsonify({"error": "Candidato não encontrado"}), 404
-
-    job_dict = {
-        "informacoes_basicas": {
-            "titulo_vaga": job.titulo,
-            "cliente": job.cliente,
-            "objetivo_vaga": job.objetivo_vaga,
-            "tipo_contratacao": job.tipo_contratacao,
-        },
-        "perfil_vaga": {
-            "nivel_profissional": job.nivel_profissional,
-            "nivel_academico": job.nivel_academico,
-            "nivel_ingles": job.nivel_ingles,
-            "nivel_espanhol": job.nivel_espanhol,
-            "principais_atividades": job.atividades,
-            "competencia_tecnicas_e_comportamentais": job.competencias,
-        }
-    }
-
-    applicant_dict = {
-        "nome": applicant.nome,
-        "area_atuacao": getattr(applicant, "area_atuacao", ""),
-        "conhecimentos_tecnicos": getattr(applicant, "conhecimentos_tecnicos", ""),
-        "certificacoes": getattr(applicant, "certificacoes", ""),
-        "nivel_ingles": getattr(applicant, "nivel_ingles", ""),
-        "nivel_espanhol": getattr(applicant, "nivel_espanhol", ""),
-        "nivel_academico": getattr(applicant, "nivel_academico", ""),
-        "cv_pt": getattr(applicant, "cv_pt", getattr(applicant, "keywords", "")) 
-    }
+        return None, (jsonify({"error": "Candidato não encontrado"}), 404)
 
     history_pairs = [
         (h["question"], h["answer"])
         for h in history if isinstance(h, dict) and h.get("question") and h.get("answer")
     ]
 
+    return (montar_job_dict(job), montar_applicant_dict(applicant), history_pairs), None
+
+
+def preparar_turno_entrevista(data):
+    """
+    Prompt da próxima pergunta e a sessão do servidor.
+
+    Com `sessao_id`, a última resposta (`answer`) fecha o turno em aberto e o
+    prompt vem do estado da sessão. Sem `sessao_id`, uma sessão é criada com
+    o contexto da vaga e do currículo. Clientes que ainda enviam o `history`
+    completo (sem sessão) continuam atendidos como antes.
+    Se a próxima pergunta já foi pré-gerada a partir da transcrição parcial
+    (modo prefetch) e ainda vale para a resposta final, ela vem pronta.
+    Retorna (prompt, pergunta_pronta, sessao, None) ou (None, None, None, resposta_de_erro).
+    """
+    sessao_id = data.get("sessao_id")
+    if sessao_id:
+        sessao = SessaoEntrevista.query.get(sessao_id)
+        if not sessao:
+            return None, None, None, (jsonify({"error": "Sessão não encontrada"}), 404)
+        pronta = prefetch_entrevista.consumir(sessao, data.get("answer")) if prefetch_entrevista.ATIVO else None
+        registrar_resposta(sessao, data.get("answer"))
+        db.session.commit()
+        return (None if pronta else prompt_sessao(sessao)), pronta, sessao, None
+
+    contexto, erro = carregar_contexto_entrevista(data)
+    if erro:
+        return None, None, None, erro
+    if data.get("history"):
+        return prompt_entrevistador(*contexto), None, None, None
+
+    job_dict, applicant_dict, _ = contexto
+    sessao = criar_sessao(data["job_id"], data["applicant_id"], job_dict, applicant_dict)
+    return prompt_sessao(sessao), None, sessao, None
+
+
+def concluir_turno_entrevista(sessao, pergunta):
+    """Guarda a pergunta feita e agenda a compactação do histórico quando necessário."""
+    if sessao is None:
+        return
+    registrar_pergunta(sessao, pergunta)
+    if precisa_compactar(sessao):
+        # Uma compactação já pendente ou em execução para a sessão cobre este turno
+        enfileirar("compactar_sessao", {"sessao_id": sessao.id}, unica=True)
+
+
+@app.route("/api/next_question", methods=["POST"])
+def api_next_question():
+    prompt, pronta, sessao, erro = preparar_turno_entrevista(request.get_json())
+    if erro:
+        return erro
+
     try:
-        next_question = agente_entrevistador(job_dict, applicant_dict, history_pairs)
-        return jsonify({"question": next_question})
+        next_question = pronta or agente_entrevistador(prompt)
+        concluir_turno_entrevista(sessao, next_question)
+        return jsonify({"question": next_question, "sessao_id": sessao.id if sessao else None, "prefetch": bool(pronta)})
     except Exception as e:
         return jsonify({"error": "Erro ao gerar pergunta", "details": str(e)}), 500
 
+
+def evento_sse(dados, evento=None):
+    prefixo = f"event: {evento}\n" if evento else ""
+    return f"{prefixo}data: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+@app.route("/api/next_question/stream", methods=["POST"])
+def api_next_question_stream():
+    """
+    Variante em streaming de /api/next_question: envia os pedaços da pergunta
+    via Server-Sent Events assim que chegam do modelo (eventos sem nome com
+    {"token": ...}), seguidos de um evento "fim" com a pergunta completa e o
+    `sessao_id`. Uma pergunta pré-gerada vai direto no evento "fim", para que
+    o cliente peça o áudio da pergunta inteira, já sintetizado.
+    """
+    prompt, pronta, sessao, erro = preparar_turno_entrevista(request.get_json())
+    if erro:
+        return erro
+
+    def gerar():
+        partes = []
+        try:
+            if pronta:
+                concluir_turno_entrevista(sessao, pronta)
+                yield evento_sse({"question": pronta, "sessao_id": sessao.id, "prefetch": True}, evento="fim")
+                return
+            for pedaco in agente_entrevistador_stream(prompt):
+                partes.append(pedaco)
+                yield evento_sse({"token": pedaco})
+            pergunta = "".join(partes).strip()
+            concluir_turno_entrevista(sessao, pergunta)
+            yield evento_sse({"question": pergunta, "sessao_id": sessao.id if sessao else None}, evento="fim")
+        except Exception as e:
+            yield evento_sse({"error": "Erro ao gerar pergunta", "details": str(e)}, evento="erro")
+
+    return Response(stream_with_context(gerar()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@app.route("/api/next_question/prefetch", methods=["POST"])
+def api_next_question_prefetch():
+    """
+    Recebe {sessao_id, parcial} com a transcrição parcial da resposta em
+    andamento e agenda a pré-geração da próxima pergunta (e do seu áudio).
+    Responde 202 sem esperar; ver models/prefetch_entrevista.py.
+    """
+    if not prefetch_entrevista.ATIVO:
+        return jsonify({"error": "Prefetch desativado"}), 404
+
+    data = request.get_json() or {}
+    sessao = SessaoEntrevista.query.get(data.get("sessao_id") or "")
+    if not sessao:
+        return jsonify({"error": "Sessão não encontrada"}), 404
+    if not sessao.pergunta_atual:
+        return jsonify({"status": "sem_pergunta"}), 409
+
+    return jsonify({"status": prefetch_entrevista.agendar(sessao.id, data.get("parcial"))}), 202
+
+local_vaga = db.func.coalesce(Job.cidade, "") + ", " + db.func.coalesce(Job.estado, "") + ", " + db.func.coalesce(Job.pais, "")
+
+paginador_vagas = Paginador(
+    chave=Job.id,
+    colunas={
+        "titulo": Job.titulo,
+        "cliente": Job.cliente,
+        "local": local_vaga,
+        "tipo": Job.tipo_contratacao
+    },
+    busca=[Job.titulo, Job.cliente, local_vaga, Job.tipo_contratacao],
+    filtros={"local": local_vaga, "tipo": db.func.coalesce(Job.tipo_contratacao, "")}
+)
+
 @app.route("/api/vagas_abertas")
+@cache_resposta("vagas", "prospects")
 def api_vagas_abertas():
-    vagas = db.session.query(Job).filter(
-        ~Job.id.in_(
-            db.session.query(Prospect.job_id).filter(
-                Prospect.situacao.in_([
-                    "Contratado como Hunting", "Contratado pela Decision"
-                ])
-            )
-        )
-    ).all()
+    """Paginável: ver utils/paginacao.py (usado pelo DataTables de tryit.html)."""
+    vagas = db.session.query(
+        Job.id,
+        Job.titulo,
+        Job.cliente,
+        Job.tipo_contratacao,
+        local_vaga.label("local")
+    ).filter(Job.fechada.is_(False))
+
+    def serializar(v):
+        return {
+            "id": v.id,
+            "titulo": v.titulo or "",
+            "cliente": v.cliente or "",
+            "tipo": v.tipo_contratacao or "",
+            "local": v.local
+        }
 
-    data = [{
-        "id": v.id,
-        "titulo": v.titulo or "",
-        "cliente": v.cliente or "",
-        "tipo": v.tipo_contratacao or "",
-        "local": f"{v.cidade or ''}, {v.estado or ''}, {v.pais or ''}"
-    } for v in vagas]
+    return paginador_vagas.responder(vagas, request.args, serializar)
 
-    return jsonify(data)
+@app.route("/api/vagas_abertas/filtros")
+@cache_resposta("vagas", "prospects")
+def api_vagas_abertas_filtros():
+    """Valores distintos de local e tipo das vagas abertas, para os selects de filtro."""
+    abertas = db.session.query(Job).filter(Job.fechada.is_(False))
+    locais = abertas.with_entities(local_vaga).distinct().order_by(local_vaga)
+    tipos = abertas.with_entities(Job.tipo_contratacao).distinct().order_by(Job.tipo_contratacao)
+
+    return jsonify({
+        "locais": [l for (l,) in locais if l],
+        "tipos": [t for (t,) in tipos if t]
+    })
 
 @app.route("/api/vaga_detalhe/<id>")
+@cache_resposta("vagas")
 def api_vaga_detalhe(id):
     vaga = Job.query.get(id)
     if not vaga:
@@ -507,9 +887,34 @@ def save_rh_feedback():
     )
     db.session.add(feedback)
     db.session.commit()
+    invalidar("rh")
 
     return jsonify({"message": "Feedback salvo com sucesso"}), 200
 
+@app.route("/api/metricas/llm_cache", methods=["GET"])
+def api_metricas_llm_cache():
+    return jsonify(metricas_cache())
+
+@app.route("/api/metricas/cache_respostas", methods=["GET"])
+def api_metricas_cache_respostas():
+    return jsonify(metricas_respostas())
+
+@app.route("/api/metricas/fila", methods=["GET"])
+def api_metricas_fila():
+    return jsonify(metricas_fila())
+
+@app.route("/api/metricas/orcamento_prompt", methods=["GET"])
+def api_metricas_orcamento_prompt():
+    return jsonify(metricas_orcamento())
+
+@app.route("/api/metricas/saida_estruturada", methods=["GET"])
+def api_metricas_saida_estruturada():
+    return jsonify(metricas_saida())
+
+@app.route("/api/metricas/prefetch", methods=["GET"])
+def api_metricas_prefetch():
+    return jsonify(prefetch_entrevista.metricas_prefetch())
+
 #############################################
 ############### ROTAS PAGINAS  ###############
 #############################################
@@ -529,35 +934,26 @@ def interview():
         match = MatchResult.query.filter_by(job_id=job_id, applicant_id=applicant_id).first()
 
         if not match:
-            job_dict = {
-                "informacoes_basicas": {
-                    "titulo_vaga": job.titulo,
-                    "cliente": job.cliente,
-                    "objetivo_vaga": job.objetivo_vaga,
-                    "tipo_contratacao": job.tipo_contratacao
-                },
-                "perfil_vaga": {
-                    "nivel_profissional": job.nivel_profissional,
-                    "nivel_academico": job.nivel_academico,
-                    "nivel_ingles": job.nivel_ingles,
-                    "nivel_espanhol": job.nivel_espanhol,
-                    "principais_atividades": job.atividades,
-                    "competencia_tecnicas_e_comportamentais": job.competencias
-                }
-            }
+            job_dict = montar_job_dict(job)
 
             applicant_cv = applicant.cv_pt or ""
-            result_json = agente_triagem_cvs(job_dict, applicant_cv)
-            result = json.loads(result_json)
-
-            match = MatchResult(
-                job_id=job_id,
-                applicant_id=applicant_id,
-                score=result.get("score"),
-                keywords=result.get("keywords")
-            )
-            db.session.add(match)
-            db.session.commit()
+            try:
+                result = agente_triagem_cvs(job_dict, applicant_cv)
+            except ErroSaidaEstruturada as e:
+                # A entrevista não depende da nota; a triagem fica para a próxima abertura
+                print(f"⚠️ Triagem de {applicant_id} para a vaga {job_id} sem resultado válido: {e}")
+                result = None
+
+            if result:
+                match = MatchResult(
+                    job_id=job_id,
+                    applicant_id=applicant_id,
+                    score=result.get("score"),
+                    keywords=result.get("keywords")
+                )
+                db.session.add(match)
+                db.session.commit()
+                invalidar("triagem")
 
         return render_template("interview.html", job_id=job_id, applicant_id=applicant_id)
 
@@ -589,44 +985,60 @@ def tryit_apply(job_id):
             flash("Currículo é obrigatório para seguir para a próxima etapa.")
             return redirect(request.url)
 
-        filename = secure_filename(arquivo.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        arquivo.save(filepath)
-
-        cv_text = extract_text_from_pdf(filepath)
-
-        job_dict = {
-            "informacoes_basicas": {
-                "titulo_vaga": job.titulo,
-                "cliente": job.cliente,
-                "objetivo_vaga": job.objetivo_vaga,
-                "tipo_contratacao": job.tipo_contratacao,
-            },
-            "perfil_vaga": {
-                "nivel_profissional": job.nivel_profissional,
-                "nivel_academico": job.nivel_academico,
-                "nivel_ingles": job.nivel_ingles,
-                "nivel_espanhol": job.nivel_espanhol,
-                "principais_atividades": job.atividades,
-                "competencia_tecnicas_e_comportamentais": job.competencias,
-            }
-        }
+        # Gravado pelo SHA-256 do conteúdo: nomes iguais não se sobrescrevem e reenvios não duplicam
+        blob = registrar_upload(armazenamento_uploads, arquivo)
+
+        # Mesmo currículo já triado para esta vaga: reaproveita o resultado sem passar pela fila
+        anterior = TryItUser.query.filter(
+            TryItUser.arquivo_sha256 == blob.sha256,
+            TryItUser.job_id == job.id,
+            TryItUser.score.isnot(None)
+        ).order_by(TryItUser.id.desc()).first()
+        if anterior:
+            entry = TryItUser(
+                nome=anterior.nome,
+                job_id=job.id,
+                arquivo_sha256=blob.sha256,
+                score=anterior.score,
+                keywords=anterior.keywords,
+            )
+            db.session.add(entry)
+            db.session.commit()
+            return redirect(url_for("tryit_interview", job_id=job.id, user_id=entry.id))
 
-        result = agente_triagem_cvs(job_dict, cv_text)
-        parsed = json.loads(result)
+        # A extração do PDF e a triagem no GPT-4 rodam no worker da fila
+        tarefa_id = enfileirar("triagem_tryit", {"job_id": job.id, "arquivo_sha256": blob.sha256})
+        return redirect(url_for("tryit_status", tarefa_id=tarefa_id))
 
-        entry = TryItUser(
-            nome=parsed.get("nome"),
-            job_id=job.id,
-            score=parsed.get("score"),
-            keywords=parsed.get("keywords"),
-        )
-        db.session.add(entry)
-        db.session.commit()
+    return render_template("tryit_form.html", job=job)
 
-        return redirect(url_for("tryit_interview", job_id=job.id, user_id=entry.id))
 
-    return render_template("tryit_form.html", job=job)
+@app.route("/tryit/status/<int:tarefa_id>")
+def tryit_status(tarefa_id):
+    dados = obter_tarefa(tarefa_id)
+    if not dados or dados["tipo"] != "triagem_tryit":
+        return "Tarefa não encontrada", 404
+    job = Job.query.get(dados["payload"]["job_id"])
+    return render_template("tryit_status.html", tarefa_id=tarefa_id, job=job)
+
+
+@app.route("/api/tarefas/<int:tarefa_id>")
+def api_tarefa(tarefa_id):
+    dados = obter_tarefa(tarefa_id)
+    if not dados:
+        return jsonify({"error": "Tarefa não encontrada"}), 404
+
+    resposta = {
+        "id": dados["id"],
+        "status": dados["status"],
+        "posicao": dados.get("posicao"),
+        "tentativas": dados["tentativas"]
+    }
+    if dados["status"] == CONCLUIDA and dados["tipo"] == "triagem_tryit":
+        resposta["redirecionar"] = url_for("tryit_interview", **dados["resultado"])
+    elif dados["status"] == ERRO:
+        resposta["erro"] = dados["erro"]
+    return jsonify(resposta)
 
 
 @app.route("/tryit/interview", methods=["GET"])
@@ -661,4 +1073,7 @@ def try_it_yourself():
     return render_template("tryit.html")
 
 if __name__ == "__main__":
+    # Com o reloader, só o processo filho (que serve as requisições) consome a fila
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        iniciar_workers()
     app.run(debug=True)
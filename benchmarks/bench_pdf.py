@@ -0,0 +1,123 @@
+"""
+Benchmark da extração de texto dos currículos em PDF.
+
+Compara, sobre uma pasta de PDFs (ou um corpus sintético gerado na hora),
+a leitura completa de todas as páginas (implementação antiga do app) com
+`utils/extracao_pdf.py`: leitura com parada antecipada em um único processo,
+leitura com o pool de processos e o acerto no cache por hash do arquivo.
+
+Uso:
+    python -m benchmarks.bench_pdf --pasta curriculos/
+    python -m benchmarks.bench_pdf --gerar 40 --max-caracteres 20000
+"""
+import argparse
+import glob
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import fitz
+
+from utils import extracao_pdf
+from utils.cache import LRUCache
+
+PALAVRAS = (
+    "python sql java liderança projetos dados análise cloud azure aws scrum gestão "
+    "desenvolvimento sistemas integração clientes equipe negociação inglês espanhol "
+    "relatórios indicadores processos suporte infraestrutura redes segurança"
+).split()
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def gerar_corpus(pasta, quantidade, seed=42):
+    """CVs sintéticos de 1 a 60 páginas, com ~40 linhas de texto por página."""
+    rng = random.Random(seed)
+    for n in range(quantidade):
+        paginas = rng.choice([1, 2, 3, 5, 10, 30, 60])
+        doc = fitz.open()
+        for p in range(paginas):
+            pagina = doc.new_page()
+            linhas = [" ".join(rng.choices(PALAVRAS, k=10)) for _ in range(40)]
+            pagina.insert_text((40, 40), f"Currículo {n} - página {p + 1}\n" + "\n".join(linhas), fontsize=9)
+        doc.save(os.path.join(pasta, f"cv_{n:03d}_{paginas}p.pdf"))
+        doc.close()
+
+
+def extrair_completo(caminho):
+    """Implementação anterior: concatena o texto de todas as páginas."""
+    text = ""
+    with fitz.open(caminho) as doc:
+        for page in doc:
+            text += page.get_text()
+    return text.strip()
+
+
+def medir(nome, arquivos, extrair):
+    latencias, caracteres = [], 0
+    for caminho in arquivos:
+        inicio = time.perf_counter()
+        texto = extrair(caminho)
+        latencias.append(time.perf_counter() - inicio)
+        caracteres += len(texto)
+    total = sum(latencias)
+    print(f"{nome:<28} {total * 1000:>9.1f}ms {percentil(latencias, 50) * 1000:>8.2f}ms "
+          f"{percentil(latencias, 95) * 1000:>8.2f}ms {caracteres // len(arquivos):>10}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pasta", help="pasta com os PDFs (padrão: corpus sintético)")
+    parser.add_argument("--gerar", type=int, default=30, help="tamanho do corpus sintético")
+    parser.add_argument("--max-caracteres", type=int, default=extracao_pdf.MAX_CARACTERES)
+    parser.add_argument("--processos", type=int, default=max(2, extracao_pdf.PROCESSOS))
+    args = parser.parse_args()
+
+    temporaria = None
+    if args.pasta:
+        arquivos = sorted(glob.glob(os.path.join(args.pasta, "*.pdf")))
+    else:
+        temporaria = tempfile.mkdtemp(prefix="bench_pdf_")
+        gerar_corpus(temporaria, args.gerar)
+        arquivos = sorted(glob.glob(os.path.join(temporaria, "*.pdf")))
+    if not arquivos:
+        parser.error("nenhum PDF encontrado")
+
+    try:
+        print(f"{len(arquivos)} PDFs, max_caracteres={args.max_caracteres}, processos={args.processos}")
+        print(f"{'modo':<28} {'total':>11} {'p50':>10} {'p95':>10} {'caracteres':>10}")
+        antes = medir("leitura completa (antiga)", arquivos, extrair_completo)
+
+        extracao_pdf.configurar_cache(None)
+        extracao_pdf.PROCESSOS = 1
+        extracao_pdf._obter_pool().apply(int)  # aquece o pool fora da medição
+        depois = medir("parada antecipada", arquivos,
+                       lambda c: extracao_pdf.extrair_texto_pdf(c, max_caracteres=args.max_caracteres))
+
+        extracao_pdf._reciclar_pool(extracao_pdf._obter_pool())
+        extracao_pdf.PROCESSOS = args.processos
+        extracao_pdf._obter_pool().apply(int)
+        medir("parada antecipada + pool", arquivos,
+              lambda c: extracao_pdf.extrair_texto_pdf(c, max_caracteres=args.max_caracteres))
+
+        extracao_pdf.configurar_cache(LRUCache(max_itens=len(arquivos)))
+        for caminho in arquivos:
+            extracao_pdf.extrair_texto_pdf(caminho, max_caracteres=args.max_caracteres)
+        medir("cache por hash do arquivo", arquivos,
+              lambda c: extracao_pdf.extrair_texto_pdf(c, max_caracteres=args.max_caracteres))
+
+        print(f"\nGanho da parada antecipada: {antes / depois:.1f}x")
+    finally:
+        if temporaria:
+            shutil.rmtree(temporaria, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
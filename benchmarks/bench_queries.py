@@ -0,0 +1,148 @@
+"""
+Plano de execução e latência das consultas de cada endpoint /api/* com e
+sem os índices declarados em db/database.py.
+
+Chama cada endpoint pelo test client do Flask contra uma cópia do banco,
+captura o SQL emitido e repete essas consultas em duas cópias: uma
+migrada (com índices) e outra da qual os índices foram removidos. Reporta
+a mediana do tempo de SQL por endpoint e, com --planos, o EXPLAIN QUERY
+PLAN de cada consulta nas duas versões.
+
+Uso:
+    python -m benchmarks.bench_queries
+    python -m benchmarks.bench_queries --db data/appdata.db --repeticoes 20 --planos
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+
+def amostra_ids(caminho):
+    """Um par (vaga, candidato) com triagem, para os endpoints com parâmetros."""
+    conn = sqlite3.connect(caminho)
+    try:
+        row = conn.execute(
+            "SELECT m.job_id, m.applicant_id, p.recrutador FROM match_results m "
+            "JOIN prospects p ON p.job_id = m.job_id AND p.applicant_id = m.applicant_id LIMIT 1"
+        ).fetchone() or conn.execute("SELECT job_id, applicant_id, recrutador FROM prospects LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    job_id, applicant_id, recrutador = row or ("0", "0", "")
+    return job_id, applicant_id, recrutador or ""
+
+
+def endpoints(job_id, applicant_id, recrutador):
+    return [
+        "/api/triagem",
+        f"/api/triagem?recrutador={recrutador}",
+        "/api/recrutadores",
+        f"/api/candidatos_por_vaga/{job_id}",
+        "/api/vagas_fechadas",
+        f"/api/detalhes/{job_id}/{applicant_id}",
+        "/api/entrevistas_chatbot",
+        "/api/hr-entrevistas_chatbot",
+        "/api/vagas_abertas",
+        f"/api/vaga_detalhe/{job_id}",
+    ]
+
+
+def capturar_sql(caminho, urls):
+    """Importa o app apontando para `caminho` e devolve {url: [(sql, params)]}."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("LLM_CACHE", "0")
+    os.environ["RESPOSTA_CACHE"] = "0"  # precisa do SQL de cada endpoint, não da resposta cacheada
+
+    from sqlalchemy import event
+    from app import app, db
+
+    capturado = {}
+    atual = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            atual.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", registrar)
+        client = app.test_client()
+        for url in urls:
+            atual.clear()
+            resposta = client.get(url)
+            capturado[url] = list(atual)
+            if resposta.status_code >= 500:
+                print(f"⚠️ {url} respondeu {resposta.status_code}")
+        event.remove(db.engine, "before_cursor_execute", registrar)
+    return capturado
+
+
+def remover_indices(caminho):
+    from db.database import db
+
+    conn = sqlite3.connect(caminho)
+    for tabela in db.metadata.tables.values():
+        for indice in tabela.indexes:
+            conn.execute(f'DROP INDEX IF EXISTS "{indice.name}"')
+    conn.execute("DROP TABLE IF EXISTS sqlite_stat1")
+    conn.commit()
+    conn.close()
+
+
+def medir(caminho, consultas, repeticoes):
+    conn = sqlite3.connect(caminho)
+    planos = []
+    for sql, params in consultas:
+        plano = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        planos.append([linha[-1] for linha in plano])
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for sql, params in consultas:
+            conn.execute(sql, params).fetchall()
+        tempos.append(time.perf_counter() - inicio)
+    conn.close()
+    return statistics.median(tempos) * 1000, planos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.path.join("data", "appdata.db"))
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--planos", action="store_true", help="mostra o EXPLAIN QUERY PLAN de cada consulta")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_queries_")
+    try:
+        com_indices = os.path.join(pasta, "com_indices.db")
+        sem_indices = os.path.join(pasta, "sem_indices.db")
+        shutil.copy(args.db, com_indices)
+
+        urls = endpoints(*amostra_ids(com_indices))
+        capturado = capturar_sql(com_indices, urls)  # o import do app aplica as migrações
+        shutil.copy(com_indices, sem_indices)
+        remover_indices(sem_indices)
+
+        print(f"{'endpoint':<45} {'consultas':>9} {'sem índices':>12} {'com índices':>12} {'ganho':>7}")
+        for url in urls:
+            consultas = capturado[url]
+            antes, planos_antes = medir(sem_indices, consultas, args.repeticoes)
+            depois, planos_depois = medir(com_indices, consultas, args.repeticoes)
+            ganho = antes / depois if depois else float("inf")
+            print(f"{url[:45]:<45} {len(consultas):>9} {antes:>10.2f}ms {depois:>10.2f}ms {ganho:>6.1f}x")
+
+            if args.planos:
+                for i, (sql, _) in enumerate(consultas):
+                    print(f"    consulta {i + 1}: {' '.join(sql.split())[:100]}...")
+                    print("      sem índices: " + " | ".join(planos_antes[i]))
+                    print("      com índices: " + " | ".join(planos_depois[i]))
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
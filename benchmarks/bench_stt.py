@@ -0,0 +1,87 @@
+"""
+Benchmark dos backends de speech-to-text sobre uma pasta de arquivos WAV.
+
+Para cada backend, transcreve todos os arquivos e reporta o fator de tempo
+real (RTF = tempo de processamento / duração do áudio; < 1 é mais rápido
+que tempo real) e os percentis de latência por arquivo.
+
+Uso:
+    python -m benchmarks.bench_stt --pasta amostras/ --backends fake google vosk
+    python -m benchmarks.bench_stt --pasta amostras/ --backends vosk --segmentar
+"""
+import argparse
+import glob
+import os
+import time
+import wave
+
+from utils.stt import listen
+from utils.stt_backends import backends_disponiveis
+
+
+def duracao_wav(caminho):
+    with wave.open(caminho, "rb") as w:
+        return w.getnframes() / w.getframerate()
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def medir(backend, arquivos, segmentar, mostrar):
+    latencias = []
+    audio_total = 0.0
+    falhas = 0
+
+    for caminho in arquivos:
+        with open(caminho, "rb") as f:
+            dados = f.read()
+
+        inicio = time.perf_counter()
+        texto = listen(dados, segmentar=segmentar, backends=[backend])
+        latencias.append(time.perf_counter() - inicio)
+        audio_total += duracao_wav(caminho)
+
+        if texto.startswith("[Erro"):
+            falhas += 1
+        if mostrar:
+            print(f"  {os.path.basename(caminho)}: {texto}")
+
+    processamento = sum(latencias)
+    return {
+        "arquivos": len(arquivos),
+        "audio_s": audio_total,
+        "rtf": processamento / audio_total if audio_total else 0.0,
+        "p50": percentil(latencias, 50),
+        "p90": percentil(latencias, 90),
+        "p99": percentil(latencias, 99),
+        "falhas": falhas
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pasta", required=True, help="pasta com arquivos .wav")
+    parser.add_argument("--backends", nargs="+", default=["fake"], choices=backends_disponiveis())
+    parser.add_argument("--segmentar", action="store_true", help="segmenta nas pausas e transcreve em paralelo")
+    parser.add_argument("--mostrar", action="store_true", help="imprime as transcrições")
+    args = parser.parse_args()
+
+    arquivos = sorted(glob.glob(os.path.join(args.pasta, "*.wav")))
+    if not arquivos:
+        parser.error(f"nenhum .wav encontrado em {args.pasta}")
+
+    print(f"{len(arquivos)} arquivos em {args.pasta}")
+    for backend in args.backends:
+        r = medir(backend, arquivos, args.segmentar, args.mostrar)
+        print(
+            f"{backend:>15}: áudio={r['audio_s']:.1f}s RTF={r['rtf']:.3f} "
+            f"latência p50={r['p50']:.2f}s p90={r['p90']:.2f}s p99={r['p99']:.2f}s "
+            f"falhas={r['falhas']}/{r['arquivos']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark do motor de triagem em lote contra o cliente OpenAI falso.
+
+Compara o laço serial antigo (uma chamada bloqueante + sleep de 1.2s por
+par) com o TriagemEngine em diferentes tamanhos de pool, sem tocar no
+banco nem na API.
+
+Uso:
+    python -m benchmarks.bench_triagem --pares 200 --latencia 0.8
+"""
+import argparse
+import time
+
+from models.triagem_engine import TriagemEngine
+from utils.fake_openai import FakeOpenAI
+
+
+def gerar_tarefas(pares):
+    tarefas = []
+    for i in range(pares):
+        job_id, applicant_id = str(1000 + i // 5), str(50000 + i)
+        prompt = (
+            f"ID da vaga: {job_id}\nID do candidato: {applicant_id}\n"
+            + "Descrição da vaga e currículo do candidato. " * 60
+        )
+        tarefas.append({"job_id": job_id, "applicant_id": applicant_id, "prompt": prompt})
+    return tarefas
+
+
+def estimar_serial(pares, latencia, sleep=1.2):
+    return pares * (latencia + sleep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pares", type=int, default=200)
+    parser.add_argument("--latencia", type=float, default=0.8, help="latência simulada por chamada (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--rpm", type=int, default=3000)
+    parser.add_argument("--tpm", type=int, default=1000000)
+    args = parser.parse_args()
+
+    tarefas = gerar_tarefas(args.pares)
+    serial = estimar_serial(args.pares, args.latencia)
+    print(f"Laço serial original (estimado): {serial:.1f}s ({args.pares / serial:.2f} pares/s)")
+
+    for workers in args.workers:
+        fake = FakeOpenAI(latencia=args.latencia, jitter=args.latencia / 4)
+        engine = TriagemEngine(fake, workers=workers, rpm=args.rpm, tpm=args.tpm, intervalo_progresso=0)
+
+        gravadas = []
+        inicio = time.perf_counter()
+        stats = engine.executar(
+            tarefas,
+            parse=lambda tarefa, content: {"job_id": tarefa["job_id"], "applicant_id": tarefa["applicant_id"]},
+            salvar=gravadas.extend
+        )
+        duracao = time.perf_counter() - inicio
+
+        print(f"workers={workers:>3}: {stats.resumo()} | speedup vs serial {serial / duracao:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark da triagem agrupada (vários candidatos da mesma vaga por chamada)
+contra a triagem individual de `exec_agente_triagem.py`.
+
+Para cada tamanho de grupo mede tempo total, chamadas, tokens por par,
+pares reenviados individualmente e a concordância dos scores com a
+triagem individual dos mesmos pares (diferença média e fração dentro de
+10 pontos). Com o cliente falso os scores são determinísticos por par, então
+a concordância só é informativa com `--api`; `--falha-lote` faz o falso
+devolver respostas inválidas em parte dos lotes, para medir o custo do
+reenvio.
+
+Uso:
+    python -m benchmarks.bench_triagem_agrupada --vagas 20 --candidatos 5 --agrupar 5 10
+    python -m benchmarks.bench_triagem_agrupada --banco --vagas 10 --api
+"""
+import argparse
+import os
+import random
+import time
+from types import SimpleNamespace
+
+PALAVRAS = (
+    "python sql java liderança projetos dados análise cloud azure aws scrum gestão "
+    "desenvolvimento sistemas integração clientes equipe negociação inglês espanhol "
+    "relatórios indicadores processos suporte infraestrutura redes segurança"
+).split()
+
+
+def texto(rng, palavras):
+    return " ".join(rng.choices(PALAVRAS, k=palavras)).capitalize() + "."
+
+
+def pares_sinteticos(vagas, candidatos, seed=42):
+    rng = random.Random(seed)
+    pares = []
+    for v in range(vagas):
+        job = SimpleNamespace(
+            id=str(1000 + v), titulo=texto(rng, 4), cliente=texto(rng, 2), objetivo_vaga=texto(rng, 30),
+            tipo_contratacao="CLT", nivel_profissional="Sênior", nivel_academico="Superior completo",
+            nivel_ingles="Avançado", nivel_espanhol="Básico", atividades=texto(rng, 120),
+            competencias=texto(rng, 120), cidade="São Paulo", estado="SP", pais="Brasil"
+        )
+        applicants = [
+            SimpleNamespace(
+                id=str(50000 + v * candidatos + c), titulo_profissional=texto(rng, 4), area_atuacao=texto(rng, 3),
+                nivel_academico="Superior completo", nivel_ingles="Intermediário", nivel_espanhol="Básico",
+                conhecimentos_tecnicos=texto(rng, 60), certificacoes=texto(rng, 20), cv_pt=texto(rng, 400)
+            )
+            for c in range(candidatos)
+        ]
+        pares.append((job, applicants))
+    return pares
+
+
+def pares_do_banco(vagas, candidatos):
+    from db.database import Job, Prospect, Applicant, db
+
+    pares = []
+    for job in Job.query.filter(Job.fechada.is_(False)).limit(vagas).all():
+        ids = [p.applicant_id for p in Prospect.query.filter_by(job_id=job.id).order_by(Prospect.id).limit(candidatos).all()]
+        applicants = [a for a in (db.session.get(Applicant, i) for i in ids) if a]
+        if applicants:
+            pares.append((job, applicants))
+    return pares
+
+
+def montar(exec_triagem, pares, agrupar):
+    tarefas = []
+    for job, applicants in pares:
+        individuais = [
+            ({"job_id": job.id, "applicant_id": a.id, "job_hash": "", "cv_hash": "",
+              "prompt": exec_triagem.build_prompt(job, a)}, a)
+            for a in applicants
+        ]
+        if agrupar > 1:
+            tarefas.extend(exec_triagem.agrupar_tarefas(job, individuais, agrupar))
+        else:
+            tarefas.extend(t for t, _ in individuais)
+    return tarefas
+
+
+def responder_com_falhas(taxa, seed=7):
+    from utils.fake_openai import resposta_triagem_padrao
+
+    rng = random.Random(seed)
+
+    def responder(prompt):
+        content = resposta_triagem_padrao(prompt)
+        if '"resultados"' in content and rng.random() < taxa:
+            return "Desculpe, não consegui avaliar todos os candidatos."
+        return content
+    return responder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vagas", type=int, default=20)
+    parser.add_argument("--candidatos", type=int, default=5, help="candidatos por vaga")
+    parser.add_argument("--agrupar", type=int, nargs="+", default=[5, 10], help="tamanhos de grupo comparados")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--banco", action="store_true", help="usa vagas abertas e prospects de data/appdata.db")
+    parser.add_argument("--api", action="store_true", help="usa a API OpenAI de verdade (consome créditos)")
+    parser.add_argument("--latencia", type=float, default=0.8, help="latência fixa simulada por chamada (s)")
+    parser.add_argument("--latencia-por-token", type=float, default=0.02, help="latência simulada por token gerado (s)")
+    parser.add_argument("--falha-lote", type=float, default=0.0, help="fração de lotes com resposta inválida (falso)")
+    args = parser.parse_args()
+
+    if not args.api:
+        os.environ.setdefault("OPENAI_API_KEY", "fake")  # exec_agente_triagem cria o cliente ao ser importado
+    import exec_agente_triagem as exec_triagem
+    from models.saida_estruturada import ESQUEMA_TRIAGEM_PAR
+    from models.triagem_engine import TriagemEngine
+    from utils.fake_openai import FakeOpenAI
+
+    with exec_triagem.app.app_context():
+        if args.banco:
+            pares = pares_do_banco(args.vagas, args.candidatos)
+        else:
+            pares = pares_sinteticos(args.vagas, args.candidatos)
+        total_pares = sum(len(a) for _, a in pares)
+
+        print(f"{len(pares)} vagas, {total_pares} pares, workers={args.workers}, "
+              f"cliente={'OpenAI' if args.api else 'falso'}")
+        print(f"{'modo':<14} {'tempo':>8} {'chamadas':>9} {'tokens/par':>11} {'reenviados':>11} "
+              f"{'falhas':>7} {'|Δscore|':>9} {'Δ<=10':>7}")
+
+        referencia = None
+        for agrupar in [1] + [n for n in args.agrupar if n > 1]:
+            if args.api:
+                cliente = exec_triagem.client
+            else:
+                cliente = FakeOpenAI(latencia=args.latencia, jitter=args.latencia / 4,
+                                     latencia_por_token=args.latencia_por_token,
+                                     responder=responder_com_falhas(args.falha_lote))
+            engine = TriagemEngine(cliente, workers=args.workers, rpm=100000, tpm=10000000,
+                                   temperature=0.3, max_tokens=300, intervalo_progresso=0,
+                                   esquema=ESQUEMA_TRIAGEM_PAR, nome="triagem_lote")
+
+            linhas = []
+            tarefas = montar(exec_triagem, pares, agrupar)
+            inicio = time.perf_counter()
+            stats = engine.executar(tarefas, exec_triagem.parse_resultado, linhas.extend)
+            duracao = time.perf_counter() - inicio
+
+            scores = {(l["job_id"], l["applicant_id"]): l["score"] for l in linhas}
+            chamadas = cliente.chamadas if not args.api else len(stats.latencias)
+            concordancia = ""
+            if referencia is None:
+                referencia = scores
+            else:
+                comuns = [k for k in scores if k in referencia]
+                if comuns:
+                    diferencas = [abs(scores[k] - referencia[k]) for k in comuns]
+                    concordancia = (f"{sum(diferencas) / len(diferencas):>9.2f} "
+                                    f"{sum(d <= 10 for d in diferencas) / len(diferencas):>7.0%}")
+
+            modo = "individual" if agrupar == 1 else f"agrupar={agrupar}"
+            print(f"{modo:<14} {duracao:>7.1f}s {chamadas:>9} {stats.tokens / max(1, stats.sucesso):>11.0f} "
+                  f"{stats.reenviados:>11} {stats.falhas:>7} {concordancia}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,14 @@ from datetime import datetime
 
 db = SQLAlchemy()
 
+# Situações de prospect que encerram a vaga
+SITUACOES_FECHAMENTO = ("Contratado como Hunting", "Contratado pela Decision")
+
 class Job(db.Model):
     __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index("ix_jobs_fechada", "fechada"),
+    )
     id = db.Column(db.String, primary_key=True)
     titulo = db.Column(db.String)
     modalidade = db.Column(db.String)
@@ -35,6 +41,9 @@ class Job(db.Model):
     valor_compra_1 = db.Column(db.String)
     valor_compra_2 = db.Column(db.String)
 
+    # Vaga com algum prospect contratado; mantido por atualizar_status_vagas()
+    fechada = db.Column(db.Boolean, default=False)
+
 
 class Applicant(db.Model):
     __tablename__ = 'applicants'
@@ -57,6 +66,12 @@ class Applicant(db.Model):
 
 class Prospect(db.Model):
     __tablename__ = 'prospects'
+    __table_args__ = (
+        db.Index("ix_prospects_job_applicant", "job_id", "applicant_id", unique=True),
+        db.Index("ix_prospects_situacao_job", "situacao", "job_id"),
+        # Cobre o filtro por recrutador e o DISTINCT de /api/recrutadores sem ler a tabela
+        db.Index("ix_prospects_recrutador", "recrutador", "situacao", "job_id", "applicant_id"),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     job_id = db.Column(db.String, db.ForeignKey('jobs.id'))
     applicant_id = db.Column(db.String, db.ForeignKey('applicants.id'))
@@ -67,18 +82,31 @@ class Prospect(db.Model):
     ultima_atualizacao = db.Column(db.String)
     recrutador = db.Column(db.String)
 
+    # Hash dos campos importados, para a importação incremental
+    content_hash = db.Column(db.String(64))
+
 
 class MatchResult(db.Model):
     __tablename__ = 'match_results'
+    __table_args__ = (
+        db.Index("ix_match_results_job_applicant", "job_id", "applicant_id", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     job_id = db.Column(db.String, db.ForeignKey('jobs.id'))
     applicant_id = db.Column(db.String, db.ForeignKey('applicants.id'))
     score = db.Column(db.Float)
     keywords = db.Column(db.Text)
 
+    # Hashes do conteúdo usado no prompt, para a triagem incremental
+    job_hash = db.Column(db.String(64))
+    cv_hash = db.Column(db.String(64))
+
 
 class InterviewRecord(db.Model):
     __tablename__ = 'interviewrecord'
+    __table_args__ = (
+        db.Index("ix_interviewrecord_job_applicant", "job_id", "applicant_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.String(20))
     applicant_id = db.Column(db.String(20))
@@ -88,8 +116,36 @@ class InterviewRecord(db.Model):
     score = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class SessaoEntrevista(db.Model):
+    """
+    Estado de uma entrevista em andamento no servidor: contexto da vaga e do
+    currículo já condensados, turnos (pergunta/resposta) e resumo dos turnos
+    antigos. `inicio_recentes` é o índice do primeiro turno ainda não resumido.
+    `prefetch` guarda a próxima pergunta pré-gerada pela transcrição parcial
+    (ver models/prefetch_entrevista.py).
+    """
+    __tablename__ = "sessoes_entrevista"
+    __table_args__ = (
+        db.Index("ix_sessoes_entrevista_atualizada_em", "atualizada_em"),
+    )
+    id = db.Column(db.String(32), primary_key=True)
+    job_id = db.Column(db.String(20))
+    applicant_id = db.Column(db.String(20))
+    contexto_vaga = db.Column(db.Text)
+    contexto_cv = db.Column(db.Text)
+    turnos = db.Column(db.Text, default="[]")  # JSON: [{"question": ..., "answer": ...}]
+    pergunta_atual = db.Column(db.Text)
+    resumo = db.Column(db.Text, default="")
+    inicio_recentes = db.Column(db.Integer, default=0)
+    prefetch = db.Column(db.Text)  # JSON: {"base", "parcial", "pergunta", "duracao"}
+    criada_em = db.Column(db.DateTime, default=datetime.utcnow)
+    atualizada_em = db.Column(db.DateTime, default=datetime.utcnow)
+
 class HRInterview(db.Model):
     __tablename__ = 'HRInterview'
+    __table_args__ = (
+        db.Index("ix_hrinterview_job_applicant", "job_id", "applicant_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.String(20))
     applicant_id = db.Column(db.String(20))
@@ -98,13 +154,55 @@ class HRInterview(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class ArquivoUpload(db.Model):
+    """Currículo enviado, armazenado por conteúdo em uploads/<sha[:2]>/<sha[2:4]>/<sha>.pdf"""
+    __tablename__ = "arquivos_upload"
+    __table_args__ = (
+        db.Index("ix_arquivos_upload_ultimo_uso", "removido_em", "ultimo_uso_em"),
+    )
+    sha256 = db.Column(db.String(64), primary_key=True)
+    tamanho = db.Column(db.Integer)
+    nome_original = db.Column(db.String)
+    texto = db.Column(db.Text)  # texto extraído, reaproveitado em novos envios do mesmo arquivo
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    ultimo_uso_em = db.Column(db.DateTime, default=datetime.utcnow)
+    removido_em = db.Column(db.DateTime)  # arquivo apagado do disco pela retenção
+
+
 class TryItUser(db.Model):
     __tablename__ = "tryit_users"
+    __table_args__ = (
+        db.Index("ix_tryit_users_arquivo_job", "arquivo_sha256", "job_id"),
+        db.Index("ix_tryit_users_tarefa", "tarefa_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String)
     job_id = db.Column(db.String, db.ForeignKey("jobs.id"))
+    arquivo_sha256 = db.Column(db.String(64), db.ForeignKey("arquivos_upload.sha256"))
     score = db.Column(db.Float)
     keywords = db.Column(db.Text)
     resumo = db.Column(db.Text)
     nota = db.Column(db.Integer)
     data = db.Column(db.DateTime, default=datetime.utcnow)
+    tarefa_id = db.Column(db.Integer)  # tarefa da fila que criou o registro (retentativas não duplicam)
+
+
+def atualizar_status_vagas(job_ids=None, conn=None):
+    """
+    Recalcula Job.fechada a partir dos prospects das vagas indicadas (ou de
+    todas, sem `job_ids`). Deve ser chamada sempre que prospects forem
+    inseridos ou mudarem de situação; o commit fica com quem chama.
+    """
+    executor = conn if conn is not None else db.session
+    fechada = db.exists().where(
+        Prospect.job_id == Job.id,
+        Prospect.situacao.in_(SITUACOES_FECHAMENTO)
+    )
+
+    if job_ids is None:
+        executor.execute(db.update(Job).values(fechada=fechada))
+        return
+
+    job_ids = list(job_ids)
+    for i in range(0, len(job_ids), 500):
+        executor.execute(db.update(Job).where(Job.id.in_(job_ids[i:i + 500])).values(fechada=fechada))
@@ -0,0 +1,134 @@
+"""
+Migrações versionadas do banco SQLite.
+
+`db.create_all()` só cria tabelas ausentes; colunas e índices novos em
+bancos existentes (ex.: data/appdata.db) são aplicados aqui. A versão
+corrente fica na tabela `schema_version` e cada migração roda em sua
+própria transação, uma única vez. Migrações devem ser idempotentes, pois
+em um banco novo elas rodam depois do `create_all()`.
+
+Para adicionar uma migração, declare a mudança no modelo (db/database.py)
+e registre uma função com o próximo número de versão:
+
+    @migracao(7, "descrição")
+    def _m7(conn):
+        ...
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from db.database import db, Job, Prospect, MatchResult, InterviewRecord, HRInterview, TryItUser, SessaoEntrevista, atualizar_status_vagas
+
+MIGRACOES = []
+
+
+def migracao(versao, descricao):
+    """Decorador que registra uma função de migração."""
+    def decorador(func):
+        MIGRACOES.append((versao, descricao, func))
+        return func
+    return decorador
+
+
+def adicionar_colunas_ausentes(conn, *modelos):
+    """ALTER TABLE ADD COLUMN para as colunas declaradas nos modelos que faltam no banco."""
+    inspector = inspect(conn)
+    for modelo in modelos:
+        tabela = modelo.__table__
+        existentes = {c["name"] for c in inspector.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name not in existentes:
+                tipo = coluna.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE "{tabela.name}" ADD COLUMN "{coluna.name}" {tipo}'))
+
+
+def criar_indices(conn, *modelos):
+    """Cria os índices declarados em `__table_args__` que ainda não existem."""
+    for modelo in modelos:
+        for indice in modelo.__table__.indexes:
+            indice.create(conn, checkfirst=True)
+
+
+def remover_duplicatas(conn, tabela, colunas):
+    """Mantém apenas a linha mais recente (maior id) de cada chave."""
+    chave = ", ".join(colunas)
+    resultado = conn.execute(text(
+        f'DELETE FROM "{tabela}" WHERE id NOT IN (SELECT MAX(id) FROM "{tabela}" GROUP BY {chave})'
+    ))
+    return resultado.rowcount
+
+
+@migracao(1, "hashes de conteúdo em match_results e prospects")
+def _m1(conn):
+    adicionar_colunas_ausentes(conn, MatchResult, Prospect)
+
+
+@migracao(2, "índices por (job_id, applicant_id), situação e recrutador")
+def _m2(conn):
+    # Importações antigas duplicavam prospects; o índice único exige uma linha por par
+    for modelo in (Prospect, MatchResult):
+        removidas = remover_duplicatas(conn, modelo.__tablename__, ["job_id", "applicant_id"])
+        if removidas:
+            print(f"🧹 {removidas} linhas duplicadas removidas de {modelo.__tablename__}.")
+    criar_indices(conn, Prospect, MatchResult, InterviewRecord, HRInterview)
+    conn.execute(text("ANALYZE"))
+
+
+@migracao(3, "status materializado das vagas (jobs.fechada)")
+def _m3(conn):
+    adicionar_colunas_ausentes(conn, Job)
+    criar_indices(conn, Job)
+    atualizar_status_vagas(conn=conn)
+    conn.execute(text("ANALYZE jobs"))
+
+
+@migracao(4, "uploads endereçados por conteúdo (tryit_users.arquivo_sha256)")
+def _m4(conn):
+    adicionar_colunas_ausentes(conn, TryItUser)
+    criar_indices(conn, TryItUser)
+
+
+@migracao(5, "pré-geração da próxima pergunta (sessoes_entrevista.prefetch)")
+def _m5(conn):
+    adicionar_colunas_ausentes(conn, SessaoEntrevista)
+
+
+@migracao(6, "triagem do Try it idempotente (tryit_users.tarefa_id)")
+def _m6(conn):
+    adicionar_colunas_ausentes(conn, TryItUser)
+    criar_indices(conn, TryItUser)
+
+
+def _versao(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version "
+        "(versao INTEGER PRIMARY KEY, descricao TEXT, aplicada_em TEXT DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    return conn.execute(text("SELECT COALESCE(MAX(versao), 0) FROM schema_version")).scalar()
+
+
+def versao_atual():
+    with db.engine.begin() as conn:
+        return _versao(conn)
+
+
+def migrar():
+    """
+    Aplica as migrações pendentes. Deve ser chamada dentro de um
+    app_context, logo após `db.create_all()`.
+    """
+    for versao, descricao, func in sorted(MIGRACOES, key=lambda m: m[0]):
+        try:
+            with db.engine.begin() as conn:
+                if _versao(conn) >= versao:
+                    continue
+                func(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version (versao, descricao) VALUES (:versao, :descricao)"),
+                    {"versao": versao, "descricao": descricao}
+                )
+            print(f"🛠️ Migração {versao} aplicada: {descricao}")
+        except (IntegrityError, OperationalError):
+            # Outro processo (ex.: outro worker do gunicorn) aplicou ao mesmo tempo
+            if versao_atual() < versao:
+                raise
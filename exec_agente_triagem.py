@@ -1,13 +1,22 @@
 import os
 import json
+import argparse
+import hashlib
 import time
-import re
+from datetime import datetime
 import random
 import nltk
 from nltk.tokenize import sent_tokenize
 from flask import Flask
 from openai import OpenAI
 from db.database import db, Job, Applicant, Prospect, MatchResult
+from db.migrations import migrar
+from models.embeddings import MatrizCandidatos, texto_candidato, texto_vaga
+from models.triagem_engine import TriagemEngine
+from models import triagem_batch
+from models.saida_estruturada import ESQUEMA_TRIAGEM_PAR, ESQUEMA_TRIAGEM_LOTE, metricas_saida
+from utils.fake_openai import FakeOpenAI
+from utils.cache_respostas import invalidar
 
 try:
     nltk.data.find('tokenizers/punkt')
@@ -25,7 +34,8 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
 output_json_path = os.path.join(basedir, "match_results.json")
-results_json = []
+checkpoint_path = os.path.join(basedir, "data", "triagem_checkpoint.json")
+batches_path = os.path.join(basedir, "data", "batches")
 
 def truncate_text_smartly(text, max_length=1500):
     if len(text) <= max_length:
@@ -93,40 +103,51 @@ def extract_key_fields(obj, field_priorities):
     
     return "\n".join(result)
 
+JOB_PRIORITIES = [
+    ('titulo', 1, 100),
+    ('cliente', 1, 100),
+    ('objetivo_vaga', 1, 200),
+    ('tipo_contratacao', 2, 100),
+    ('nivel_profissional', 2, 100),
+    ('nivel_academico', 2, 100),
+    ('nivel_ingles', 3, 50),
+    ('nivel_espanhol', 3, 50),
+    ('atividades', 1, 400),
+    ('competencias', 1, 400),
+    ('cidade', 3, 50),
+    ('estado', 3, 50),
+    ('pais', 3, 50)
+]
+
+APPLICANT_PRIORITIES = [
+    ('titulo_profissional', 1, 100),
+    ('area_atuacao', 1, 100),
+    ('nivel_academico', 2, 100),
+    ('nivel_ingles', 2, 50),
+    ('nivel_espanhol', 2, 50),
+    ('conhecimentos_tecnicos', 1, 300),
+    ('certificacoes', 2, 200),
+    ('cv_pt', 1, 600)
+]
+
+def hash_conteudo(obj, field_priorities):
+    """
+    Hash SHA-256 dos campos que entram no prompt. Se nenhum deles mudar,
+    o resultado de uma triagem anterior continua válido.
+    """
+    h = hashlib.sha256()
+    for field, _, _ in field_priorities:
+        h.update(str(getattr(obj, field, None) or "").encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
 def build_prompt(job, applicant):
-    job_priorities = [
-        ('titulo', 1, 100),
-        ('cliente', 1, 100),
-        ('objetivo_vaga', 1, 200),
-        ('tipo_contratacao', 2, 100),
-        ('nivel_profissional', 2, 100),
-        ('nivel_academico', 2, 100),
-        ('nivel_ingles', 3, 50),
-        ('nivel_espanhol', 3, 50),
-        ('atividades', 1, 400),
-        ('competencias', 1, 400),
-        ('cidade', 3, 50),
-        ('estado', 3, 50),
-        ('pais', 3, 50)
-    ]
-    
-    job_description = extract_key_fields(job, job_priorities)
+    job_description = extract_key_fields(job, JOB_PRIORITIES)
     
     if len(job_description) > 1500:
         job_description = truncate_text_smartly(job_description, 1500)
     
-    applicant_priorities = [
-        ('titulo_profissional', 1, 100),
-        ('area_atuacao', 1, 100),
-        ('nivel_academico', 2, 100),
-        ('nivel_ingles', 2, 50),
-        ('nivel_espanhol', 2, 50),
-        ('conhecimentos_tecnicos', 1, 300),
-        ('certificacoes', 2, 200),
-        ('cv_pt', 1, 600)
-    ]
-    
-    applicant_text = extract_key_fields(applicant, applicant_priorities)
+    applicant_text = extract_key_fields(applicant, APPLICANT_PRIORITIES)
     
     if len(applicant_text) > 1500:
         applicant_text = truncate_text_smartly(applicant_text, 1500)
@@ -158,34 +179,85 @@ O CAMPO SCORE DEVE SER UM NÚMERO ENTRE 0 E 100 INDICANDO O MATCH ENTRE VAGA E C
 O CAMPO KEYWORDS DEVE CONTER ALGUMAS PALAVRAS-CHAVE IDENTIFICADAS NO CURRÍCULO DO CANDIDATO.
 """
 
-def try_parse_json(content):
-    try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        try:
-            fixed = re.sub(r"'", '"', content)
-            return json.loads(fixed)
-        except Exception:
-            return None
+# Em prompts agrupados cada currículo tem um limite menor que no prompt individual
+MAX_CHARS_CV_LOTE = 800
+TOKENS_SAIDA_POR_PAR = 60
+
+def build_prompt_lote(job, applicants):
+    """
+    Prompt com a vaga uma única vez e vários candidatos, cada um com seu ID,
+    pedindo um resultado por candidato (ESQUEMA_TRIAGEM_LOTE).
+    """
+    job_description = extract_key_fields(job, JOB_PRIORITIES)
+
+    if len(job_description) > 1500:
+        job_description = truncate_text_smartly(job_description, 1500)
+
+    blocos = []
+    for applicant in applicants:
+        applicant_text = extract_key_fields(applicant, APPLICANT_PRIORITIES)
+        if len(applicant_text) > MAX_CHARS_CV_LOTE:
+            applicant_text = truncate_text_smartly(applicant_text, MAX_CHARS_CV_LOTE)
+        blocos.append(f"### ID do candidato: {applicant.id}\n{applicant_text}")
+    candidatos = "\n\n".join(blocos)
+
+    return f"""
+Você é um analista de recrutamento senior, especializado em fazer triagem de curriculos e deve fazer uma triagem de currículos para saber se cada candidato deve passar para a próxima fase do processo seletivo.
+
+ID da vaga: {job.id}
+
+Com base na vaga abaixo:
+{job_description}
+
+Avalie cada um dos {len(applicants)} candidatos a seguir de forma independente:
+
+{candidatos}
+
+Para cada candidato, identifique o match com a vaga e as palavras-chave do currículo.
+
+Sua resposta deve ser exclusivamente um JSON seguindo o seguinte exemplo, com um item por candidato:
+{{
+    "resultados": [
+        {{"jobid": "{job.id}", "aplicantid": "{applicants[0].id}", "score": "87.5", "keywords": "Python, SQL, Teamwork, Ingles Fluente"}}
+    ]
+}}
 
-with app.app_context():
-    db.create_all()
-    MatchResult.query.delete()
+SUA RESPOSTA DEVE CONTER APENAS O JSON NESTE FORMATO E NADA MAIS.
+O CAMPO SCORE DEVE SER UM NÚMERO ENTRE 0 E 100 INDICANDO O MATCH ENTRE VAGA E CURRÍCULO.
+O CAMPO KEYWORDS DEVE CONTER ALGUMAS PALAVRAS-CHAVE IDENTIFICADAS NO CURRÍCULO DO CANDIDATO.
+"""
 
+def agrupar_tarefas(job, pares, tamanho):
+    """
+    Junta as tarefas individuais `pares` [(tarefa, applicant)] de uma vaga em
+    tarefas de até `tamanho` candidatos; as individuais ficam em
+    `subtarefas` para o reenvio quando o lote falha.
+    """
+    agrupadas = []
+    for inicio in range(0, len(pares), tamanho):
+        grupo = pares[inicio:inicio + tamanho]
+        if len(grupo) == 1:
+            agrupadas.append(grupo[0][0])
+            continue
+        agrupadas.append({
+            "job_id": job.id,
+            "applicant_id": ",".join(t["applicant_id"] for t, _ in grupo),
+            "prompt": build_prompt_lote(job, [a for _, a in grupo]),
+            "esquema": ESQUEMA_TRIAGEM_LOTE,
+            "nome": "triagem_lote_agrupada",
+            "max_tokens": TOKENS_SAIDA_POR_PAR * len(grupo) + 50,
+            "subtarefas": [t for t, _ in grupo]
+        })
+    return agrupadas
+
+def selecionar_vagas():
     preferred_job_ids = [
         100, 401, 728, 971, 972, 1123, 1426, 1813, 1530, 2417, 2420, 857,
         3124, 3345, 3840, 5984, 7142, 3175, 4153, 4735, 9265, 10148, 12328,
         12329, 12351, 2106, 7164, 9967, 9807, 7039
     ]
 
-    subquery = (
-        db.session.query(Prospect.job_id)
-        .filter(Prospect.situacao.in_([
-            "Contratado como Hunting",
-            "Contratado pela Decision"
-        ])).distinct()
-    )
-    vagas_abertas_query = Job.query.filter(~Job.id.in_(subquery))
+    vagas_abertas_query = Job.query.filter(Job.fechada.is_(False))
 
     preferred_jobs = vagas_abertas_query.filter(Job.id.in_(preferred_job_ids)).all()
     preferred_job_ids_valid = [job.id for job in preferred_jobs]
@@ -193,67 +265,327 @@ with app.app_context():
     all_other_jobs = vagas_abertas_query.filter(~Job.id.in_(preferred_job_ids_valid)).all()
     other_jobs = random.sample(all_other_jobs, min(30, len(all_other_jobs)))
 
-    vagas_abertas = preferred_jobs + other_jobs
     print(f"Usando {len(preferred_jobs)} vagas da lista fornecida e {len(other_jobs)} aleatórias.")
+    return preferred_jobs + other_jobs
+
+def carregar_checkpoint():
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def salvar_checkpoint(checkpoint):
+    checkpoint["atualizado_em"] = datetime.utcnow().isoformat()
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, checkpoint_path)
+
+def hashes_existentes(job_ids):
+    """Mapeia (job_id, applicant_id) -> (job_hash, cv_hash) dos resultados já salvos."""
+    rows = db.session.query(
+        MatchResult.job_id,
+        MatchResult.applicant_id,
+        MatchResult.job_hash,
+        MatchResult.cv_hash
+    ).filter(MatchResult.job_id.in_(job_ids)).all()
+    return {(r.job_id, r.applicant_id): (r.job_hash, r.cv_hash) for r in rows}
+
+def candidatos_prospects(vagas_abertas, limite=5):
+    """Seleção original: os `limite` primeiros prospects de cada vaga (0 = todos)."""
+    for job in vagas_abertas:
+        # Ordem de inserção explícita: sem ORDER BY o SQLite usaria a ordem do índice (job_id, applicant_id)
+        query = Prospect.query.filter_by(job_id=job.id).order_by(Prospect.id)
+        if limite:
+            query = query.limit(limite)
+        yield job, [p.applicant_id for p in query.all()]
 
-    total = 0
+def candidatos_pre_triagem(vagas_abertas, top_k, pool="todos"):
+    """
+    Pré-triagem local: ranqueia candidatos por similaridade TF-IDF entre a
+    vaga e o currículo e envia ao LLM apenas os `top_k` melhores de cada vaga.
 
-    for job in vagas_abertas:
-        prospects = Prospect.query.filter_by(job_id=job.id).limit(5).all()
-        print(f"🔍 Processando vaga {job.id} com {len(prospects)} candidatos...")
+    Args:
+        pool (str): "todos" considera todos os candidatos da base;
+            "prospects" apenas os que se candidataram à vaga
+    """
+    job_ids = [job.id for job in vagas_abertas]
+    query = db.session.query(
+        Applicant.id,
+        Applicant.titulo_profissional,
+        Applicant.conhecimentos_tecnicos,
+        Applicant.cv_pt
+    )
+    restricoes = None
 
+    if pool == "prospects":
+        prospects = db.session.query(Prospect.job_id, Prospect.applicant_id)\
+            .filter(Prospect.job_id.in_(job_ids)).all()
+        por_vaga = {}
         for p in prospects:
-            applicant = db.session.get(Applicant, p.applicant_id)
+            por_vaga.setdefault(p.job_id, []).append(p.applicant_id)
+        restricoes = [por_vaga.get(job_id, []) for job_id in job_ids]
+        query = query.filter(Applicant.id.in_({p.applicant_id for p in prospects}))
+
+    def carregar():
+        for row in query.execution_options(yield_per=2000):
+            yield row.id, texto_candidato(row)
+
+    inicio = time.perf_counter()
+    matriz = MatrizCandidatos.construir(carregar)
+    print(f"🧮 {len(matriz.ids)} candidatos vetorizados em {time.perf_counter() - inicio:.1f}s.")
+
+    rankings = matriz.ranquear([texto_vaga(job) for job in vagas_abertas], top_k, restricoes)
+    for job, ranking in zip(vagas_abertas, rankings):
+        yield job, [applicant_id for applicant_id, _ in ranking]
+
+def montar_tarefas(pares, incremental=False, job_ids=(), agrupar=1):
+    existentes = hashes_existentes(list(job_ids)) if incremental else {}
+    tarefas = []
+    inalterados = 0
+
+    for job, applicant_ids in pares:
+        print(f"🔍 Preparando vaga {job.id} com {len(applicant_ids)} candidatos...")
+        job_hash = hash_conteudo(job, JOB_PRIORITIES)
+        da_vaga = []
+
+        for applicant_id in applicant_ids:
+            applicant = db.session.get(Applicant, applicant_id)
             if not applicant:
                 continue
 
-            prompt = build_prompt(job, applicant)
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3,
-                    max_tokens=300
-                )
-
-                content = response.choices[0].message.content.strip()
-                print("GPT:", content)
-
-                json_data = try_parse_json(content)
-                if not json_data:
-                    print(f"Erro ao fazer parsing do JSON:\n{content}")
-                    continue
-
-                score_str = str(json_data["score"]).replace(",", ".")
-                score = float(score_str)
-
-                match = MatchResult(
-                    job_id=int(json_data["jobid"]),
-                    applicant_id=int(json_data["aplicantid"]),
-                    score=score,
-                    keywords=json_data["keywords"]
-                )
-                db.session.add(match)
-
-                # Salva no JSON de saída
-                results_json.append({
-                    "job_id": match.job_id,
-                    "applicant_id": match.applicant_id,
-                    "score": match.score,
-                    "keywords": match.keywords
-                })
-
-                # Salva incrementalmente em arquivo
-                with open(output_json_path, "w", encoding="utf-8") as f:
-                    json.dump(results_json, f, indent=2, ensure_ascii=False)
-
-                total += 1
-
-            except Exception as e:
-                print(f"Erro com job {job.id}, applicant {applicant.id}: {str(e)}")
+            cv_hash = hash_conteudo(applicant, APPLICANT_PRIORITIES)
+            if existentes.get((job.id, applicant.id)) == (job_hash, cv_hash):
+                inalterados += 1
                 continue
 
-            time.sleep(1.2)  # respeita o rate limit da OpenAI
+            da_vaga.append(({
+                "job_id": job.id,
+                "applicant_id": applicant.id,
+                "job_hash": job_hash,
+                "cv_hash": cv_hash,
+                "prompt": build_prompt(job, applicant)
+            }, applicant))
+
+        if agrupar > 1:
+            tarefas.extend(agrupar_tarefas(job, da_vaga, agrupar))
+        else:
+            tarefas.extend(t for t, _ in da_vaga)
+
+    if incremental:
+        print(f"♻️ {inalterados} pares inalterados desde a última triagem foram pulados.")
+    return tarefas
+
+def linha_resultado(tarefa, json_data):
+    return {
+        "job_id": tarefa["job_id"],
+        "applicant_id": tarefa["applicant_id"],
+        "score": json_data["score"],
+        "keywords": json_data["keywords"],
+        "job_hash": tarefa["job_hash"],
+        "cv_hash": tarefa["cv_hash"]
+    }
+
+def parse_resultado(tarefa, content):
+    # O motor já reparou e validou a resposta contra o esquema da tarefa
+    json_data = json.loads(content)
+    if "subtarefas" not in tarefa:
+        return linha_resultado(tarefa, json_data)
+
+    # Lote agrupado: candidatos ausentes (ou com ID inventado) ficam de fora e são reenviados
+    por_candidato = {r["aplicantid"]: r for r in json_data["resultados"]}
+    return [
+        linha_resultado(sub, por_candidato[sub["applicant_id"]])
+        for sub in tarefa["subtarefas"] if sub["applicant_id"] in por_candidato
+    ]
 
+def gravar_resultados(linhas):
+    # Remove resultados antigos dos pares reprocessados (conteúdo alterado)
+    pares = [(l["job_id"], l["applicant_id"]) for l in linhas]
+    MatchResult.query.filter(
+        db.tuple_(MatchResult.job_id, MatchResult.applicant_id).in_(pares)
+    ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(MatchResult, linhas)
     db.session.commit()
-    print(f"✅ {total} resultados salvos com sucesso.")
+    invalidar("triagem")
+
+def criar_salvador(checkpoint):
+    def salvar_resultados(linhas):
+        gravar_resultados(linhas)
+
+        checkpoint["processados"] += len(linhas)
+        salvar_checkpoint(checkpoint)
+
+    return salvar_resultados
+
+def exportar_json(job_ids):
+    """
+    Grava match_results.json a partir de MatchResult no fim da execução, com
+    todos os resultados das vagas triadas (inclusive os gravados antes de um --resume).
+    """
+    resultados = db.session.query(
+        MatchResult.job_id,
+        MatchResult.applicant_id,
+        MatchResult.score,
+        MatchResult.keywords,
+        MatchResult.job_hash,
+        MatchResult.cv_hash
+    ).filter(MatchResult.job_id.in_(job_ids)).order_by(MatchResult.job_id, MatchResult.applicant_id)
+
+    tmp_path = output_json_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump([dict(r._mapping) for r in resultados], f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_json_path)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Triagem de currículos das vagas abertas com GPT-4")
+    parser.add_argument("--workers", type=int, default=8, help="chamadas simultâneas ao LLM")
+    parser.add_argument("--rpm", type=int, default=500, help="orçamento de requisições por minuto")
+    parser.add_argument("--tpm", type=int, default=40000, help="orçamento de tokens por minuto")
+    parser.add_argument("--lote", type=int, default=25, help="resultados gravados por commit")
+    parser.add_argument("--incremental", action="store_true",
+                        help="mantém os resultados existentes e só reprocessa pares novos ou alterados")
+    parser.add_argument("--resume", action="store_true",
+                        help="retoma a execução interrompida a partir do checkpoint (implica --incremental)")
+    parser.add_argument("--pre-triagem", type=int, metavar="K", default=0,
+                        help="ranqueia candidatos por similaridade local e envia só os K melhores de cada vaga ao LLM")
+    parser.add_argument("--pool", choices=["todos", "prospects"], default="todos",
+                        help="candidatos considerados na pré-triagem (padrão: todos da base)")
+    parser.add_argument("--agrupar", type=int, metavar="N", default=1,
+                        help="avalia até N candidatos da mesma vaga por chamada (com reenvio individual se o lote falhar)")
+    parser.add_argument("--todas-vagas", action="store_true",
+                        help="triagem de todas as vagas abertas, em vez da lista fixa mais uma amostra aleatória")
+    parser.add_argument("--prospects-por-vaga", type=int, metavar="N", default=5,
+                        help="prospects avaliados por vaga sem pré-triagem (0 = todos)")
+    parser.add_argument("--batch", action="store_true",
+                        help="envia as chamadas pela Batch API (processamento em até 24h, custo menor) e ingere o resultado")
+    parser.add_argument("--batch-retomar", nargs="?", const="", metavar="ESTADO",
+                        help="retoma a execução em lote pendente mais recente (ou o arquivo de estado indicado)")
+    parser.add_argument("--batch-intervalo", type=float, default=60, help="segundos entre consultas ao status dos lotes")
+    parser.add_argument("--batch-timeout", type=float, default=None,
+                        help="para de esperar após N segundos; a execução é retomada depois com --batch-retomar")
+    parser.add_argument("--fake", action="store_true", help="usa o cliente OpenAI falso (benchmark local)")
+    return parser.parse_args()
+
+def executar_batch(llm, estado, args):
+    intervalo = min(args.batch_intervalo, 1) if args.fake else args.batch_intervalo
+    falhas = triagem_batch.executar(llm, estado, parse_resultado, gravar_resultados, intervalo=intervalo,
+                                    timeout=args.batch_timeout)
+    if falhas is None:
+        return
+
+    exportar_json(estado.get("job_ids") or triagem_batch.job_ids(estado))
+    for agente, contadores in metricas_saida()["agentes"].items():
+        print(f"🧩 Saída estruturada ({agente}): {contadores}")
+    print(f"✅ {estado['ingeridos']} resultados ingeridos de {estado['requisicoes']} requisições.")
+    if falhas:
+        print(f"⚠️ {len(falhas)} requisições falharam; rode novamente com --batch --incremental para reprocessá-las.")
+
+def main_batch(args, llm):
+    if args.batch_retomar is not None:
+        estado = (triagem_batch.carregar_estado(args.batch_retomar) if args.batch_retomar
+                  else triagem_batch.estado_pendente(batches_path))
+        if not estado:
+            print("Nenhuma execução em lote pendente.")
+            return
+        print(f"⏯️ Retomando a execução em lote {estado['nome']} ({estado['ingeridos']} resultados já ingeridos).")
+        executar_batch(llm, estado, args)
+        return
+
+    # Sem --incremental os resultados são substituídos par a par na ingestão, em vez de
+    # apagados no início: o dashboard mantém a triagem anterior enquanto o lote processa
+    vagas_abertas = Job.query.filter(Job.fechada.is_(False)).all() if args.todas_vagas else selecionar_vagas()
+    if args.pre_triagem:
+        pares = candidatos_pre_triagem(vagas_abertas, args.pre_triagem, args.pool)
+    else:
+        pares = candidatos_prospects(vagas_abertas, args.prospects_por_vaga)
+    tarefas = montar_tarefas(pares, incremental=args.incremental, job_ids=[job.id for job in vagas_abertas],
+                             agrupar=args.agrupar)
+    if not tarefas:
+        print("Nenhum par a triar.")
+        return
+
+    nome = "triagem_" + datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    estado = triagem_batch.preparar(tarefas, batches_path, nome, model="gpt-4", temperature=0.3, max_tokens=300)
+    estado["job_ids"] = [job.id for job in vagas_abertas]
+    triagem_batch.salvar_estado(estado)
+    print(f"📦 {estado['requisicoes']} requisições de {len(vagas_abertas)} vagas em {len(estado['partes'])} "
+          f"arquivo(s) ({estado['caminho']}).")
+    executar_batch(llm, estado, args)
+
+def main():
+    args = parse_args()
+    if args.batch or args.batch_retomar is not None:
+        llm = FakeOpenAI(pasta=os.path.join(batches_path, "fake")) if args.fake else client
+    else:
+        llm = FakeOpenAI() if args.fake else client
+    checkpoint = carregar_checkpoint() if args.resume else None
+    incremental = args.incremental or args.resume
+
+    with app.app_context():
+        db.create_all()
+        migrar()
+
+        if args.batch or args.batch_retomar is not None:
+            main_batch(args, llm)
+            return
+
+        if checkpoint:
+            # Reaproveita a mesma seleção de vagas (que inclui uma amostra aleatória)
+            vagas_abertas = Job.query.filter(Job.id.in_(checkpoint["job_ids"])).all()
+            print(f"⏯️ Retomando execução de {checkpoint['iniciado_em']} "
+                  f"({checkpoint['processados']} resultados já gravados).")
+        else:
+            if args.resume:
+                print("Nenhum checkpoint encontrado, iniciando nova execução incremental.")
+            elif not incremental:
+                MatchResult.query.delete()
+                db.session.commit()
+
+            if args.todas_vagas:
+                vagas_abertas = Job.query.filter(Job.fechada.is_(False)).all()
+            else:
+                vagas_abertas = selecionar_vagas()
+            checkpoint = {
+                "iniciado_em": datetime.utcnow().isoformat(),
+                "job_ids": [job.id for job in vagas_abertas],
+                "processados": 0
+            }
+            salvar_checkpoint(checkpoint)
+
+        if args.pre_triagem:
+            pares = candidatos_pre_triagem(vagas_abertas, args.pre_triagem, args.pool)
+        else:
+            pares = candidatos_prospects(vagas_abertas, args.prospects_por_vaga)
+        tarefas = montar_tarefas(pares, incremental=incremental, job_ids=[job.id for job in vagas_abertas],
+                                 agrupar=args.agrupar)
+        print(f"🚀 Disparando {len(tarefas)} chamadas com {args.workers} workers "
+              f"(RPM={args.rpm}, TPM={args.tpm})...")
+
+        engine = TriagemEngine(
+            llm,
+            model="gpt-4",
+            workers=args.workers,
+            rpm=args.rpm,
+            tpm=args.tpm,
+            temperature=0.3,
+            max_tokens=300,
+            tamanho_lote=args.lote,
+            esquema=ESQUEMA_TRIAGEM_PAR,
+            nome="triagem_lote"
+        )
+        stats = engine.executar(tarefas, parse_resultado, criar_salvador(checkpoint))
+        exportar_json(checkpoint["job_ids"])
+
+        print(f"📊 {stats.resumo()}")
+        for agente, contadores in metricas_saida()["agentes"].items():
+            print(f"🧩 Saída estruturada ({agente}): {contadores}")
+        print(f"✅ {stats.sucesso} resultados salvos com sucesso.")
+
+        if stats.falhas == 0:
+            os.remove(checkpoint_path)
+        else:
+            print(f"⚠️ {stats.falhas} pares falharam; rode novamente com --resume para reprocessá-los.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Configuração do gunicorn (lida automaticamente de ./gunicorn.conf.py).
+
+As threads de worker da fila (utils/fila.py) são iniciadas em cada worker
+do gunicorn depois que o app é carregado nele, e não no import: com
+--preload o app é importado no processo mestre, cujas threads não
+sobrevivem ao fork. Com FILA_WORKERS=0 a fila é consumida só por
+worker_fila.py.
+"""
+
+
+def post_worker_init(worker):
+    from utils.fila import iniciar_workers
+
+    iniciar_workers()
@@ -1,101 +1,257 @@
+"""
+Importa vagas, candidatos e prospects dos JSONs exportados para o SQLite.
+
+Os arquivos são lidos em streaming (ijson), item a item do dicionário de
+nível superior, e gravados em lotes com INSERT ... ON CONFLICT DO UPDATE,
+uma transação por lote. O consumo de memória não depende do tamanho dos
+arquivos.
+
+Prospects são importados por delta, com chave (vaga, código do candidato)
+e hash do conteúdo: linhas novas são inseridas, as alteradas atualizadas
+e as inalteradas ignoradas, então reimportar o mesmo arquivo não duplica
+a tabela. O status das vagas tocadas (Job.fechada) é recalculado no mesmo
+lote.
+
+Uso:
+    python import_json_to_db.py
+    python import_json_to_db.py --pasta json_files --lote 2000
+"""
+import argparse
+import hashlib
 import json
-from flask import Flask
-from db.database import db, Job, Applicant, Prospect
 import os
+import time
 
-app = Flask(__name__)
+import ijson
+from flask import Flask
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from db.database import db, Job, Applicant, Prospect, atualizar_status_vagas
+from db.migrations import migrar
+from indexar_candidatos import atualizar_indice
+from utils.cache_respostas import invalidar
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 db_path = os.path.join(basedir, "data", "appdata.db")
 
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
-
-    # Carrega os arquivos
-    with open("json_files/vagas.json", encoding="utf-8") as f:
-        vagas_json = json.load(f)
-
-    with open("json_files/applicants.json", encoding="utf-8") as f:
-        applicants_json = json.load(f)
-
-    with open("json_files/prospects.json", encoding="utf-8") as f:
-        prospects_json = json.load(f)
-
-    # Importa Jobs
-    for job_id, vaga in vagas_json.items():
-        info = vaga.get("informacoes_basicas", {})
-        perfil = vaga.get("perfil_vaga", {})
-        beneficios = vaga.get("beneficios", {})
-
-        job = Job(
-            id=job_id,
-            titulo=info.get("titulo_vaga", ""),
-            modalidade=vaga.get("modalidade", ""),
-            cliente=info.get("cliente", ""),
-            requisitante=info.get("requisitante", ""),
-            analista_responsavel=info.get("analista_responsavel", ""),
-            tipo_contratacao=info.get("tipo_contratacao", ""),
-            prazo_contratacao=info.get("prazo_contratacao", ""),
-            objetivo_vaga=info.get("objetivo_vaga", ""),
-            prioridade_vaga=info.get("prioridade_vaga", ""),
-            origem_vaga=info.get("origem_vaga", ""),
-            pais=perfil.get("pais", ""),
-            estado=perfil.get("estado", ""),
-            cidade=perfil.get("cidade", ""),
-            nivel_profissional=perfil.get("nivel profissional", ""),
-            nivel_academico=perfil.get("nivel_academico", ""),
-            nivel_ingles=perfil.get("nivel_ingles", ""),
-            nivel_espanhol=perfil.get("nivel_espanhol", ""),
-            atividades=perfil.get("principais_atividades", ""),
-            competencias=perfil.get("competencia_tecnicas_e_comportamentais", ""),
-            valor_venda=beneficios.get("valor_venda", ""),
-            valor_compra_1=beneficios.get("valor_compra_1", ""),
-            valor_compra_2=beneficios.get("valor_compra_2", "")
-        )
-        db.session.merge(job)
-
-    # Importa Applicants com mais campos
-    for applicant_id, dados in applicants_json.items():
-        info_basicas = dados.get("infos_basicas", {})
-        info_pessoais = dados.get("informacoes_pessoais", {})
-        info_profissionais = dados.get("informacoes_profissionais", {})
-        formacao = dados.get("formacao_e_idiomas", {})
-
-        a = Applicant(
-            id=applicant_id,
-            nome=info_pessoais.get("nome", ""),
-            email=info_pessoais.get("email", ""),
-            telefone=info_pessoais.get("telefone_celular", ""),
-            titulo_profissional=info_profissionais.get("titulo_profissional", ""),
-            area_atuacao=info_profissionais.get("area_atuacao", ""),
-            conhecimentos_tecnicos=info_profissionais.get("conhecimentos_tecnicos", ""),
-            certificacoes=info_profissionais.get("certificacoes", ""),
-            nivel_ingles=formacao.get("nivel_ingles", ""),
-            nivel_espanhol=formacao.get("nivel_espanhol", ""),
-            nivel_academico=formacao.get("nivel_academico", ""),
-            cv_pt=dados.get("cv_pt", "")
+TAMANHO_LOTE = 1000
+INTERVALO_PROGRESSO = 5  # segundos
+
+
+def mapear_vaga(job_id, vaga):
+    info = vaga.get("informacoes_basicas", {})
+    perfil = vaga.get("perfil_vaga", {})
+    beneficios = vaga.get("beneficios", {})
+
+    return dict(
+        id=job_id,
+        titulo=info.get("titulo_vaga", ""),
+        modalidade=vaga.get("modalidade", ""),
+        cliente=info.get("cliente", ""),
+        requisitante=info.get("requisitante", ""),
+        analista_responsavel=info.get("analista_responsavel", ""),
+        tipo_contratacao=info.get("tipo_contratacao", ""),
+        prazo_contratacao=info.get("prazo_contratacao", ""),
+        objetivo_vaga=info.get("objetivo_vaga", ""),
+        prioridade_vaga=info.get("prioridade_vaga", ""),
+        origem_vaga=info.get("origem_vaga", ""),
+        pais=perfil.get("pais", ""),
+        estado=perfil.get("estado", ""),
+        cidade=perfil.get("cidade", ""),
+        nivel_profissional=perfil.get("nivel profissional", ""),
+        nivel_academico=perfil.get("nivel_academico", ""),
+        nivel_ingles=perfil.get("nivel_ingles", ""),
+        nivel_espanhol=perfil.get("nivel_espanhol", ""),
+        atividades=perfil.get("principais_atividades", ""),
+        competencias=perfil.get("competencia_tecnicas_e_comportamentais", ""),
+        valor_venda=beneficios.get("valor_venda", ""),
+        valor_compra_1=beneficios.get("valor_compra_1", ""),
+        valor_compra_2=beneficios.get("valor_compra_2", "")
+    )
+
+
+def mapear_candidato(applicant_id, dados):
+    info_pessoais = dados.get("informacoes_pessoais", {})
+    info_profissionais = dados.get("informacoes_profissionais", {})
+    formacao = dados.get("formacao_e_idiomas", {})
+
+    return dict(
+        id=applicant_id,
+        nome=info_pessoais.get("nome", ""),
+        email=info_pessoais.get("email", ""),
+        telefone=info_pessoais.get("telefone_celular", ""),
+        titulo_profissional=info_profissionais.get("titulo_profissional", ""),
+        area_atuacao=info_profissionais.get("area_atuacao", ""),
+        conhecimentos_tecnicos=info_profissionais.get("conhecimentos_tecnicos", ""),
+        certificacoes=info_profissionais.get("certificacoes", ""),
+        nivel_ingles=formacao.get("nivel_ingles", ""),
+        nivel_espanhol=formacao.get("nivel_espanhol", ""),
+        nivel_academico=formacao.get("nivel_academico", ""),
+        cv_pt=dados.get("cv_pt", "")
+    )
+
+
+def mapear_prospects(job_id, vaga):
+    return [
+        dict(
+            job_id=job_id,
+            applicant_id=p["codigo"],
+            nome=p.get("nome", ""),
+            situacao=p.get("situacao_candidado", ""),
+            comentario=p.get("comentario", ""),
+            data_candidatura=p.get("data_candidatura", ""),
+            ultima_atualizacao=p.get("ultima_atualizacao", ""),
+            recrutador=p.get("recrutador", "")
         )
-        db.session.merge(a)
-
-
-    # Importa Prospects com mais campos
-    for job_id, vaga in prospects_json.items():
-        for p in vaga.get("prospects", []):
-            prospect = Prospect(
-                job_id=job_id,
-                applicant_id=p["codigo"],
-                nome=p.get("nome", ""),
-                situacao=p.get("situacao_candidado", ""),
-                comentario=p.get("comentario", ""),
-                data_candidatura=p.get("data_candidatura", ""),
-                ultima_atualizacao=p.get("ultima_atualizacao", ""),
-                recrutador=p.get("recrutador", "")
-            )
-            db.session.add(prospect)
-
-    db.session.commit()
-    print("✅ Dados importados com sucesso!")
+        for p in vaga.get("prospects", [])
+    ]
+
+
+def hash_prospect(linha):
+    return hashlib.sha256(json.dumps(linha, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class DeltaProspects:
+    """Grava lotes de prospects comparando com o que já está no banco."""
+
+    def __init__(self):
+        self.novos = 0
+        self.alterados = 0
+        self.inalterados = 0
+
+    def __call__(self, lote):
+        # Última ocorrência vence se o JSON repetir um candidato na mesma vaga
+        por_chave = {}
+        for linha in lote:
+            linha["content_hash"] = hash_prospect(linha)
+            por_chave[(linha["job_id"], linha["applicant_id"])] = linha
+
+        existentes = {
+            (row.job_id, row.applicant_id): row
+            for row in db.session.query(Prospect.id, Prospect.job_id, Prospect.applicant_id, Prospect.content_hash)
+            .filter(Prospect.job_id.in_({job_id for job_id, _ in por_chave}))
+        }
+
+        inserir, atualizar = [], []
+        for chave, linha in por_chave.items():
+            atual = existentes.get(chave)
+            if atual is None:
+                inserir.append(linha)
+            elif atual.content_hash != linha["content_hash"]:
+                atualizar.append(dict(linha, id=atual.id))
+            else:
+                self.inalterados += 1
+
+        if inserir:
+            db.session.execute(insert(Prospect.__table__), inserir)
+        if atualizar:
+            db.session.execute(update(Prospect), atualizar)
+        self.novos += len(inserir)
+        self.alterados += len(atualizar)
+
+        # Mantém Job.fechada em dia na mesma transação do lote
+        atualizar_status_vagas({linha["job_id"] for linha in inserir + atualizar})
+
+    def resumo(self):
+        return f"{self.novos} novos, {self.alterados} alterados, {self.inalterados} inalterados"
+
+
+def iterar_json(caminho):
+    """Pares (chave, valor) do objeto de nível superior, um por vez."""
+    with open(caminho, "rb") as f:
+        yield from ijson.kvitems(f, "", use_float=True)
+
+
+class Progresso:
+    def __init__(self, nome):
+        self.nome = nome
+        self.linhas = 0
+        self.inicio = self.ultimo = time.perf_counter()
+
+    def avancar(self, linhas):
+        self.linhas += linhas
+        agora = time.perf_counter()
+        if agora - self.ultimo >= INTERVALO_PROGRESSO:
+            self.ultimo = agora
+            print(f"   {self.nome}: {self.linhas} linhas ({self.linhas / (agora - self.inicio):.0f} linhas/s)")
+
+    def finalizar(self):
+        duracao = time.perf_counter() - self.inicio
+        print(f"✅ {self.nome}: {self.linhas} linhas em {duracao:.1f}s ({self.linhas / max(duracao, 1e-9):.0f} linhas/s)")
+
+
+def upsert(modelo, linhas):
+    """INSERT ... ON CONFLICT(id) DO UPDATE em executemany."""
+    tabela = modelo.__table__
+    stmt = sqlite_insert(tabela)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[c.name for c in tabela.primary_key],
+        set_={c.name: stmt.excluded[c.name] for c in tabela.columns if not c.primary_key and c.name in linhas[0]}
+    )
+    db.session.execute(stmt, linhas)
+
+
+def importar(caminho, nome, mapear, gravar, tamanho_lote=TAMANHO_LOTE):
+    """
+    Lê `caminho` em streaming, converte cada item com `mapear` (uma linha
+    ou lista de linhas) e chama `gravar(lote)` a cada `tamanho_lote` linhas,
+    com commit por lote.
+    """
+    progresso = Progresso(nome)
+    lote = []
+
+    def descarregar():
+        gravar(lote)
+        db.session.commit()
+        progresso.avancar(len(lote))
+        lote.clear()
+
+    for chave, valor in iterar_json(caminho):
+        linhas = mapear(chave, valor)
+        if isinstance(linhas, dict):
+            lote.append(linhas)
+        else:
+            lote.extend(linhas)
+        if len(lote) >= tamanho_lote:
+            descarregar()
+    if lote:
+        descarregar()
+
+    progresso.finalizar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pasta", default="json_files", help="pasta com vagas.json, applicants.json e prospects.json")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="linhas por transação")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        migrar()
+
+        importar(os.path.join(args.pasta, "vagas.json"), "vagas", mapear_vaga,
+                 lambda lote: upsert(Job, lote), args.lote)
+        importar(os.path.join(args.pasta, "applicants.json"), "candidatos", mapear_candidato,
+                 lambda lote: upsert(Applicant, lote), args.lote)
+        delta = DeltaProspects()
+        importar(os.path.join(args.pasta, "prospects.json"), "prospects", mapear_prospects, delta, args.lote)
+        print(f"   prospects: {delta.resumo()}")
+
+        print("✅ Dados importados com sucesso!")
+
+        # Descarta as respostas cacheadas do dashboard em todos os workers
+        invalidar("vagas", "candidatos", "prospects")
+
+        # Anexa ao índice vetorial apenas os currículos novos ou alterados
+        atualizar_indice()
+
+
+if __name__ == "__main__":
+    main()
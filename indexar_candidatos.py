@@ -0,0 +1,68 @@
+"""
+Constrói ou atualiza o índice vetorial dos currículos
+(models/vector_index.py) usado por /api/melhores_candidatos/<job_id>.
+
+Uso:
+    python indexar_candidatos.py                  # anexa candidatos novos/alterados
+    python indexar_candidatos.py --reconstruir    # recalcula IDF e centróides
+"""
+import argparse
+import os
+
+from flask import Flask
+
+from db.database import db, Applicant
+from models.embeddings import texto_candidato
+from models.vector_index import IndiceCandidatos
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+db_path = os.path.join(basedir, "data", "appdata.db")
+
+# Com muitas entradas anexadas desde a última construção, os centróides e
+# o IDF ficam defasados e as linhas obsoletas ocupam espaço
+LIMITE_REBUILD = 0.3
+
+
+def carregar_candidatos():
+    query = db.session.query(
+        Applicant.id,
+        Applicant.titulo_profissional,
+        Applicant.conhecimentos_tecnicos,
+        Applicant.cv_pt
+    ).execution_options(yield_per=2000)
+    for row in query:
+        yield row.id, texto_candidato(row)
+
+
+def atualizar_indice(reconstruir=False):
+    """Precisa de um app context ativo."""
+    if reconstruir or not IndiceCandidatos.existe():
+        return IndiceCandidatos.construir(carregar_candidatos)
+
+    indice = IndiceCandidatos.abrir()
+    anexados = indice.adicionar(carregar_candidatos())
+    indice = IndiceCandidatos.abrir()  # instância recarregada com as entradas anexadas
+    print(f"📚 {anexados} candidatos anexados ao índice ({len(indice)} no total).")
+
+    construidos = indice.meta.get("entradas", 0) or 1
+    if (len(indice.ids) - construidos) / construidos > LIMITE_REBUILD:
+        print("⚠️ Índice com muitas alterações desde a última construção; considere --reconstruir.")
+    return indice
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reconstruir", action="store_true", help="reconstrói o índice do zero")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        atualizar_indice(args.reconstruir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 from openai import OpenAI
 import os
+from models.llm_cache import completar_chat, completar_chat_stream
+from models.saida_estruturada import completar_estruturado, ErroSaidaEstruturada, ESQUEMA_TRIAGEM, ESQUEMA_AVALIACAO
+from models.orcamento_prompt import condensar_vaga, condensar_candidato, condensar_texto, condensar_historico, ORCAMENTO_CURRICULO
 
 api_key = os.environ.get("OPENAI_API_KEY")
 client = OpenAI(api_key=api_key)
@@ -10,50 +13,31 @@ def agente_avaliar_entrevista(questions, responses):
 Você é um avaliador de entrevistas. Com base nas perguntas e respostas abaixo, escreva um relatório resumido e dê uma pontuação de 1 a 5, onde 1 é inadequado e 5 é altamente recomendado.
 
 {combined}
-"""
-
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
-        max_tokens=500
-    )
-
-    summary = response.choices[0].message.content
-    score = next((int(s) for s in summary if s.isdigit()), 3)
-    return summary, score
-
-
-def agente_entrevistador(job, applicant, history):
-    job_description = f"""
-Título: {job['informacoes_basicas'].get('titulo_vaga', '')}
-Cliente: {job['informacoes_basicas'].get('cliente', '')}
-Objetivo: {job['informacoes_basicas'].get('objetivo_vaga', '')}
-Tipo de Contratação: {job['informacoes_basicas'].get('tipo_contratacao', '')}
-
-Nível Profissional: {job['perfil_vaga'].get('nivel_profissional', '')}
-Nível Acadêmico: {job['perfil_vaga'].get('nivel_academico', '')}
-Inglês: {job['perfil_vaga'].get('nivel_ingles', '')}
-Espanhol: {job['perfil_vaga'].get('nivel_espanhol', '')}
-Atividades: {job['perfil_vaga'].get('principais_atividades', '')}
-Competências: {job['perfil_vaga'].get('competencia_tecnicas_e_comportamentais', '')}
-"""[:1000]
 
-    resume_text = f"""
-Nome: {applicant.get('nome', '')}
-Área de Atuação: {applicant.get('area_atuacao', '')}
-Nível Acadêmico: {applicant.get('nivel_academico', '')}
-Inglês: {applicant.get('nivel_ingles', '')}
-Espanhol: {applicant.get('nivel_espanhol', '')}
-
-Resumo do CV:
-{applicant.get('cv_pt', '')}
-"""[:1000]
-
-    previous = "\n".join([f"Pergunta: {q}\nResposta: {a}" for q, a in history if q and a])
+Retorne um JSON com os campos "resumo" (o relatório) e "score" (inteiro de 1 a 5).
+"""
 
+    try:
+        avaliacao = completar_estruturado(
+            client,
+            model="gpt-4",
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            esquema=ESQUEMA_AVALIACAO,
+            nome="avaliar_entrevista",
+            temperature=0.7,
+            max_tokens=500
+        )
+    except ErroSaidaEstruturada as e:
+        # Sem nota confiável: aproveita o resumo que veio e deixa a nota em aberto
+        return (e.dados or {}).get("resumo") or e.conteudo or "", None
+
+    return avaliacao["resumo"], avaliacao["score"]
+
+
+def prompt_entrevista(job_description, resume_text, previous):
+    """Prompt do entrevistador a partir dos textos já condensados da vaga, do currículo e do histórico."""
     prompt = f"""
 Você é um especialista em RH, experiente em primeiras entrevistas, você está conduzindo uma entrevista. Com base na vaga e currículo abaixo:
 
@@ -73,32 +57,74 @@ Não explique, não adicione introduções. Apenas retorne a próxima pergunta d
 """
     
     print(prompt)
+    return prompt
+
+
+def prompt_entrevistador(job, applicant, history):
+    # Vaga, currículo e histórico dentro do orçamento de tokens de cada seção
+    return prompt_entrevista(condensar_vaga(job), condensar_candidato(applicant), condensar_historico(history))
 
-    response = client.chat.completions.create(
+
+def agente_entrevistador(prompt):
+    content = completar_chat(
+        client,
         model="gpt-4",
         messages=[{ "role": "user", "content": prompt }],
         temperature=0.7,
         max_tokens=150
     )
 
-    return response.choices[0].message.content.strip()
+    return content.strip()
+
+
+def agente_entrevistador_stream(prompt):
+    """
+    Mesma pergunta de `agente_entrevistador`, gerada pedaço a pedaço
+    (streaming da API OpenAI) para que a interface exiba e fale o texto
+    antes de a resposta completa ficar pronta.
+    """
+    yield from completar_chat_stream(
+        client,
+        model="gpt-4",
+        messages=[{ "role": "user", "content": prompt }],
+        temperature=0.7,
+        max_tokens=150
+    )
+
+
+def agente_resumir_entrevista(resumo, turnos):
+    """
+    Resumo acumulado da entrevista: incorpora os `turnos` (pares pergunta,
+    resposta) ao `resumo` anterior, para que os turnos antigos saiam do prompt.
+    """
+    novos = "\n".join(f"Pergunta: {q}\nResposta: {a}" for q, a in turnos)
+    prompt = f"""
+Você está acompanhando uma entrevista de emprego. Atualize o resumo abaixo incorporando as novas perguntas e respostas.
+Mantenha apenas os fatos relevantes sobre o candidato (experiências, habilidades, motivações e pontos a aprofundar), em no máximo 120 palavras.
+
+Resumo atual:
+{resumo or "Nenhum."}
+
+Novas perguntas e respostas:
+{novos}
+
+Retorne apenas o resumo atualizado.
+"""
+
+    content = completar_chat(
+        client,
+        model="gpt-4",
+        messages=[{ "role": "user", "content": prompt }],
+        temperature=0.3,
+        max_tokens=250
+    )
+
+    return content.strip()
 
 
 def agente_triagem_cvs(job, cv_text):
-    job_description = f"""
-Título: {job['informacoes_basicas'].get('titulo_vaga', '')}
-Cliente: {job['informacoes_basicas'].get('cliente', '')}
-Objetivo: {job['informacoes_basicas'].get('objetivo_vaga', '')}
-Tipo de Contratação: {job['informacoes_basicas'].get('tipo_contratacao', '')}
-Nível Profissional: {job['perfil_vaga'].get('nivel_profissional', '')}
-Nível Acadêmico: {job['perfil_vaga'].get('nivel_academico', '')}
-Inglês: {job['perfil_vaga'].get('nivel_ingles', '')}
-Espanhol: {job['perfil_vaga'].get('nivel_espanhol', '')}
-Atividades: {job['perfil_vaga'].get('principais_atividades', '')}
-Competências: {job['perfil_vaga'].get('competencia_tecnicas_e_comportamentais', '')}
-"""[:1000]
-
-    resume_text = f"{cv_text}"[:1000]
+    job_description = condensar_vaga(job)
+    resume_text = condensar_texto(cv_text, ORCAMENTO_CURRICULO)
 
     prompt = f"""
 Você é um analista de recrutamento sênior. Analise o currículo a seguir e retorne um JSON com a nota de match da vaga, palavras-chaves do curriculo e nome do candidato.
@@ -119,11 +145,13 @@ Formato de resposta obrigatório:
 SOMENTE retorne esse JSON, sem texto explicativo.
 """
 
-    response = client.chat.completions.create(
+    # Dicionário validado {"nome", "score", "keywords"}; ErroSaidaEstruturada se o modelo não corrigir a resposta
+    return completar_estruturado(
+        client,
         model="gpt-4",
         messages=[{ "role": "user", "content": prompt }],
+        esquema=ESQUEMA_TRIAGEM,
+        nome="triagem_cvs",
         temperature=0.7,
         max_tokens=200
     )
-
-    return response.choices[0].message.content.strip()
@@ -0,0 +1,166 @@
+"""
+Vetores locais de vagas e currículos para pré-triagem, sem chamadas à API.
+
+Usa TF-IDF sobre unigramas e bigramas com o "hashing trick" (cada termo é
+mapeado para uma de `dim` colunas por CRC32), de modo que a matriz tem
+largura fixa e não depende de um vocabulário guardado em memória. Os
+vetores são normalizados (L2), então o produto interno é a similaridade de
+cosseno e o ranking de todos os candidatos para um conjunto de vagas é uma
+única multiplicação de matrizes.
+"""
+import math
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+DIM_PADRAO = 2048
+
+STOPWORDS = set("""
+a ao aos as ate com como da das de dem do dos e ela ele em entre era essa esse esta
+este eu foi ha isso isto ja la mais mas me mesmo meu minha muito na nas nao no nos
+nossa nosso num numa o os ou para pela pelas pelo pelos por qual quando que quem se
+sem ser seu sua sao so tambem te tem ter um uma umas uns voce sobre ate apos bem
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos, tokens alfanuméricos (mantém c++, c#, .net)."""
+    texto = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii").lower()
+    return [t for t in TOKEN_RE.findall(texto) if len(t) > 1 and t not in STOPWORDS]
+
+
+def texto_vaga(job):
+    partes = [job.titulo, job.atividades, job.competencias]
+    return "\n".join(p for p in partes if p)
+
+
+def texto_candidato(applicant):
+    partes = [
+        getattr(applicant, "titulo_profissional", None),
+        getattr(applicant, "conhecimentos_tecnicos", None),
+        getattr(applicant, "cv_pt", None)
+    ]
+    return "\n".join(p for p in partes if p)
+
+
+class VetorizadorHashing:
+    """
+    TF-IDF com hashing. `ajustar` calcula o IDF a partir de um corpus
+    (tipicamente todos os currículos); `transformar` gera a matriz
+    float32 normalizada.
+    """
+
+    def __init__(self, dim=DIM_PADRAO):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def _colunas(self, texto):
+        tokens = normalizar(texto)
+        termos = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        contagem = {}
+        for termo in termos:
+            coluna = zlib.crc32(termo.encode("utf-8")) % self.dim
+            contagem[coluna] = contagem.get(coluna, 0) + 1
+        return contagem
+
+    def ajustar(self, textos):
+        df = np.zeros(self.dim, dtype=np.float64)
+        n = 0
+        for texto in textos:
+            colunas = list(self._colunas(texto))
+            if colunas:
+                df[colunas] += 1
+            n += 1
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def transformar(self, textos):
+        textos = list(textos)
+        matriz = np.zeros((len(textos), self.dim), dtype=np.float32)
+        for i, texto in enumerate(textos):
+            for coluna, tf in self._colunas(texto).items():
+                matriz[i, coluna] = 1 + math.log(tf)
+        matriz *= self.idf
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        normas[normas == 0] = 1
+        matriz /= normas
+        return matriz
+
+
+class MatrizCandidatos:
+    """
+    Vetores de todos os candidatos de um pool em uma matriz NumPy (uma
+    linha por candidato), construída em blocos para limitar a memória.
+    """
+
+    def __init__(self, vetorizador, ids, matriz):
+        self.vetorizador = vetorizador
+        self.ids = ids
+        self.matriz = matriz
+        self._posicao = {applicant_id: i for i, applicant_id in enumerate(ids)}
+
+    @classmethod
+    def construir(cls, carregar, dim=DIM_PADRAO, bloco=2000):
+        """
+        Args:
+            carregar (callable): Devolve um iterador novo de (applicant_id, texto)
+                a cada chamada; é percorrido duas vezes (IDF e vetores)
+        """
+        vetorizador = VetorizadorHashing(dim).ajustar(texto for _, texto in carregar())
+
+        ids, blocos, pendentes = [], [], []
+        for applicant_id, texto in carregar():
+            ids.append(applicant_id)
+            pendentes.append(texto)
+            if len(pendentes) >= bloco:
+                blocos.append(vetorizador.transformar(pendentes))
+                pendentes = []
+        if pendentes:
+            blocos.append(vetorizador.transformar(pendentes))
+
+        matriz = np.vstack(blocos) if blocos else np.zeros((0, dim), dtype=np.float32)
+        return cls(vetorizador, ids, matriz)
+
+    def ranquear(self, textos_vagas, top_k, restricoes=None, bloco=256):
+        """
+        Top-K candidatos por vaga pela similaridade de cosseno.
+
+        Args:
+            textos_vagas (list): Texto de cada vaga
+            top_k (int): Quantidade de candidatos por vaga
+            restricoes (list): Opcional; para cada vaga, ids de candidatos
+                elegíveis (ex.: apenas os prospects da vaga) ou None
+        Returns:
+            list: Para cada vaga, lista de (applicant_id, similaridade) em ordem decrescente
+        """
+        consultas = self.vetorizador.transformar(textos_vagas)
+        resultados = []
+
+        for inicio in range(0, len(consultas), bloco):
+            similaridades = consultas[inicio:inicio + bloco] @ self.matriz.T
+
+            for j, linha in enumerate(similaridades):
+                restricao = restricoes[inicio + j] if restricoes else None
+                if restricao is not None:
+                    posicoes = np.array([self._posicao[a] for a in restricao if a in self._posicao], dtype=np.int64)
+                    if len(posicoes) == 0:
+                        resultados.append([])
+                        continue
+                    linha = linha[posicoes]
+                else:
+                    posicoes = None
+
+                k = min(top_k, len(linha))
+                if k == 0:
+                    resultados.append([])
+                    continue
+                melhores = np.argpartition(-linha, k - 1)[:k]
+                melhores = melhores[np.argsort(-linha[melhores])]
+                indices = posicoes[melhores] if posicoes is not None else melhores
+                resultados.append([(self.ids[i], float(linha[m])) for i, m in zip(indices, melhores)])
+
+        return resultados
@@ -0,0 +1,117 @@
+"""
+Cache endereçado por conteúdo das respostas do LLM, compartilhado por todos
+os agentes de `models/ai_agents.py`.
+
+A chave é o SHA-256 do modelo, das mensagens e dos parâmetros de
+amostragem; prompts idênticos (a mesma vaga e currículo re-triados em
+/SimulacaoEntrevista, o mesmo PDF reenviado em /tryit/apply) são
+respondidos a partir do cache, sem nova chamada à API.
+
+Configuração por variáveis de ambiente:
+    LLM_CACHE=0              desliga o cache
+    LLM_CACHE_PATH           arquivo SQLite (padrão: data/llm_cache.db)
+    LLM_CACHE_TTL            validade em segundos (padrão: 7 dias)
+    LLM_CACHE_MAX_ITENS      limite da camada SQLite (padrão: 50000)
+    LLM_CACHE_LRU_ITENS      limite da camada em memória (padrão: 512)
+"""
+import hashlib
+import json
+import os
+
+from utils.cache import CacheEmCamadas, LRUCache, SQLiteCache
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _cache_padrao():
+    if os.environ.get("LLM_CACHE", "1") == "0":
+        return None
+
+    ttl = float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))
+    caminho = os.environ.get("LLM_CACHE_PATH", os.path.join(basedir, "data", "llm_cache.db"))
+    return CacheEmCamadas(
+        LRUCache(max_itens=int(os.environ.get("LLM_CACHE_LRU_ITENS", 512)), ttl=ttl),
+        SQLiteCache(caminho, max_itens=int(os.environ.get("LLM_CACHE_MAX_ITENS", 50000)), ttl=ttl,
+                    tabela="llm_respostas")
+    )
+
+
+_cache = _cache_padrao()
+
+
+def configurar_cache(cache):
+    """
+    Substitui o cache usado pelos agentes. Aceita qualquer objeto com
+    `get(chave)` e `set(chave, valor)` (ex.: um `LRUCache` isolado em
+    testes) ou None para desligar.
+    """
+    global _cache
+    _cache = cache
+
+
+def obter_cache():
+    return _cache
+
+
+def chave_llm(model, messages, **params):
+    """Hash canônico (SHA-256) do modelo, mensagens e parâmetros da chamada."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def completar_chat(client, model, messages, **params):
+    """
+    Equivalente a `client.chat.completions.create(...)` que devolve apenas o
+    texto da resposta, consultando o cache antes de chamar a API.
+    """
+    chave = chave_llm(model, messages, **params) if _cache is not None else None
+
+    if chave is not None:
+        content = _cache.get(chave)
+        if content is not None:
+            return content
+
+    response = client.chat.completions.create(model=model, messages=messages, **params)
+    content = response.choices[0].message.content
+
+    if chave is not None and content:
+        _cache.set(chave, content)
+    return content
+
+
+def completar_chat_stream(client, model, messages, **params):
+    """
+    Versão em streaming de `completar_chat`: gera os pedaços de texto à
+    medida que chegam da API. Um acerto no cache é devolvido de uma vez; a
+    resposta completa é gravada no cache ao fim do stream.
+    """
+    chave = chave_llm(model, messages, **params) if _cache is not None else None
+
+    if chave is not None:
+        content = _cache.get(chave)
+        if content is not None:
+            yield content
+            return
+
+    partes = []
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        pedaco = chunk.choices[0].delta.content
+        if pedaco:
+            partes.append(pedaco)
+            yield pedaco
+
+    if chave is not None and partes:
+        _cache.set(chave, "".join(partes))
+
+
+def metricas_cache():
+    if _cache is None:
+        return {"ativo": False}
+    metricas = _cache.metricas() if hasattr(_cache, "metricas") else {"total": _cache.stats.as_dict()}
+    return {"ativo": True, **metricas}
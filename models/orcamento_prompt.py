@@ -0,0 +1,250 @@
+"""
+Orçamento de tokens dos prompts dos agentes.
+
+Substitui o corte fixo em 1000 caracteres: o texto de cada seção (campos da
+vaga, campos e resumo do currículo, histórico da entrevista) é medido em
+tokens e recebe uma fatia do orçamento do prompt conforme sua prioridade,
+com as mesmas tuplas (campo, prioridade, máximo) de
+`models/ai_agents_nltk.py`, agora com o máximo em tokens.
+
+A contagem usa o tokenizer do modelo via `tiktoken` quando instalado e com
+o vocabulário disponível localmente; sem ele, uma estimativa por palavras
+e pontuação. A forma condensada de cada vaga e currículo fica em cache
+(LRU pelo hash do conteúdo), então é calculada uma vez e não a cada
+pergunta da entrevista.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+
+from utils.cache import LRUCache
+
+MODELO = "gpt-4"
+
+# (campo, rótulo, prioridade, máximo de tokens); prioridade 1 é atendida primeiro
+PRIORIDADES_VAGA = [
+    ("informacoes_basicas.titulo_vaga", "Título", 1, 30),
+    ("informacoes_basicas.cliente", "Cliente", 1, 25),
+    ("informacoes_basicas.objetivo_vaga", "Objetivo", 1, 50),
+    ("informacoes_basicas.tipo_contratacao", "Tipo de Contratação", 2, 25),
+    ("perfil_vaga.nivel_profissional", "Nível Profissional", 2, 25),
+    ("perfil_vaga.nivel_academico", "Nível Acadêmico", 2, 25),
+    ("perfil_vaga.nivel_ingles", "Inglês", 3, 12),
+    ("perfil_vaga.nivel_espanhol", "Espanhol", 3, 12),
+    ("perfil_vaga.principais_atividades", "Atividades", 1, 150),
+    ("perfil_vaga.competencia_tecnicas_e_comportamentais", "Competências", 1, 150),
+]
+
+PRIORIDADES_CANDIDATO = [
+    ("nome", "Nome", 1, 25),
+    ("area_atuacao", "Área de Atuação", 1, 25),
+    ("nivel_academico", "Nível Acadêmico", 2, 25),
+    ("nivel_ingles", "Inglês", 3, 12),
+    ("nivel_espanhol", "Espanhol", 3, 12),
+    ("cv_pt", "Resumo do CV", 1, 400),
+]
+
+# Orçamentos por seção do prompt, em tokens
+ORCAMENTO_VAGA = int(os.environ.get("PROMPT_TOKENS_VAGA", 300))
+ORCAMENTO_CURRICULO = int(os.environ.get("PROMPT_TOKENS_CURRICULO", 400))
+ORCAMENTO_HISTORICO = int(os.environ.get("PROMPT_TOKENS_HISTORICO", 1200))
+
+MARCA_CORTE = " [...]"
+_RE_PALAVRAS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_RE_SENTENCAS = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def _carregar_tokenizer():
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(MODELO)
+    except Exception as e:  # não instalado ou vocabulário indisponível (sem rede)
+        print(f"⚠️ tiktoken indisponível ({type(e).__name__}); usando estimativa de tokens por palavras.")
+        return None
+
+
+_tokenizer = _carregar_tokenizer()
+_cache = LRUCache(max_itens=int(os.environ.get("PROMPT_CACHE_ITENS", 2048)))
+
+
+def _estimar(texto):
+    # ~4 caracteres por token em palavras longas; pontuação conta 1 token
+    return sum(max(1, math.ceil(len(p) / 4)) for p in _RE_PALAVRAS.findall(texto))
+
+
+def contar_tokens(texto):
+    if not texto:
+        return 0
+    if _tokenizer is not None:
+        return len(_tokenizer.encode(texto, disallowed_special=()))
+    return _estimar(texto)
+
+
+def _cortar_bruto(texto, max_tokens):
+    """Prefixo de `texto` com no máximo `max_tokens` tokens, sem respeitar sentenças."""
+    if _tokenizer is not None:
+        return _tokenizer.decode(_tokenizer.encode(texto, disallowed_special=())[:max_tokens])
+    total = 0
+    for m in _RE_PALAVRAS.finditer(texto):
+        custo = max(1, math.ceil(len(m.group()) / 4))
+        if total + custo > max_tokens:
+            # Palavra que estoura o limite entra em parte (~4 caracteres por token restante)
+            return texto[:m.start() + (max_tokens - total) * 4]
+        total += custo
+    return texto
+
+
+def cortar_tokens(texto, max_tokens):
+    """
+    Corta `texto` para caber em `max_tokens`, preferindo terminar em fim de
+    sentença e marcando o corte com "[...]".
+    """
+    texto = (texto or "").strip()
+    if contar_tokens(texto) <= max_tokens:
+        return texto
+    disponivel = max_tokens - contar_tokens(MARCA_CORTE)
+    if disponivel <= 0:
+        return ""
+
+    partes, usados = [], 0
+    for sentenca in _RE_SENTENCAS.split(texto):
+        custo = contar_tokens(sentenca) + 1
+        if usados + custo > disponivel:
+            break
+        partes.append(sentenca)
+        usados += custo
+
+    # Sem sentença inteira que caiba (ou quase nada aproveitado): corta no meio
+    if usados < disponivel // 2:
+        return _cortar_bruto(texto, disponivel).rstrip() + MARCA_CORTE
+    return " ".join(partes) + MARCA_CORTE
+
+
+def alocar(secoes, orcamento, piso=16):
+    """
+    Distribui `orcamento` tokens entre `secoes` = [(nome, tokens necessários,
+    prioridade, máximo)] e devolve {nome: tokens concedidos}.
+
+    Primeiro cada seção recebe até `piso` tokens (campos curtos, como nível
+    de inglês, cabem inteiros e não são descartados por causa dos longos);
+    depois o restante vai por prioridade, menores primeiro. Dentro de uma
+    prioridade o saldo é dividido igualmente e a parte não usada por uma
+    seção vai para as demais.
+    """
+    secoes = sorted(secoes, key=lambda s: s[2])
+    concedido = {}
+    restante = orcamento
+    for nome, necessario, _, maximo in secoes:
+        dado = min(necessario, maximo, piso, restante)
+        concedido[nome] = dado
+        restante -= dado
+
+    for prioridade in sorted({s[2] for s in secoes}):
+        pendentes = {
+            nome: min(necessario, maximo) - concedido[nome]
+            for nome, necessario, p, maximo in secoes
+            if p == prioridade and min(necessario, maximo) > concedido[nome]
+        }
+        while pendentes and restante > 0:
+            fatia = max(1, restante // len(pendentes))
+            for nome, falta in sorted(pendentes.items(), key=lambda x: x[1]):
+                dado = min(falta, fatia, restante)
+                concedido[nome] += dado
+                restante -= dado
+                if dado == falta:
+                    del pendentes[nome]
+                else:
+                    pendentes[nome] = falta - dado
+    return concedido
+
+
+def _valor(dados, caminho):
+    valor = dados
+    for parte in caminho.split("."):
+        valor = valor.get(parte, "") if isinstance(valor, dict) else ""
+    return str(valor or "").strip()
+
+
+def _chave(tipo, dados, orcamento):
+    payload = json.dumps([tipo, dados, orcamento, _tokenizer is not None], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def condensar_campos(dados, prioridades, orcamento, tipo="campos"):
+    """
+    Texto "Rótulo: valor" dos campos de `dados` que cabem em `orcamento`
+    tokens, segundo `prioridades`. Cacheado pelo conteúdo.
+    """
+    chave = _chave(tipo, dados, orcamento)
+    salvo = _cache.get(chave)
+    if salvo is not None:
+        return salvo
+
+    valores = {caminho: _valor(dados, caminho) for caminho, _, _, _ in prioridades}
+    secoes = []
+    for caminho, rotulo, prioridade, maximo in prioridades:
+        if valores[caminho]:
+            custo_rotulo = contar_tokens(f"{rotulo}: ") + 1
+            secoes.append((caminho, contar_tokens(valores[caminho]) + custo_rotulo, prioridade, maximo + custo_rotulo))
+    concedido = alocar(secoes, orcamento)
+
+    linhas = []
+    for caminho, rotulo, _, _ in prioridades:
+        tokens = concedido.get(caminho, 0) - contar_tokens(f"{rotulo}: ") - 1
+        if valores[caminho] and tokens > 0:
+            texto = cortar_tokens(valores[caminho], tokens)
+            if texto:
+                linhas.append(f"{rotulo}: {texto}")
+
+    resultado = "\n".join(linhas)
+    _cache.set(chave, resultado)
+    return resultado
+
+
+def condensar_vaga(job, orcamento=None):
+    return condensar_campos(job, PRIORIDADES_VAGA, orcamento or ORCAMENTO_VAGA, tipo="vaga")
+
+
+def condensar_candidato(applicant, orcamento=None):
+    return condensar_campos(applicant, PRIORIDADES_CANDIDATO, orcamento or ORCAMENTO_CURRICULO, tipo="candidato")
+
+
+def condensar_texto(texto, orcamento):
+    """Texto livre (ex.: currículo extraído do PDF) cortado em `orcamento` tokens, cacheado."""
+    chave = _chave("texto", texto, orcamento)
+    salvo = _cache.get(chave)
+    if salvo is None:
+        salvo = cortar_tokens(texto, orcamento)
+        _cache.set(chave, salvo)
+    return salvo
+
+
+def condensar_historico(history, orcamento=None):
+    """
+    Pares (pergunta, resposta) mais recentes que cabem em `orcamento`; os
+    mais antigos são omitidos com um aviso no início.
+    """
+    orcamento = orcamento or ORCAMENTO_HISTORICO
+    pares = [f"Pergunta: {q}\nResposta: {a}" for q, a in history if q and a]
+
+    mantidos, usados = [], 0
+    for par in reversed(pares):
+        custo = contar_tokens(par) + 1
+        if usados + custo > orcamento:
+            break
+        mantidos.insert(0, par)
+        usados += custo
+
+    omitidos = len(pares) - len(mantidos)
+    if omitidos:
+        mantidos.insert(0, f"[{omitidos} perguntas anteriores omitidas]")
+    return "\n".join(mantidos)
+
+
+def metricas_orcamento():
+    return {
+        "tokenizer": _tokenizer.name if _tokenizer is not None else "estimativa",
+        "cache": _cache.stats.as_dict()
+    }
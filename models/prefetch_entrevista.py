@@ -0,0 +1,188 @@
+"""
+Pré-geração especulativa da próxima pergunta da entrevista.
+
+Enquanto o candidato ainda responde, o cliente envia a transcrição parcial
+(`/api/next_question/prefetch`); a próxima pergunta é gerada em segundo
+plano como se a parcial fosse a resposta final, e o áudio dela já é
+sintetizado (`utils.tts.speak`, cache endereçado por conteúdo). O resultado
+fica na sessão (`SessaoEntrevista.prefetch`), visível a qualquer worker.
+
+Quando a resposta final chega, a pergunta pré-gerada só é usada se foi
+gerada para a mesma pergunta em aberto e se a parcial cobre a resposta
+final (fração das palavras da resposta presentes na parcial de pelo menos
+`PREFETCH_SIMILARIDADE`); senão a pergunta é gerada de novo, como antes.
+Se a pré-geração ainda está em andamento neste processo, a requisição
+espera por ela em vez de começar do zero.
+
+Variáveis de ambiente:
+    PREFETCH_PERGUNTAS      ativa o modo (padrão: 0)
+    PREFETCH_SIMILARIDADE   cobertura mínima da resposta final (padrão: 0.8)
+    PREFETCH_MIN_PALAVRAS   tamanho mínimo da parcial para pré-gerar (padrão: 8)
+    PREFETCH_ESPERA         segundos de espera por uma pré-geração em andamento (padrão: 10)
+"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from flask import current_app
+
+from db.database import db, SessaoEntrevista
+from models.ai_agents import agente_entrevistador
+from models.sessao_entrevista import prompt_sessao
+from utils.tts import speak
+
+ATIVO = os.environ.get("PREFETCH_PERGUNTAS", "0") == "1"
+SIMILARIDADE = float(os.environ.get("PREFETCH_SIMILARIDADE", 0.8))
+MIN_PALAVRAS = int(os.environ.get("PREFETCH_MIN_PALAVRAS", 8))
+ESPERA = float(os.environ.get("PREFETCH_ESPERA", 10))
+
+_RE_PALAVRAS = re.compile(r"\w+", re.UNICODE)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("PREFETCH_WORKERS", 4)), thread_name_prefix="prefetch")
+_lock = threading.Lock()
+_em_andamento = {}  # sessao_id -> (parcial, future), só a mais recente de cada sessão
+
+
+class MetricasPrefetch:
+    def __init__(self):
+        self.agendados = 0
+        self.ignorados = 0  # parcial curta ou igual à que já está sendo gerada
+        self.erros = 0
+        self.hits = 0
+        self.misses_divergente = 0
+        self.misses_sem_prefetch = 0
+        self.economia_s = 0.0
+
+    def as_dict(self):
+        consultas = self.hits + self.misses_divergente + self.misses_sem_prefetch
+        return {
+            "ativo": ATIVO,
+            "agendados": self.agendados,
+            "ignorados": self.ignorados,
+            "erros": self.erros,
+            "hits": self.hits,
+            "misses_divergente": self.misses_divergente,
+            "misses_sem_prefetch": self.misses_sem_prefetch,
+            "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0,
+            "economia_total_s": round(self.economia_s, 3),
+            "economia_media_s": round(self.economia_s / self.hits, 3) if self.hits else 0.0
+        }
+
+
+metricas = MetricasPrefetch()
+
+
+def _palavras(texto):
+    return _RE_PALAVRAS.findall((texto or "").lower())
+
+
+def cobertura(parcial, final):
+    """Fração das palavras distintas de `final` que já estavam em `parcial`."""
+    palavras_final = set(_palavras(final))
+    if not palavras_final:
+        return 0.0
+    return len(palavras_final & set(_palavras(parcial))) / len(palavras_final)
+
+
+def _gerar(app, sessao_id, parcial):
+    with app.app_context():
+        try:
+            sessao = SessaoEntrevista.query.get(sessao_id)
+            if not sessao or not sessao.pergunta_atual:
+                return None
+            base = sessao.pergunta_atual
+
+            inicio = time.perf_counter()
+            pergunta = agente_entrevistador(prompt_sessao(sessao, resposta_pendente=parcial))
+            duracao = time.perf_counter() - inicio
+            speak(pergunta)  # agenda a síntese; /speak da pergunta inteira encontra o áudio no cache
+
+            dados = {"base": base, "parcial": parcial, "pergunta": pergunta, "duracao": duracao}
+            with _lock:
+                atual = _em_andamento.get(sessao_id)
+                mais_recente = atual is not None and atual[0] == parcial
+            # Só grava se ainda é a parcial mais recente e a pergunta em aberto não mudou
+            if mais_recente:
+                db.session.execute(
+                    db.update(SessaoEntrevista)
+                    .where(SessaoEntrevista.id == sessao_id, SessaoEntrevista.pergunta_atual == base)
+                    .values(prefetch=json.dumps(dados, ensure_ascii=False))
+                )
+                db.session.commit()
+            return dados
+        except Exception as e:
+            metricas.erros += 1
+            print(f"⚠️ Falha na pré-geração da pergunta ({sessao_id}): {e}")
+            return None
+        finally:
+            with _lock:
+                atual = _em_andamento.get(sessao_id)
+                if atual is not None and atual[0] == parcial:
+                    del _em_andamento[sessao_id]
+
+
+def agendar(sessao_id, parcial):
+    """
+    Agenda a pré-geração para a transcrição parcial. Devolve "agendado",
+    "em_andamento" (uma parcial equivalente já está sendo usada) ou "curta".
+    """
+    parcial = (parcial or "").strip()
+    if len(_palavras(parcial)) < MIN_PALAVRAS:
+        metricas.ignorados += 1
+        return "curta"
+
+    with _lock:
+        atual = _em_andamento.get(sessao_id)
+        if atual is not None and cobertura(atual[0], parcial) >= SIMILARIDADE:
+            metricas.ignorados += 1
+            return "em_andamento"
+        app = current_app._get_current_object()
+        _em_andamento[sessao_id] = (parcial, _executor.submit(_gerar, app, sessao_id, parcial))
+    metricas.agendados += 1
+    return "agendado"
+
+
+def _valida(dados, sessao, resposta):
+    return bool(dados) and dados["base"] == sessao.pergunta_atual and cobertura(dados["parcial"], resposta) >= SIMILARIDADE
+
+
+def consumir(sessao, resposta):
+    """
+    Pergunta pré-gerada para `resposta` na pergunta em aberto da sessão, ou
+    None se não há uma válida. Deve ser chamada antes de `registrar_resposta`;
+    descarta o prefetch guardado (o commit fica com quem chama).
+    """
+    dados = json.loads(sessao.prefetch) if sessao.prefetch else None
+    sessao.prefetch = None
+    if dados and dados["base"] != sessao.pergunta_atual:
+        dados = None  # sobra de um turno anterior
+    espera = 0.0
+
+    if not _valida(dados, sessao, resposta):
+        with _lock:
+            atual = _em_andamento.get(sessao.id)
+        if atual is not None and cobertura(atual[0], resposta) >= SIMILARIDADE:
+            inicio = time.perf_counter()
+            try:
+                dados = atual[1].result(timeout=ESPERA)
+            except FuturesTimeout:
+                dados = None
+            espera = time.perf_counter() - inicio
+
+    if not dados:
+        metricas.misses_sem_prefetch += 1
+        return None
+    if not _valida(dados, sessao, resposta):
+        metricas.misses_divergente += 1
+        return None
+
+    metricas.hits += 1
+    metricas.economia_s += max(0.0, dados["duracao"] - espera)
+    return dados["pergunta"]
+
+
+def metricas_prefetch():
+    return metricas.as_dict()
@@ -0,0 +1,329 @@
+"""
+Saída estruturada dos agentes (triagem de currículos e avaliação da entrevista).
+
+Em vez de `json.loads` direto no texto do modelo, cada agente declara um
+esquema (subconjunto de JSON Schema: objeto com propriedades `string`,
+`number`, `integer` e `array` de objetos, `required`, `minimum`/`maximum`)
+e a chamada:
+
+1. pede a resposta por function calling (o esquema vira os `parameters` da
+   função e a chamada é forçada) ou por JSON mode, conforme
+   `SAIDA_ESTRUTURADA_MODO` (`funcao`, padrão; `json`, que exige um modelo
+   com `response_format`; `texto`, só o prompt);
+2. interpreta o retorno com um parser tolerante (cercas de código, texto em
+   volta do objeto, aspas simples, vírgulas sobrando, True/False/None);
+3. valida e normaliza os campos (ex.: "87,5" -> 87.5, lista de keywords ->
+   texto);
+4. se ainda for inválido, reenvia a conversa com os erros encontrados e
+   pede só o JSON corrigido, no máximo `SAIDA_ESTRUTURADA_CORRECOES` vezes.
+
+Só respostas válidas entram no cache do LLM. Os contadores por agente
+(`/api/metricas/saida_estruturada`) mostram quantas respostas vieram
+válidas, quantas precisaram de reparo ou de correção, quantas falharam e
+os tokens gastos em respostas descartadas.
+"""
+import ast
+import json
+import os
+import re
+import threading
+
+from models.llm_cache import chave_llm, obter_cache
+
+MODO = os.environ.get("SAIDA_ESTRUTURADA_MODO", "funcao")
+CORRECOES = int(os.environ.get("SAIDA_ESTRUTURADA_CORRECOES", 1))
+
+ESQUEMA_TRIAGEM = {
+    "type": "object",
+    "properties": {
+        "nome": {"type": "string", "description": "Nome do candidato"},
+        "score": {"type": "number", "minimum": 0, "maximum": 100, "description": "Match entre vaga e currículo"},
+        "keywords": {"type": "string", "description": "Palavras-chave do currículo, separadas por vírgula"}
+    },
+    "required": ["score", "keywords"]
+}
+
+# Triagem em lote (exec_agente_triagem.py): o prompt ecoa os IDs do par
+ESQUEMA_TRIAGEM_PAR = {
+    "type": "object",
+    "properties": {
+        "jobid": {"type": "string"},
+        "aplicantid": {"type": "string"},
+        "score": {"type": "number", "minimum": 0, "maximum": 100},
+        "keywords": {"type": "string"}
+    },
+    "required": ["score", "keywords"]
+}
+
+# Vários candidatos da mesma vaga em uma chamada: um item por candidato
+ESQUEMA_TRIAGEM_LOTE = {
+    "type": "object",
+    "properties": {
+        "resultados": {
+            "type": "array",
+            "items": {**ESQUEMA_TRIAGEM_PAR, "required": ["aplicantid", "score", "keywords"]}
+        }
+    },
+    "required": ["resultados"]
+}
+
+ESQUEMA_AVALIACAO = {
+    "type": "object",
+    "properties": {
+        "resumo": {"type": "string", "description": "Relatório resumido da entrevista"},
+        "score": {"type": "integer", "minimum": 1, "maximum": 5,
+                  "description": "1 = inadequado, 5 = altamente recomendado"}
+    },
+    "required": ["resumo", "score"]
+}
+
+
+class ErroSaidaEstruturada(ValueError):
+    """Resposta do modelo que não pôde ser interpretada ou validada contra o esquema."""
+
+    def __init__(self, erros, conteudo=None, dados=None):
+        self.erros = erros if isinstance(erros, list) else [erros]
+        self.conteudo = conteudo
+        self.dados = dados  # objeto interpretado, quando só a validação falhou
+        super().__init__("; ".join(self.erros))
+
+
+class MetricasSaida:
+    CAMPOS = ("chamadas", "cache", "validas", "reparadas", "correcoes", "invalidas", "falhas", "tokens_desperdicados")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agentes = {}
+
+    def registrar(self, agente, campo, quantidade=1):
+        with self._lock:
+            contadores = self._agentes.setdefault(agente, dict.fromkeys(self.CAMPOS, 0))
+            contadores[campo] += quantidade
+
+    def as_dict(self):
+        with self._lock:
+            agentes = {nome: dict(c) for nome, c in self._agentes.items()}
+        for c in agentes.values():
+            respostas = c["validas"] + c["reparadas"] + c["invalidas"]
+            c["taxa_invalidas"] = round(c["invalidas"] / respostas, 4) if respostas else 0.0
+        return {"modo": MODO, "correcoes": CORRECOES, "agentes": agentes}
+
+
+metricas = MetricasSaida()
+
+_RE_CERCA = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_RE_VIRGULA_SOBRANDO = re.compile(r",\s*([}\]])")
+_ASPAS = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def _objeto(texto):
+    """Primeiro objeto {...} balanceado do texto (ignorando chaves dentro de strings)."""
+    inicio = texto.find("{")
+    if inicio < 0:
+        return None
+    profundidade, aspas, escape = 0, None, False
+    for i in range(inicio, len(texto)):
+        c = texto[i]
+        if aspas:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == aspas:
+                aspas = None
+        elif c in "\"'":
+            aspas = c
+        elif c == "{":
+            profundidade += 1
+        elif c == "}":
+            profundidade -= 1
+            if profundidade == 0:
+                return texto[inicio:i + 1]
+    return texto[inicio:]
+
+
+def reparar_json(texto):
+    """
+    Interpreta `texto` como um objeto JSON, tolerando os desvios comuns do
+    modelo. Devolve (dados, reparado) ou levanta ErroSaidaEstruturada.
+    """
+    texto = (texto or "").strip()
+    try:
+        dados = json.loads(texto)
+        if isinstance(dados, dict):
+            return dados, False
+    except json.JSONDecodeError:
+        pass
+
+    cerca = _RE_CERCA.search(texto)
+    candidato = _objeto(cerca.group(1) if cerca else texto)
+    if candidato is None:
+        raise ErroSaidaEstruturada("a resposta não contém um objeto JSON", texto)
+
+    candidato = _RE_VIRGULA_SOBRANDO.sub(r"\1", candidato.translate(_ASPAS))
+    try:
+        dados = json.loads(candidato)
+    except json.JSONDecodeError:
+        # Aspas simples e True/False/None: formato de dict Python
+        try:
+            dados = ast.literal_eval(candidato)
+        except (ValueError, SyntaxError):
+            raise ErroSaidaEstruturada("JSON malformado", texto) from None
+    if not isinstance(dados, dict):
+        raise ErroSaidaEstruturada("a resposta não é um objeto JSON", texto)
+    return dados, True
+
+
+def _converter(valor, regra):
+    tipo = regra.get("type")
+    if tipo == "array":
+        if not isinstance(valor, list):
+            raise ValueError("deve ser uma lista")
+        itens = []
+        for i, item in enumerate(valor):
+            if not isinstance(item, dict):
+                raise ValueError(f"item {i} deve ser um objeto")
+            try:
+                itens.append(validar(item, regra["items"]))
+            except ErroSaidaEstruturada as e:
+                raise ValueError(f"item {i}: {e}") from None
+        return itens
+
+    if tipo == "string":
+        if isinstance(valor, (list, tuple)):
+            return ", ".join(str(v).strip() for v in valor if str(v).strip())
+        if isinstance(valor, (dict, bool)) or valor is None:
+            raise ValueError("deve ser um texto")
+        return str(valor).strip()
+
+    if isinstance(valor, bool) or valor is None or isinstance(valor, (list, dict)):
+        raise ValueError("deve ser um número")
+    if isinstance(valor, str):
+        valor = float(valor.strip().rstrip("%").replace(",", "."))
+    if tipo == "integer":
+        if float(valor) != round(float(valor)):
+            raise ValueError("deve ser um número inteiro")
+        valor = int(round(float(valor)))
+    else:
+        valor = float(valor)
+
+    if "minimum" in regra and valor < regra["minimum"]:
+        raise ValueError(f"deve ser no mínimo {regra['minimum']}")
+    if "maximum" in regra and valor > regra["maximum"]:
+        raise ValueError(f"deve ser no máximo {regra['maximum']}")
+    return valor
+
+
+def validar(dados, esquema):
+    """
+    Confere `dados` contra `esquema` e devolve só os campos declarados, já
+    convertidos. Levanta ErroSaidaEstruturada com todos os problemas.
+    """
+    erros, limpo = [], {}
+    for campo in esquema.get("required", []):
+        if dados.get(campo) in (None, ""):
+            erros.append(f'campo "{campo}" ausente')
+    for campo, regra in esquema["properties"].items():
+        if dados.get(campo) in (None, ""):
+            continue
+        try:
+            limpo[campo] = _converter(dados[campo], regra)
+        except ValueError as e:
+            mensagem = str(e) if not str(e).startswith("could not") else "deve ser um número"
+            erros.append(f'campo "{campo}" {mensagem} (recebido: {dados[campo]!r})')
+    if erros:
+        raise ErroSaidaEstruturada(erros, json.dumps(dados, ensure_ascii=False), dados)
+    return limpo
+
+
+def interpretar(conteudo, esquema, agente=None):
+    """Repara e valida o texto de uma resposta; registra o resultado nas métricas do `agente`."""
+    try:
+        dados, reparado = reparar_json(conteudo)
+        dados = validar(dados, esquema)
+    except ErroSaidaEstruturada as e:
+        e.conteudo = conteudo
+        if agente:
+            metricas.registrar(agente, "invalidas")
+        raise
+    if agente:
+        metricas.registrar(agente, "reparadas" if reparado else "validas")
+    return dados
+
+
+def parametros_requisicao(esquema, nome, modo=None):
+    """Argumentos extras de `chat.completions.create` para o modo de saída estruturada."""
+    modo = modo or MODO
+    if modo == "funcao":
+        return {
+            "tools": [{"type": "function", "function": {"name": nome, "parameters": esquema}}],
+            "tool_choice": {"type": "function", "function": {"name": nome}}
+        }
+    if modo == "json":
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
+def conteudo_resposta(response):
+    """Texto a interpretar: argumentos da função chamada ou o conteúdo da mensagem."""
+    message = response.choices[0].message
+    chamadas = getattr(message, "tool_calls", None)
+    if chamadas:
+        return chamadas[0].function.arguments
+    return message.content or ""
+
+
+def mensagens_correcao(messages, conteudo, erro):
+    """Conversa para a retentativa: a resposta inválida e o que precisa ser corrigido."""
+    return messages + [
+        {"role": "assistant", "content": conteudo or ""},
+        {"role": "user", "content": (
+            f"A resposta anterior não segue o formato pedido: {erro}. "
+            "Corrija e retorne SOMENTE o objeto JSON, sem texto explicativo."
+        )}
+    ]
+
+
+def completar_estruturado(client, model, messages, esquema, nome, modo=None, correcoes=None, **params):
+    """
+    Chama o modelo e devolve o dicionário validado contra `esquema`.
+    Consulta o cache do LLM antes; respostas inválidas geram até
+    `correcoes` retentativas com os erros e, esgotadas, ErroSaidaEstruturada.
+    """
+    modo = modo or MODO
+    correcoes = CORRECOES if correcoes is None else correcoes
+    cache = obter_cache()
+    chave = chave_llm(model, messages, esquema=esquema, modo=modo, **params) if cache is not None else None
+
+    if chave is not None:
+        salvo = cache.get(chave)
+        if salvo is not None:
+            metricas.registrar(nome, "cache")
+            return json.loads(salvo)
+
+    extras = parametros_requisicao(esquema, nome, modo)
+    conversa = messages
+    for tentativa in range(correcoes + 1):
+        metricas.registrar(nome, "chamadas")
+        response = client.chat.completions.create(model=model, messages=conversa, **extras, **params)
+        conteudo = conteudo_resposta(response)
+        try:
+            dados = interpretar(conteudo, esquema, nome)
+        except ErroSaidaEstruturada as e:
+            usage = getattr(response, "usage", None)
+            metricas.registrar(nome, "tokens_desperdicados", getattr(usage, "total_tokens", 0) or 0)
+            if tentativa == correcoes:
+                metricas.registrar(nome, "falhas")
+                raise
+            metricas.registrar(nome, "correcoes")
+            print(f"⚠️ Saída inválida de {nome} ({e}); pedindo correção.")
+            conversa = mensagens_correcao(conversa, conteudo, e)
+            continue
+
+        if chave is not None:
+            cache.set(chave, json.dumps(dados, ensure_ascii=False))
+        return dados
+
+
+def metricas_saida():
+    return metricas.as_dict()
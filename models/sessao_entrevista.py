@@ -0,0 +1,116 @@
+"""
+Sessões de entrevista mantidas no servidor (tabela `sessoes_entrevista`).
+
+Na primeira pergunta o contexto da vaga e do currículo é condensado uma vez
+e guardado na sessão; a cada turno o cliente envia só `sessao_id` e a última
+resposta. O prompt leva o contexto pronto, um resumo acumulado dos turnos
+antigos e os turnos recentes na íntegra. Quando os turnos recentes passam de
+`SESSAO_TOKENS_RECENTES`, a compactação (resumo via LLM de todos menos os
+últimos `TURNOS_MANTIDOS`) é enfileirada e roda fora da requisição, de modo
+que o tamanho do prompt fica aproximadamente constante ao longo da entrevista.
+"""
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from db.database import db, SessaoEntrevista
+from models.ai_agents import prompt_entrevista, agente_resumir_entrevista
+from models.orcamento_prompt import condensar_vaga, condensar_candidato, condensar_historico, contar_tokens
+
+TOKENS_RECENTES = int(os.environ.get("SESSAO_TOKENS_RECENTES", 600))
+TURNOS_MANTIDOS = 2
+VALIDADE_HORAS = 24
+
+
+def criar_sessao(job_id, applicant_id, job_dict, applicant_dict):
+    limpar_expiradas()
+    sessao = SessaoEntrevista(
+        id=uuid.uuid4().hex,
+        job_id=job_id,
+        applicant_id=applicant_id,
+        contexto_vaga=condensar_vaga(job_dict),
+        contexto_cv=condensar_candidato(applicant_dict),
+        turnos="[]",
+        resumo="",
+        inicio_recentes=0
+    )
+    db.session.add(sessao)
+    db.session.commit()
+    return sessao
+
+
+def limpar_expiradas(horas=VALIDADE_HORAS):
+    limite = datetime.utcnow() - timedelta(hours=horas)
+    SessaoEntrevista.query.filter(SessaoEntrevista.atualizada_em < limite).delete(synchronize_session=False)
+
+
+def turnos(sessao):
+    return json.loads(sessao.turnos or "[]")
+
+
+def _recentes(sessao):
+    return [(t["question"], t["answer"]) for t in turnos(sessao)[sessao.inicio_recentes or 0:]]
+
+
+def registrar_resposta(sessao, resposta):
+    """Fecha o turno da pergunta em aberto com a resposta do candidato (o commit fica com quem chama)."""
+    if sessao.pergunta_atual and resposta:
+        lista = turnos(sessao)
+        lista.append({"question": sessao.pergunta_atual, "answer": resposta})
+        sessao.turnos = json.dumps(lista, ensure_ascii=False)
+        sessao.pergunta_atual = None
+        sessao.atualizada_em = datetime.utcnow()
+
+
+def registrar_pergunta(sessao, pergunta):
+    sessao.pergunta_atual = pergunta
+    sessao.atualizada_em = datetime.utcnow()
+    db.session.commit()
+
+
+def prompt_sessao(sessao, resposta_pendente=None):
+    """
+    Prompt da próxima pergunta. `resposta_pendente` entra como resposta da
+    pergunta em aberto sem ser gravada (pré-geração pela transcrição parcial).
+    """
+    recentes = _recentes(sessao)
+    if resposta_pendente and sessao.pergunta_atual:
+        recentes.append((sessao.pergunta_atual, resposta_pendente))
+    # condensar_historico limita os recentes mesmo se a compactação ainda não rodou
+    previous = condensar_historico(recentes)
+    if sessao.resumo:
+        previous = f"Resumo da entrevista até aqui:\n{sessao.resumo}\n\n{previous}".strip()
+    return prompt_entrevista(sessao.contexto_vaga, sessao.contexto_cv, previous)
+
+
+def precisa_compactar(sessao):
+    recentes = _recentes(sessao)
+    if len(recentes) <= TURNOS_MANTIDOS:
+        return False
+    return sum(contar_tokens(q) + contar_tokens(a) for q, a in recentes) > TOKENS_RECENTES
+
+
+def compactar(sessao_id):
+    """
+    Incorpora ao resumo os turnos recentes, exceto os últimos
+    `TURNOS_MANTIDOS`. Executada pelo worker da fila.
+    """
+    sessao = SessaoEntrevista.query.get(sessao_id)
+    if not sessao or not precisa_compactar(sessao):
+        return None
+
+    inicio = sessao.inicio_recentes or 0
+    fim = len(turnos(sessao)) - TURNOS_MANTIDOS
+    antigos = [(t["question"], t["answer"]) for t in turnos(sessao)[inicio:fim]]
+    resumo = agente_resumir_entrevista(sessao.resumo, antigos)
+
+    # Só grava se nenhuma outra compactação da mesma sessão terminou antes;
+    # não toca em `turnos`, que a requisição do turno seguinte pode estar gravando
+    resultado = db.session.execute(
+        db.update(SessaoEntrevista)
+        .where(SessaoEntrevista.id == sessao_id, SessaoEntrevista.inicio_recentes == inicio)
+        .values(resumo=resumo, inicio_recentes=fim)
+    )
+    db.session.commit()
+    return {"sessao_id": sessao_id, "turnos_resumidos": len(antigos) if resultado.rowcount else 0}
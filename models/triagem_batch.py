@@ -0,0 +1,277 @@
+"""
+Triagem noturna pela Batch API da OpenAI.
+
+Em vez de uma chamada por par (ou grupo) com o limitador de taxa, todas as
+requisições vão para um arquivo JSONL, que é enviado de uma vez
+(`files.create` + `batches.create`). O lote é processado pela OpenAI em até
+24 h, com custo menor e sem consumir o RPM/TPM da conta. O arquivo de saída
+é baixado e ingerido em `MatchResult` em commits de vários resultados.
+
+O estado de cada execução fica em `data/batches/<nome>.json`: as partes
+(no máximo `MAX_REQUISICOES` requisições cada, limite da API), o ID do
+lote, os arquivos locais de entrada, saída e tarefas, e quantas linhas da
+saída já foram ingeridas. Uma execução interrompida em qualquer etapa
+(antes do envio, durante a espera ou no meio da ingestão) é retomada de
+onde parou. Reingerir uma linha não duplica resultados, porque a gravação
+substitui os resultados do par.
+
+O cliente pode ser o `OpenAI` ou o `FakeOpenAI` com `pasta`, que simula
+arquivos e lotes em disco.
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+from models import saida_estruturada
+
+MAX_REQUISICOES = 50000
+ENDPOINT = "/v1/chat/completions"
+STATUS_FINAIS = ("completed", "failed", "expired", "cancelled")
+
+# Esquema de cada tipo de tarefa, pelo `nome` usado nas métricas de saída estruturada
+ESQUEMAS = {
+    "triagem_lote": saida_estruturada.ESQUEMA_TRIAGEM_PAR,
+    "triagem_lote_agrupada": saida_estruturada.ESQUEMA_TRIAGEM_LOTE,
+}
+
+
+def salvar_estado(estado):
+    estado["atualizado_em"] = datetime.utcnow().isoformat()
+    tmp_path = estado["caminho"] + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, estado["caminho"])
+
+
+def carregar_estado(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def estado_pendente(pasta):
+    """Estado mais recente ainda não concluído em `pasta`, ou None."""
+    if not os.path.isdir(pasta):
+        return None
+    caminhos = sorted(
+        (os.path.join(pasta, n) for n in os.listdir(pasta) if n.endswith(".json")),
+        key=os.path.getmtime, reverse=True
+    )
+    for caminho in caminhos:
+        estado = carregar_estado(caminho)
+        if not estado.get("concluido"):
+            return estado
+    return None
+
+
+def _sem_prompt(tarefa):
+    """Tarefa sem os textos (o prompt já está no arquivo de entrada)."""
+    limpa = {k: v for k, v in tarefa.items() if k not in ("prompt", "esquema")}
+    if "subtarefas" in limpa:
+        limpa["subtarefas"] = [_sem_prompt(s) for s in limpa["subtarefas"]]
+    return limpa
+
+
+def job_ids(estado):
+    """Vagas com requisições na execução, lidas dos arquivos de tarefas."""
+    ids = set()
+    for parte in estado["partes"]:
+        with open(parte["tarefas"], encoding="utf-8") as f:
+            ids.update(json.loads(linha)["job_id"] for linha in f)
+    return sorted(ids)
+
+
+def preparar(tarefas, pasta, nome, model, temperature, max_tokens, nome_padrao="triagem_lote"):
+    """
+    Grava os arquivos de entrada (JSONL no formato da Batch API) e de
+    tarefas de cada parte e cria o estado da execução. Devolve o estado.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    estado = {"nome": nome, "caminho": os.path.join(pasta, f"{nome}.json"), "criado_em": datetime.utcnow().isoformat(),
+              "model": model, "requisicoes": 0, "ingeridos": 0, "falhas": 0, "partes": []}
+
+    entrada = tarefas_arquivo = None
+    for tarefa in tarefas:
+        if entrada is None or estado["partes"][-1]["requisicoes"] >= MAX_REQUISICOES:
+            if entrada is not None:
+                entrada.close()
+                tarefas_arquivo.close()
+            n = len(estado["partes"])
+            parte = {
+                "entrada": os.path.join(pasta, f"{nome}.{n}.entrada.jsonl"),
+                "tarefas": os.path.join(pasta, f"{nome}.{n}.tarefas.jsonl"),
+                "saida": os.path.join(pasta, f"{nome}.{n}.saida.jsonl"),
+                "requisicoes": 0, "batch_id": None, "status": None, "linhas_ingeridas": 0
+            }
+            estado["partes"].append(parte)
+            entrada = open(parte["entrada"], "w", encoding="utf-8")
+            tarefas_arquivo = open(parte["tarefas"], "w", encoding="utf-8")
+
+        parte = estado["partes"][-1]
+        tipo = tarefa.get("nome", nome_padrao)
+        custom_id = f"{tipo}:{tarefa['job_id']}:{tarefa['applicant_id']}"
+        body = {
+            "model": model,
+            "messages": [{"role": "user", "content": tarefa["prompt"]}],
+            "temperature": temperature,
+            "max_tokens": tarefa.get("max_tokens", max_tokens),
+            **saida_estruturada.parametros_requisicao(ESQUEMAS[tipo], tipo)
+        }
+        entrada.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body},
+                                 ensure_ascii=False) + "\n")
+        tarefas_arquivo.write(json.dumps({"custom_id": custom_id, "nome": tipo, **_sem_prompt(tarefa)},
+                                         ensure_ascii=False) + "\n")
+        parte["requisicoes"] += 1
+        estado["requisicoes"] += 1
+
+    if entrada is not None:
+        entrada.close()
+        tarefas_arquivo.close()
+    salvar_estado(estado)
+    return estado
+
+
+def submeter(client, estado):
+    """Envia as partes ainda não enviadas."""
+    for n, parte in enumerate(estado["partes"]):
+        if parte["batch_id"]:
+            continue
+        with open(parte["entrada"], "rb") as f:
+            arquivo = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=arquivo.id,
+            endpoint=ENDPOINT,
+            completion_window="24h",
+            metadata={"execucao": estado["nome"], "parte": str(n)}
+        )
+        parte["batch_id"] = batch.id
+        parte["status"] = batch.status
+        salvar_estado(estado)
+        print(f"📤 Parte {n} enviada: lote {batch.id} com {parte['requisicoes']} requisições.")
+
+
+def aguardar(client, estado, intervalo=60, timeout=None):
+    """
+    Consulta os lotes até todos chegarem a um status final e baixa os
+    arquivos de saída. Devolve True se todos terminaram dentro do `timeout`.
+    """
+    inicio = time.monotonic()
+    while True:
+        pendentes = 0
+        for n, parte in enumerate(estado["partes"]):
+            if parte["status"] in STATUS_FINAIS and os.path.exists(parte["saida"]):
+                continue
+            batch = client.batches.retrieve(parte["batch_id"])
+            if batch.status != parte["status"]:
+                contagem = getattr(batch, "request_counts", None)
+                progresso = f" ({contagem.completed}/{contagem.total})" if contagem else ""
+                print(f"⏳ Parte {n}: {batch.status}{progresso}")
+            parte["status"] = batch.status
+            if batch.status in STATUS_FINAIS:
+                # Lotes expirados/cancelados ainda entregam as requisições concluídas;
+                # sem saída, o arquivo vazio faz a ingestão marcar todas como falha
+                if not os.path.exists(parte["saida"]):
+                    _baixar(client, batch.output_file_id, parte["saida"])
+            else:
+                pendentes += 1
+            salvar_estado(estado)
+
+        if not pendentes:
+            return True
+        if timeout is not None and time.monotonic() - inicio > timeout:
+            return False
+        time.sleep(intervalo)
+
+
+def _baixar(client, file_id, destino):
+    tmp_path = destino + ".tmp"
+    with open(tmp_path, "wb") as f:
+        if file_id:
+            f.write(client.files.content(file_id).read())
+    os.replace(tmp_path, destino)
+
+
+def _conteudo(body):
+    """Texto a interpretar de uma resposta de chat em JSON (como em `conteudo_resposta`)."""
+    message = body["choices"][0]["message"]
+    chamadas = message.get("tool_calls")
+    if chamadas:
+        return chamadas[0]["function"]["arguments"]
+    return message.get("content") or ""
+
+
+def ingerir(estado, parse, salvar, tamanho_lote=500):
+    """
+    Converte as linhas de saída baixadas em resultados e os entrega a
+    `salvar(linhas)` em blocos de `tamanho_lote`, continuando de
+    `linhas_ingeridas` em cada parte. Devolve a lista de custom_ids que
+    falharam (erro da API ou resposta inválida), a serem triados de novo.
+    """
+    falhas = []
+    for n, parte in enumerate(estado["partes"]):
+        if not os.path.exists(parte["saida"]) or parte.get("ingerida"):
+            continue
+
+        with open(parte["tarefas"], encoding="utf-8") as f:
+            tarefas = {t["custom_id"]: t for t in map(json.loads, f)}
+        if parte["linhas_ingeridas"]:
+            print(f"⏯️ Parte {n}: retomando a ingestão na linha {parte['linhas_ingeridas']}.")
+
+        bloco = []
+        recebidos = set()
+        i = -1
+        with open(parte["saida"], encoding="utf-8") as f:
+            for i, linha in enumerate(f):
+                item = json.loads(linha)
+                recebidos.add(item["custom_id"])
+                if i < parte["linhas_ingeridas"]:
+                    continue
+
+                tarefa = tarefas[item["custom_id"]]
+                resposta = item.get("response") or {}
+                try:
+                    if item.get("error") or resposta.get("status_code") != 200:
+                        raise ValueError(item.get("error") or f"status {resposta.get('status_code')}")
+                    dados = saida_estruturada.interpretar(_conteudo(resposta["body"]), ESQUEMAS[tarefa["nome"]],
+                                                          tarefa["nome"])
+                    resultado = parse(tarefa, json.dumps(dados, ensure_ascii=False))
+                except Exception as e:
+                    print(f"Erro com {item['custom_id']}: {e}")
+                    falhas.append(item["custom_id"])
+                    estado["falhas"] += 1
+                    continue
+
+                linhas = resultado if isinstance(resultado, list) else [resultado]
+                if "subtarefas" in tarefa and len(linhas) < len(tarefa["subtarefas"]):
+                    falhas.append(item["custom_id"])  # candidatos ausentes na resposta do grupo
+                bloco.extend(linhas)
+
+                if len(bloco) >= tamanho_lote:
+                    salvar(bloco)
+                    estado["ingeridos"] += len(bloco)
+                    parte["linhas_ingeridas"] = i + 1
+                    salvar_estado(estado)
+                    bloco = []
+                    print(f"📥 {estado['ingeridos']} resultados ingeridos.")
+
+        if bloco:
+            salvar(bloco)
+            estado["ingeridos"] += len(bloco)
+        parte["linhas_ingeridas"] = i + 1
+        # Requisições sem linha na saída (lote expirado ou cancelado)
+        falhas.extend(c for c in tarefas if c not in recebidos)
+        parte["ingerida"] = True
+        salvar_estado(estado)
+
+    estado["concluido"] = all(p.get("ingerida") for p in estado["partes"])
+    salvar_estado(estado)
+    return falhas
+
+
+def executar(client, estado, parse, salvar, intervalo=60, timeout=None, tamanho_lote=500):
+    """Envia, aguarda e ingere; pode ser chamada de novo sobre um estado interrompido."""
+    submeter(client, estado)
+    if not aguardar(client, estado, intervalo=intervalo, timeout=timeout):
+        print(f"⏸️ Lotes ainda em processamento; retome depois com --batch-retomar ({estado['caminho']}).")
+        return None
+    return ingerir(estado, parse, salvar, tamanho_lote=tamanho_lote)
@@ -0,0 +1,313 @@
+"""
+Motor de triagem em lote.
+
+Dispara as chamadas ao LLM em um pool de threads limitado e controla o ritmo
+com um limitador de taxa (token bucket) baseado nos orçamentos de
+requisições por minuto (RPM) e tokens por minuto (TPM) da conta OpenAI,
+no lugar do `time.sleep` fixo entre chamadas.
+"""
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from openai import APIConnectionError, APITimeoutError, RateLimitError
+
+from models import saida_estruturada
+
+ERROS_TRANSITORIOS = (RateLimitError, APIConnectionError, APITimeoutError)
+
+
+def estimar_tokens(texto):
+    """
+    Estimativa simples de tokens (~4 caracteres por token em português).
+    Usada apenas para reservar orçamento de TPM antes da chamada; o valor
+    real retornado em `usage` corrige a reserva depois.
+    """
+    return max(1, len(texto) // 4)
+
+
+class TokenBucket:
+    """
+    Balde de tokens: comporta até `capacidade` unidades e é reabastecido
+    continuamente à taxa de `capacidade / periodo` unidades por segundo.
+    O saldo pode ficar negativo quando o consumo real supera o estimado.
+    """
+
+    def __init__(self, capacidade, periodo=60.0):
+        self.capacidade = float(capacidade)
+        self.taxa = self.capacidade / periodo
+        self.saldo = self.capacidade
+        self.atualizado = time.monotonic()
+
+    def _reabastecer(self, agora):
+        decorrido = agora - self.atualizado
+        self.saldo = min(self.capacidade, self.saldo + decorrido * self.taxa)
+        self.atualizado = agora
+
+    def espera(self, quantidade, agora):
+        """Segundos até haver `quantidade` disponível (0 se já houver)."""
+        self._reabastecer(agora)
+        quantidade = min(quantidade, self.capacidade)
+        if self.saldo >= quantidade:
+            return 0.0
+        return (quantidade - self.saldo) / self.taxa
+
+    def consumir(self, quantidade):
+        self.saldo -= quantidade
+
+
+class RateLimiter:
+    """
+    Combina dois baldes (requisições e tokens por minuto). `adquirir`
+    bloqueia a thread chamadora até que ambos tenham saldo suficiente.
+    """
+
+    def __init__(self, rpm, tpm):
+        self.requisicoes = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._lock = threading.Lock()
+
+    def adquirir(self, tokens_estimados):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                espera = max(
+                    self.requisicoes.espera(1, agora),
+                    self.tokens.espera(tokens_estimados, agora)
+                )
+                if espera == 0:
+                    self.requisicoes.consumir(1)
+                    self.tokens.consumir(tokens_estimados)
+                    return
+            time.sleep(espera)
+
+    def ajustar(self, tokens_estimados, tokens_reais):
+        """Corrige o balde de TPM com o consumo real informado pela API."""
+        with self._lock:
+            self.tokens.consumir(tokens_reais - tokens_estimados)
+
+
+class TriagemStats:
+    """Contadores de uma execução do motor, com resumo de vazão."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fim = None
+        self.sucesso = 0
+        self.falhas = 0
+        self.reenviados = 0  # pares de lotes agrupados reenviados individualmente
+        self.tokens = 0  # inclui os tokens de chamadas que falharam ou foram corrigidas
+        self.latencias = []
+
+    @property
+    def total(self):
+        return self.sucesso + self.falhas
+
+    @property
+    def duracao(self):
+        return (self.fim or time.perf_counter()) - self.inicio
+
+    def percentil(self, p):
+        if not self.latencias:
+            return 0.0
+        ordenadas = sorted(self.latencias)
+        indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+        return ordenadas[indice]
+
+    def resumo(self):
+        duracao = self.duracao or 1e-9
+        return (
+            f"{self.total} pares em {duracao:.1f}s "
+            f"({self.total / duracao:.2f} pares/s, {self.tokens / duracao:.0f} tokens/s) | "
+            f"sucesso={self.sucesso} falhas={self.falhas} reenviados={self.reenviados} | "
+            f"latência p50={self.percentil(50):.2f}s p95={self.percentil(95):.2f}s"
+        )
+
+
+class TriagemEngine:
+    """
+    Executa tarefas de triagem de forma concorrente.
+
+    Cada tarefa é um dicionário com ao menos `job_id`, `applicant_id` e
+    `prompt`. O resultado de cada chamada é convertido em linha por
+    `parse(tarefa, content)` (retornando None em caso de resposta inválida)
+    e as linhas são entregues em lotes a `salvar(linhas)`, sempre na thread
+    que chamou `executar` — o que mantém a sessão do SQLAlchemy fora das
+    threads de trabalho.
+
+    Com `esquema`, a resposta é pedida como saída estruturada
+    (models/saida_estruturada.py), reparada e validada ainda na thread de
+    trabalho; respostas inválidas são reenviadas com os erros até
+    `correcoes` vezes, e `parse` recebe o JSON já validado.
+
+    Tarefas agrupadas (vários candidatos de uma vaga em um prompt) trazem
+    `subtarefas` (as tarefas individuais de cada par) e podem sobrescrever
+    `esquema`, `nome` e `max_tokens`; `parse` devolve então uma lista de
+    linhas. Os pares que faltarem na resposta, ou todos se o lote falhar,
+    são reenviados como tarefas individuais.
+
+    Args:
+        client: Cliente OpenAI (ou `utils.fake_openai.FakeOpenAI`)
+        workers (int): Número máximo de chamadas simultâneas
+        rpm (int): Orçamento de requisições por minuto
+        tpm (int): Orçamento de tokens por minuto
+        tamanho_lote (int): Quantidade de linhas por chamada a `salvar`
+        tentativas (int): Tentativas por tarefa em erros transitórios
+        esquema (dict): Esquema da saída estruturada (None = texto livre)
+        nome (str): Nome da função/agente nas métricas de saída estruturada
+        correcoes (int): Retentativas por resposta inválida
+    """
+
+    def __init__(self, client, model="gpt-4", workers=8, rpm=500, tpm=40000,
+                 temperature=0.3, max_tokens=300, tamanho_lote=25,
+                 tentativas=3, intervalo_progresso=50,
+                 esquema=None, nome="triagem", correcoes=None):
+        self.client = client
+        self.model = model
+        self.workers = workers
+        self.limiter = RateLimiter(rpm, tpm)
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.tamanho_lote = tamanho_lote
+        self.tentativas = tentativas
+        self.intervalo_progresso = intervalo_progresso
+        self.esquema = esquema
+        self.nome = nome
+        self.correcoes = saida_estruturada.CORRECOES if correcoes is None else correcoes
+        self.stats = TriagemStats()
+
+    def _chamar(self, tarefa):
+        esquema = tarefa.get("esquema", self.esquema)
+        nome = tarefa.get("nome", self.nome)
+        max_tokens = tarefa.get("max_tokens", self.max_tokens)
+        extras = saida_estruturada.parametros_requisicao(esquema, nome) if esquema else {}
+        messages = [{"role": "user", "content": tarefa["prompt"]}]
+        tokens, latencia = 0, 0.0
+
+        try:
+            for correcao in range(self.correcoes + 1):
+                content, reais, duracao = self._requisitar(messages, max_tokens, extras, nome if esquema else None)
+                tokens += reais
+                latencia += duracao
+                if esquema is None:
+                    return content, tokens, latencia
+
+                try:
+                    dados = saida_estruturada.interpretar(content, esquema, nome)
+                    return json.dumps(dados, ensure_ascii=False), tokens, latencia
+                except saida_estruturada.ErroSaidaEstruturada as e:
+                    saida_estruturada.metricas.registrar(nome, "tokens_desperdicados", reais)
+                    if correcao == self.correcoes:
+                        saida_estruturada.metricas.registrar(nome, "falhas")
+                        raise
+                    saida_estruturada.metricas.registrar(nome, "correcoes")
+                    messages = saida_estruturada.mensagens_correcao(messages, content, e)
+        except Exception as e:
+            # Tokens já pagos nesta tarefa (inclusive nas correções), somados às estatísticas pela falha
+            e.tokens_gastos = tokens
+            raise
+
+    def _requisitar(self, messages, max_tokens, extras, nome=None):
+        estimados = sum(estimar_tokens(m["content"]) for m in messages) + max_tokens
+
+        for tentativa in range(1, self.tentativas + 1):
+            self.limiter.adquirir(estimados)
+            inicio = time.perf_counter()
+            try:
+                if nome is not None:
+                    saida_estruturada.metricas.registrar(nome, "chamadas")
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens,
+                    **extras
+                )
+            except ERROS_TRANSITORIOS:
+                if tentativa == self.tentativas:
+                    raise
+                time.sleep(2 ** tentativa)
+                continue
+
+            latencia = time.perf_counter() - inicio
+            usage = getattr(response, "usage", None)
+            reais = getattr(usage, "total_tokens", None) or estimados
+            self.limiter.ajustar(estimados, reais)
+
+            content = saida_estruturada.conteudo_resposta(response).strip()
+            return content, reais, latencia
+
+    def executar(self, tarefas, parse, salvar):
+        """
+        Processa todas as tarefas e devolve as estatísticas da execução.
+
+        Args:
+            tarefas (iterable): Dicionários com `job_id`, `applicant_id` e `prompt`
+            parse (callable): (tarefa, content) -> dict da linha, lista de linhas ou None
+            salvar (callable): Recebe uma lista de linhas a persistir
+        """
+        self.stats = TriagemStats()
+        lote = []
+        proximo_progresso = self.intervalo_progresso
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futuros = {pool.submit(self._chamar, t): t for t in tarefas}
+
+            def reenviar(subtarefas):
+                self.stats.reenviados += len(subtarefas)
+                for sub in subtarefas:
+                    futuros[pool.submit(self._chamar, sub)] = sub
+
+            while futuros:
+                concluidos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    tarefa = futuros.pop(futuro)
+                    subtarefas = tarefa.get("subtarefas")
+                    tokens = 0
+                    try:
+                        content, tokens, latencia = futuro.result()
+                        resultado = parse(tarefa, content)
+                    except Exception as e:
+                        self.stats.tokens += tokens + getattr(e, "tokens_gastos", 0)
+                        if subtarefas:
+                            print(f"⚠️ Lote da vaga {tarefa['job_id']} falhou ({e}); "
+                                  f"reenviando {len(subtarefas)} pares individualmente.")
+                            reenviar(subtarefas)
+                            continue
+                        print(f"Erro com job {tarefa['job_id']}, applicant {tarefa['applicant_id']}: {str(e)}")
+                        self.stats.falhas += 1
+                        continue
+
+                    self.stats.tokens += tokens
+                    self.stats.latencias.append(latencia)
+
+                    if subtarefas:
+                        linhas = resultado or []
+                        obtidos = {(l["job_id"], l["applicant_id"]) for l in linhas}
+                        faltantes = [s for s in subtarefas if (s["job_id"], s["applicant_id"]) not in obtidos]
+                        if faltantes:
+                            reenviar(faltantes)
+                    elif resultado is None:
+                        print(f"Erro ao fazer parsing do JSON:\n{content}")
+                        self.stats.falhas += 1
+                        continue
+                    else:
+                        linhas = [resultado]
+
+                    for linha in linhas:
+                        self.stats.sucesso += 1
+                        lote.append(linha)
+                        if len(lote) >= self.tamanho_lote:
+                            salvar(lote)
+                            lote = []
+
+                    if self.intervalo_progresso and self.stats.total >= proximo_progresso:
+                        print(f"⏱️ {self.stats.resumo()}")
+                        proximo_progresso = self.stats.total + self.intervalo_progresso
+
+        if lote:
+            salvar(lote)
+
+        self.stats.fim = time.perf_counter()
+        return self.stats
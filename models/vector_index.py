@@ -0,0 +1,292 @@
+"""
+Índice vetorial persistente dos currículos para a busca "melhores
+candidatos para esta vaga" em toda a base de candidatos.
+
+Estrutura IVF (inverted file) em disco, em data/indice_candidatos/:
+    meta.json         dimensão e quantidade de listas
+    idf.npy           IDF do vetorizador (models/embeddings.py)
+    centroides.npy    centróides das listas (k-means esférico)
+    vetores.f32       vetores float32, uma linha por entrada (append-only, memory-mapped)
+    listas.i32        lista (centróide) de cada linha (append-only)
+    ids.txt           "applicant_id<TAB>hash" de cada linha (append-only)
+
+A consulta compara o vetor da vaga com os centróides, visita apenas as
+`nprobe` listas mais próximas e calcula o cosseno só das linhas delas.
+Atualizações são anexadas ao fim dos arquivos; a linha mais recente de um
+candidato substitui as anteriores. `construir` reescreve tudo (recalcula
+IDF e centróides) e elimina as linhas obsoletas.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from models.embeddings import DIM_PADRAO, VetorizadorHashing
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DIRETORIO_PADRAO = os.path.join(basedir, "data", "indice_candidatos")
+
+
+def hash_texto(texto):
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def _kmeans_esferico(amostra, k, iteracoes=10, seed=42):
+    rng = np.random.default_rng(seed)
+    centroides = amostra[rng.choice(len(amostra), size=k, replace=False)].copy()
+    for _ in range(iteracoes):
+        atribuicao = np.argmax(amostra @ centroides.T, axis=1)
+        for c in range(k):
+            membros = amostra[atribuicao == c]
+            if len(membros):
+                soma = membros.sum(axis=0)
+                norma = np.linalg.norm(soma)
+                if norma > 0:
+                    centroides[c] = soma / norma
+    return centroides
+
+
+class IndiceCandidatos:
+    """
+    Índice IVF carregado de um diretório. Use `IndiceCandidatos.abrir()`
+    nas rotas: a instância é reaproveitada e, quando outro processo (ex.:
+    import_json_to_db.py) anexa entradas ou reconstrói o índice, uma nova
+    instância é carregada e trocada no cache. Uma instância já entregue a
+    quem está consultando nunca é alterada.
+    """
+
+    _abertos = {}
+    _lock = threading.Lock()
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO):
+        self.diretorio = diretorio
+        self._carregar()
+
+    def _arquivo(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    @classmethod
+    def existe(cls, diretorio=DIRETORIO_PADRAO):
+        return os.path.exists(os.path.join(diretorio, "meta.json"))
+
+    @classmethod
+    def abrir(cls, diretorio=DIRETORIO_PADRAO):
+        with cls._lock:
+            indice = cls._abertos.get(diretorio)
+            if indice is None:
+                indice = cls._abertos[diretorio] = cls(diretorio)
+                return indice
+            try:
+                if indice._assinatura != indice._assinatura_atual():
+                    indice = cls._abertos[diretorio] = cls(diretorio)
+            except FileNotFoundError:
+                pass  # índice sendo reconstruído: segue com a instância atual
+            return indice
+
+    @classmethod
+    def _recarregar(cls, diretorio):
+        """Carrega uma instância nova e a coloca no cache de `abrir`."""
+        indice = cls(diretorio)
+        with cls._lock:
+            cls._abertos[diretorio] = indice
+        return indice
+
+    def _assinatura_atual(self):
+        stat = os.stat(self._arquivo("ids.txt"))
+        return (stat.st_size, stat.st_mtime_ns, os.stat(self._arquivo("meta.json")).st_mtime_ns)
+
+    def _carregar(self):
+        with open(self._arquivo("meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.dim = self.meta["dim"]
+        self._assinatura = self._assinatura_atual()
+
+        self.vetorizador = VetorizadorHashing(self.dim)
+        self.vetorizador.idf = np.load(self._arquivo("idf.npy"))
+        self.centroides = np.load(self._arquivo("centroides.npy"))
+
+        with open(self._arquivo("ids.txt"), "rb") as f:
+            brutas = f.read().split(b"\n")[:-1]
+        linhas = [linha.decode("utf-8").split("\t") for linha in brutas]
+
+        listas = np.fromfile(self._arquivo("listas.i32"), dtype=np.int32)
+        n_vetores = os.path.getsize(self._arquivo("vetores.f32")) // (4 * self.dim)
+        # Uma escrita interrompida pode deixar arquivos com tamanhos diferentes
+        n = min(len(linhas), len(listas), n_vetores)
+        self.n_linhas = n
+        self._bytes_ids = sum(len(linha) + 1 for linha in brutas[:n])
+
+        self.ids = [l[0] for l in linhas[:n]]
+        self.hashes = [l[1] for l in linhas[:n]]
+        self.vetores = np.memmap(self._arquivo("vetores.f32"), dtype=np.float32, mode="r", shape=(n, self.dim)) \
+            if n else np.zeros((0, self.dim), dtype=np.float32)
+
+        # A linha mais recente de cada candidato é a válida
+        self.linha_atual = {}
+        for i, applicant_id in enumerate(self.ids):
+            self.linha_atual[applicant_id] = i
+        ativos = np.zeros(n, dtype=bool)
+        ativos[list(self.linha_atual.values())] = True
+
+        # Listas invertidas: linhas ativas ordenadas por centróide + offsets
+        listas = listas[:n]
+        linhas_ativas = np.nonzero(ativos)[0]
+        ordem = np.argsort(listas[linhas_ativas], kind="stable")
+        self.linhas_por_lista = linhas_ativas[ordem]
+        self.offsets = np.searchsorted(listas[self.linhas_por_lista], np.arange(len(self.centroides) + 1))
+        self.obsoletas = n - len(linhas_ativas)
+
+    def __len__(self):
+        return len(self.linha_atual)
+
+    @classmethod
+    def construir(cls, carregar, diretorio=DIRETORIO_PADRAO, dim=DIM_PADRAO, n_listas=None,
+                  amostra_kmeans=20000, bloco=2000):
+        """
+        (Re)constrói o índice do zero.
+
+        Args:
+            carregar (callable): Devolve um iterador novo de (applicant_id, texto)
+                a cada chamada; é percorrido duas vezes (IDF e vetores)
+            n_listas (int): Quantidade de listas IVF (padrão: ~sqrt(N))
+        """
+        inicio = time.perf_counter()
+        vetorizador = VetorizadorHashing(dim).ajustar(texto for _, texto in carregar())
+        n = 0
+
+        tmp = f"{diretorio}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        # 1ª etapa: vetores em disco
+        with open(os.path.join(tmp, "vetores.f32"), "wb") as fv, \
+                open(os.path.join(tmp, "ids.txt"), "w", encoding="utf-8") as fi:
+            pendentes = []
+
+            def gravar(pendentes):
+                fv.write(vetorizador.transformar([t for _, t in pendentes]).tobytes())
+                fi.writelines(f"{a}\t{hash_texto(t)}\n" for a, t in pendentes)
+
+            for applicant_id, texto in carregar():
+                pendentes.append((applicant_id, texto))
+                n += 1
+                if len(pendentes) >= bloco:
+                    gravar(pendentes)
+                    pendentes = []
+            if pendentes:
+                gravar(pendentes)
+
+        vetores = np.memmap(os.path.join(tmp, "vetores.f32"), dtype=np.float32, mode="r", shape=(n, dim)) \
+            if n else np.zeros((0, dim), dtype=np.float32)
+
+        # 2ª etapa: centróides a partir de uma amostra e atribuição de listas
+        n_listas = n_listas or int(np.clip(np.sqrt(max(n, 1)), 1, 1024))
+        n_listas = max(1, min(n_listas, n))
+        rng = np.random.default_rng(42)
+        amostra = np.asarray(vetores[np.sort(rng.choice(n, size=min(n, amostra_kmeans), replace=False))]) \
+            if n else np.zeros((1, dim), dtype=np.float32)
+        centroides = _kmeans_esferico(amostra, n_listas)
+
+        with open(os.path.join(tmp, "listas.i32"), "wb") as fl:
+            for i in range(0, n, bloco * 5):
+                fl.write(np.argmax(vetores[i:i + bloco * 5] @ centroides.T, axis=1).astype(np.int32).tobytes())
+        del vetores
+
+        np.save(os.path.join(tmp, "idf.npy"), vetorizador.idf)
+        np.save(os.path.join(tmp, "centroides.npy"), centroides.astype(np.float32))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": dim, "n_listas": n_listas, "construido_em": time.time(), "entradas": n}, f)
+
+        # Renomeia o índice antigo em vez de apagá-lo antes da troca: as instâncias
+        # abertas seguem lendo os arquivos (memmap) e a janela sem diretório é mínima
+        antigo = f"{diretorio}.antigo"
+        shutil.rmtree(antigo, ignore_errors=True)
+        if os.path.exists(diretorio):
+            os.replace(diretorio, antigo)
+        os.replace(tmp, diretorio)
+        shutil.rmtree(antigo, ignore_errors=True)
+        print(f"📚 Índice de candidatos construído: {n} entradas, {n_listas} listas, "
+              f"{time.perf_counter() - inicio:.1f}s.")
+        return cls._recarregar(diretorio)
+
+    def adicionar(self, pares, bloco=2000):
+        """
+        Anexa candidatos novos ou alterados, usando o IDF e os centróides
+        existentes. Candidatos cujo texto não mudou são ignorados; `pares`
+        pode ser um iterador sobre a base inteira.
+        Retorna a quantidade de entradas anexadas; as consultas passam a
+        vê-las na próxima chamada a `abrir()`.
+        """
+        anexados = 0
+        pendentes = []
+        for applicant_id, texto in pares:
+            h = hash_texto(texto)
+            linha = self.linha_atual.get(applicant_id)
+            if linha is not None and self.hashes[linha] == h:
+                continue
+            pendentes.append((applicant_id, texto, h))
+            if len(pendentes) >= bloco:
+                anexados += self._anexar(pendentes)
+                pendentes = []
+        if pendentes:
+            anexados += self._anexar(pendentes)
+
+        if anexados:
+            IndiceCandidatos._recarregar(self.diretorio)
+        return anexados
+
+    def _anexar(self, novos):
+        vetores = self.vetorizador.transformar([t for _, t, _ in novos])
+        listas = np.argmax(vetores @ self.centroides.T, axis=1).astype(np.int32)
+
+        ids = "".join(f"{a}\t{h}\n" for a, _, h in novos).encode("utf-8")
+
+        # Descarta restos de uma escrita interrompida antes de anexar; ids.txt
+        # por último, pois é ele que define quantas linhas são válidas
+        for nome, tamanho, dados in (
+            ("vetores.f32", self.n_linhas * 4 * self.dim, vetores.tobytes()),
+            ("listas.i32", self.n_linhas * 4, listas.tobytes()),
+            ("ids.txt", self._bytes_ids, ids)
+        ):
+            with open(self._arquivo(nome), "r+b") as f:
+                f.truncate(tamanho)
+                f.seek(tamanho)
+                f.write(dados)
+
+        self.n_linhas += len(novos)
+        self._bytes_ids += len(ids)
+        return len(novos)
+
+    def buscar(self, texto, n=20, nprobe=None):
+        """
+        Top-N candidatos mais similares ao texto (ex.: descrição da vaga).
+        `nprobe` é a quantidade de listas visitadas (padrão: 10% das
+        listas, no mínimo 8); com todas as listas a busca é exata.
+
+        Returns:
+            list: (applicant_id, similaridade) em ordem decrescente
+        """
+        if not len(self):
+            return []
+
+        consulta = self.vetorizador.transformar([texto])[0]
+        n = max(1, n)
+        nprobe = max(1, min(nprobe or max(8, len(self.centroides) // 10), len(self.centroides)))
+        listas = np.argsort(-(self.centroides @ consulta))[:nprobe]
+
+        linhas = np.concatenate([
+            self.linhas_por_lista[self.offsets[l]:self.offsets[l + 1]] for l in listas
+        ])
+        if len(linhas) == 0:
+            return []
+        linhas.sort()
+
+        similaridades = self.vetores[linhas] @ consulta
+        k = min(n, len(linhas))
+        melhores = np.argpartition(-similaridades, k - 1)[:k]
+        melhores = melhores[np.argsort(-similaridades[melhores])]
+        return [(self.ids[linhas[m]], float(similaridades[m])) for m in melhores]
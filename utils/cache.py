@@ -0,0 +1,235 @@
+"""
+Caches chave/valor reutilizáveis: um LRU em memória (por processo) e um
+cache persistente em SQLite (compartilhado entre processos/workers), ambos
+com TTL, limite de tamanho e contadores de acerto/erro.
+
+Os valores precisam ser serializáveis em JSON.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / consultas, 4) if consultas else 0.0
+        }
+
+
+class LRUCache:
+    """
+    Cache em memória com política LRU.
+
+    Args:
+        max_itens (int): Quantidade máxima de entradas mantidas
+        ttl (float): Validade de cada entrada em segundos (None = sem expiração)
+    """
+
+    def __init__(self, max_itens=512, ttl=None):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                self.stats.misses += 1
+                return None
+
+            valor, expira_em = item
+            if expira_em is not None and expira_em < time.monotonic():
+                del self._dados[chave]
+                self.stats.misses += 1
+                return None
+
+            self._dados.move_to_end(chave)
+            self.stats.hits += 1
+            return valor
+
+    def set(self, chave, valor, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expira_em = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._dados[chave] = (valor, expira_em)
+            self._dados.move_to_end(chave)
+            self.stats.sets += 1
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class SQLiteCache:
+    """
+    Cache persistente em um arquivo SQLite próprio (não no appdata.db).
+    Como o arquivo é compartilhado, serve a todos os workers do gunicorn.
+    A expulsão (expiradas + menos recentemente acessadas acima de
+    `max_itens`) roda a cada `intervalo_limpeza` escritas.
+
+    Args:
+        caminho (str): Caminho do arquivo .db
+        max_itens (int): Quantidade máxima de entradas
+        ttl (float): Validade padrão em segundos (None = sem expiração)
+        tabela (str): Nome da tabela, permitindo vários caches no mesmo arquivo
+    """
+
+    def __init__(self, caminho, max_itens=50000, ttl=None, tabela="cache", intervalo_limpeza=100):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.tabela = tabela
+        self.intervalo_limpeza = intervalo_limpeza
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._escritas = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with self._conexao() as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS "{tabela}" (
+                    chave TEXT PRIMARY KEY,
+                    valor TEXT NOT NULL,
+                    expira_em REAL,
+                    acessado_em REAL NOT NULL
+                )
+            """)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "ix_{tabela}_acessado_em" ON "{tabela}" (acessado_em)')
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, chave):
+        agora = time.time()
+        conn = self._conexao()
+        row = conn.execute(
+            f'SELECT valor, expira_em FROM "{self.tabela}" WHERE chave = ?', (chave,)
+        ).fetchone()
+
+        if row is None or (row[1] is not None and row[1] < agora):
+            if row is not None:
+                with conn:
+                    conn.execute(f'DELETE FROM "{self.tabela}" WHERE chave = ?', (chave,))
+            self.stats.misses += 1
+            return None
+
+        with conn:
+            conn.execute(f'UPDATE "{self.tabela}" SET acessado_em = ? WHERE chave = ?', (agora, chave))
+        self.stats.hits += 1
+        return json.loads(row[0])
+
+    def set(self, chave, valor, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        agora = time.time()
+        conn = self._conexao()
+        with conn:
+            conn.execute(
+                f'INSERT OR REPLACE INTO "{self.tabela}" (chave, valor, expira_em, acessado_em) VALUES (?, ?, ?, ?)',
+                (chave, json.dumps(valor, ensure_ascii=False), agora + ttl if ttl else None, agora)
+            )
+        self.stats.sets += 1
+
+        self._escritas += 1
+        if self._escritas % self.intervalo_limpeza == 0:
+            self.limpar()
+
+    def delete(self, chave):
+        conn = self._conexao()
+        with conn:
+            conn.execute(f'DELETE FROM "{self.tabela}" WHERE chave = ?', (chave,))
+
+    def clear(self):
+        conn = self._conexao()
+        with conn:
+            conn.execute(f'DELETE FROM "{self.tabela}"')
+
+    def limpar(self):
+        """Remove entradas expiradas e as menos usadas acima de `max_itens`."""
+        conn = self._conexao()
+        with conn:
+            expiradas = conn.execute(
+                f'DELETE FROM "{self.tabela}" WHERE expira_em IS NOT NULL AND expira_em < ?', (time.time(),)
+            ).rowcount
+            excedentes = conn.execute(f"""
+                DELETE FROM "{self.tabela}" WHERE chave IN (
+                    SELECT chave FROM "{self.tabela}" ORDER BY acessado_em DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_itens,)).rowcount
+        self.stats.evictions += expiradas + excedentes
+
+    def __len__(self):
+        return self._conexao().execute(f'SELECT COUNT(*) FROM "{self.tabela}"').fetchone()[0]
+
+
+class CacheEmCamadas:
+    """
+    Encadeia caches do mais rápido para o mais lento. Um acerto em uma
+    camada inferior é promovido para as camadas acima dela.
+    """
+
+    def __init__(self, *camadas):
+        self.camadas = [c for c in camadas if c is not None]
+        self.stats = CacheStats()
+
+    def get(self, chave):
+        for i, camada in enumerate(self.camadas):
+            valor = camada.get(chave)
+            if valor is not None:
+                for superior in self.camadas[:i]:
+                    superior.set(chave, valor)
+                self.stats.hits += 1
+                return valor
+        self.stats.misses += 1
+        return None
+
+    def set(self, chave, valor, ttl=None):
+        for camada in self.camadas:
+            camada.set(chave, valor, ttl)
+        self.stats.sets += 1
+
+    def delete(self, chave):
+        for camada in self.camadas:
+            camada.delete(chave)
+
+    def clear(self):
+        for camada in self.camadas:
+            camada.clear()
+
+    def metricas(self):
+        return {
+            "total": self.stats.as_dict(),
+            "camadas": {type(c).__name__: c.stats.as_dict() for c in self.camadas}
+        }
@@ -0,0 +1,186 @@
+"""
+Cache das respostas JSON das rotas de leitura do dashboard, com
+invalidação explícita disparada pelos caminhos de escrita.
+
+A chave é a rota + query string + a versão atual de cada "tag" de dados
+que a rota lê (ex.: "triagem", "prospects"). Invalidar uma tag apenas
+incrementa sua versão: as entradas antigas deixam de ser alcançáveis e
+expiram pelo TTL/LRU. Com o backend "sqlite", as versões ficam no mesmo
+arquivo do cache, então uma invalidação feita por qualquer processo (outro
+worker do gunicorn, import_json_to_db.py, exec_agente_triagem.py) vale para
+todos.
+
+Configuração por variáveis de ambiente:
+    RESPOSTA_CACHE=0              desliga o cache
+    RESPOSTA_CACHE_BACKEND        "sqlite" (padrão; LRU + SQLite compartilhado) ou "memoria"
+    RESPOSTA_CACHE_PATH           arquivo SQLite (padrão: data/cache_respostas.db)
+    RESPOSTA_CACHE_TTL            validade em segundos (padrão: 300)
+"""
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from flask import Response, make_response, request
+
+from utils.cache import CacheEmCamadas, CacheStats, LRUCache, SQLiteCache
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class VersoesMemoria:
+    """Versões das tags no próprio processo."""
+
+    def __init__(self):
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def obter(self, tags):
+        return [self._versoes.get(tag, 0) for tag in tags]
+
+    def incrementar(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versoes[tag] = self._versoes.get(tag, 0) + 1
+
+
+class VersoesSQLite:
+    """Versões das tags em uma tabela SQLite, compartilhada entre processos."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with self._conexao() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS versoes_tags (tag TEXT PRIMARY KEY, versao INTEGER NOT NULL)")
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def obter(self, tags):
+        marcadores = ",".join("?" * len(tags))
+        versoes = dict(self._conexao().execute(
+            f"SELECT tag, versao FROM versoes_tags WHERE tag IN ({marcadores})", tags
+        ).fetchall())
+        return [versoes.get(tag, 0) for tag in tags]
+
+    def incrementar(self, tags):
+        conn = self._conexao()
+        with conn:
+            conn.executemany(
+                "INSERT INTO versoes_tags (tag, versao) VALUES (?, 1) "
+                "ON CONFLICT(tag) DO UPDATE SET versao = versao + 1",
+                [(tag,) for tag in tags]
+            )
+
+
+def _cache_padrao():
+    if os.environ.get("RESPOSTA_CACHE", "1") == "0":
+        return None, None
+
+    ttl = float(os.environ.get("RESPOSTA_CACHE_TTL", 300))
+    if os.environ.get("RESPOSTA_CACHE_BACKEND", "sqlite") == "memoria":
+        return CacheEmCamadas(LRUCache(max_itens=1024, ttl=ttl)), VersoesMemoria()
+
+    caminho = os.environ.get("RESPOSTA_CACHE_PATH", os.path.join(basedir, "data", "cache_respostas.db"))
+    cache = CacheEmCamadas(
+        LRUCache(max_itens=1024, ttl=ttl),
+        SQLiteCache(caminho, max_itens=20000, ttl=ttl, tabela="respostas")
+    )
+    return cache, VersoesSQLite(caminho)
+
+
+_cache, _versoes = _cache_padrao()
+_stats_rotas = {}
+
+
+def configurar_cache(cache, versoes):
+    """Substitui o cache e o armazenamento de versões (ou None, None para desligar)."""
+    global _cache, _versoes
+    _cache, _versoes = cache, versoes
+
+
+def invalidar(*tags):
+    """Chamada pelos caminhos de escrita após o commit."""
+    if _versoes is not None and tags:
+        _versoes.incrementar(list(tags))
+
+
+# Parâmetros do DataTables que mudam a cada requisição sem mudar os dados: `_`
+# (cache-buster do jQuery) e `draw` (contador de desenhos, devolvido no corpo)
+_ARGS_IGNORADOS = ("_", "draw")
+
+
+def _chave(tags):
+    args = sorted((k, v) for k, v in request.args.items(multi=True) if k not in _ARGS_IGNORADOS)
+    # A presença de `draw` escolhe o formato DataTables na paginação (utils/paginacao.py)
+    payload = json.dumps([request.path, args, "draw" in request.args, _versoes.obter(list(tags))],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _com_draw(corpo):
+    """Corpo cacheado com o `draw` desta requisição, que o DataTables confere na resposta."""
+    dados = json.loads(corpo)
+    if not isinstance(dados, dict) or "draw" not in dados:
+        return None
+    dados["draw"] = request.args.get("draw", 0, type=int)
+    return json.dumps(dados, ensure_ascii=False)
+
+
+def cache_resposta(*tags):
+    """
+    Decorador para rotas GET que devolvem JSON. Respostas 200 são
+    cacheadas por rota + query string; `tags` são os dados lidos pela rota,
+    invalidados com `invalidar(tag)`. Preserva o ETag/304 da rota.
+    """
+    def decorador(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if _cache is None or request.method != "GET":
+                return view(*args, **kwargs)
+
+            stats = _stats_rotas.setdefault(request.url_rule.rule, CacheStats())
+            chave = _chave(tags)
+            salvo = _cache.get(chave)
+            if salvo is not None:
+                stats.hits += 1
+                corpo = _com_draw(salvo["corpo"]) if "draw" in request.args else None
+                if corpo is not None:
+                    # O corpo muda a cada draw: sem ETag, para não responder 304 com o draw antigo
+                    resp = Response(corpo, mimetype=salvo["mimetype"])
+                    resp.headers["X-Cache"] = "HIT"
+                    return resp
+                resp = Response(salvo["corpo"], mimetype=salvo["mimetype"])
+                if salvo.get("etag"):
+                    resp.set_etag(salvo["etag"])
+                    resp.headers["Cache-Control"] = "private, no-cache"
+                    resp = resp.make_conditional(request)
+                resp.headers["X-Cache"] = "HIT"
+                return resp
+
+            stats.misses += 1
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code == 200 and resp.mimetype == "application/json" and not resp.is_streamed:
+                etag, _ = resp.get_etag()
+                _cache.set(chave, {"corpo": resp.get_data(as_text=True), "mimetype": resp.mimetype, "etag": etag})
+                stats.sets += 1
+            resp.headers["X-Cache"] = "MISS"
+            return resp
+        return wrapper
+    return decorador
+
+
+def metricas_respostas():
+    return {
+        "ativo": _cache is not None,
+        "rotas": {rota: stats.as_dict() for rota, stats in sorted(_stats_rotas.items())},
+        "camadas": _cache.metricas() if _cache is not None else None
+    }
@@ -0,0 +1,171 @@
+"""
+Extração do texto de currículos em PDF com limites e parada antecipada.
+
+Os agentes usam só o começo do currículo (ver `agente_triagem_cvs`), então
+as páginas são lidas em ordem e a leitura para assim que `max_caracteres`
+foram coletados. A leitura roda em blocos de páginas em um pool de
+processos, consumidos em ordem: um bloco por vez, ou vários em paralelo para
+documentos com mais de `PDF_PAGINAS_PARALELO` páginas. O texto é cacheado
+pelo SHA-256 do arquivo, então reenviar o mesmo PDF não o reprocessa.
+
+O prazo `PDF_TIMEOUT` vale para a leitura das páginas inteira, inclusive
+uma única página patológica: ao estourar, a chamada devolve o texto dos
+blocos já lidos e os processos do pool são encerrados (o pool é recriado na
+próxima extração), para que páginas presas não ocupem o pool. Extrações
+concorrentes no mesmo pool também perdem os blocos em andamento e devolvem
+o texto lido até o próprio prazo. Abrir o arquivo para validá-lo (tamanho,
+senha, número de páginas) fica fora do prazo.
+
+Limites (variáveis de ambiente):
+    PDF_MAX_MB             tamanho máximo do arquivo (padrão: 10)
+    PDF_MAX_PAGINAS        páginas lidas no máximo (padrão: 20)
+    PDF_TIMEOUT            prazo da leitura; ao estourar, devolve o texto já lido (padrão: 10)
+    PDF_MAX_CARACTERES     texto coletado antes de parar (padrão: 4000)
+    PDF_PAGINAS_PARALELO   a partir de quantas páginas usar o pool (padrão: 8)
+    PDF_PROCESSOS          processos do pool (padrão: até 4, conforme as CPUs)
+    PDF_CACHE=0            desliga o cache; PDF_CACHE_PATH (padrão: data/cache_pdf.db)
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+
+import fitz
+
+from utils.cache import CacheEmCamadas, LRUCache, SQLiteCache
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+MAX_MB = float(os.environ.get("PDF_MAX_MB", 10))
+MAX_PAGINAS = int(os.environ.get("PDF_MAX_PAGINAS", 20))
+TIMEOUT = float(os.environ.get("PDF_TIMEOUT", 10))
+MAX_CARACTERES = int(os.environ.get("PDF_MAX_CARACTERES", 4000))
+PAGINAS_PARALELO = int(os.environ.get("PDF_PAGINAS_PARALELO", 8))
+PROCESSOS = int(os.environ.get("PDF_PROCESSOS", min(4, os.cpu_count() or 1)))
+PAGINAS_POR_BLOCO = 4
+
+
+class PDFInvalido(ValueError):
+    """Arquivo acima dos limites ou que não pode ser aberto como PDF."""
+
+
+def _cache_padrao():
+    if os.environ.get("PDF_CACHE", "1") == "0":
+        return None
+    caminho = os.environ.get("PDF_CACHE_PATH", os.path.join(basedir, "data", "cache_pdf.db"))
+    return CacheEmCamadas(
+        LRUCache(max_itens=128),
+        SQLiteCache(caminho, max_itens=5000, tabela="textos_pdf")
+    )
+
+
+_cache = _cache_padrao()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configurar_cache(cache):
+    global _cache
+    _cache = cache
+
+
+def _obter_pool():
+    """Pool criado sob demanda e reaproveitado (spawn: seguro dentro das threads do app)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = multiprocessing.get_context("spawn").Pool(processes=max(PROCESSOS, 1))
+        return _pool
+
+
+def _reciclar_pool(pool):
+    """Encerra os processos do pool após um estouro de prazo; a próxima extração cria outro."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.terminate()
+
+
+def _ler_paginas(caminho, inicio, fim):
+    """Executado no pool: texto das páginas [inicio, fim)."""
+    with fitz.open(caminho) as doc:
+        return [doc[i].get_text() for i in range(inicio, fim)]
+
+
+def _extrair(caminho, paginas, max_caracteres, prazo, simultaneos):
+    """
+    Blocos de páginas no pool, até `simultaneos` por vez, consumidos em ordem;
+    para de submeter ao atingir o texto necessário. Devolve (textos das
+    páginas lidas, se a leitura foi interrompida pelo prazo).
+    """
+    pool = _obter_pool()
+    blocos = [(i, min(i + PAGINAS_POR_BLOCO, paginas)) for i in range(0, paginas, PAGINAS_POR_BLOCO)]
+    pendentes = [pool.apply_async(_ler_paginas, (caminho, *b)) for b in blocos[:simultaneos]]
+    proximo = len(pendentes)
+
+    partes, total = [], 0
+    while pendentes:
+        restante = prazo - time.monotonic()
+        try:
+            textos = pendentes.pop(0).get(timeout=max(restante, 0))
+        except multiprocessing.TimeoutError:
+            print(f"⚠️ Extração do PDF interrompida por tempo ({len(partes)}/{paginas} páginas lidas)")
+            _reciclar_pool(pool)
+            return partes, True
+        partes.extend(textos)
+        total += sum(len(t.strip()) for t in textos)
+        if total >= max_caracteres:
+            break
+        if proximo < len(blocos):
+            pendentes.append(pool.apply_async(_ler_paginas, (caminho, *blocos[proximo])))
+            proximo += 1
+    return partes, False
+
+
+def _chave(dados, max_caracteres, max_paginas):
+    digest = hashlib.sha256(dados).hexdigest()
+    return f"{digest}:{max_caracteres}:{max_paginas}"
+
+
+def extrair_texto_pdf(caminho, max_caracteres=None, max_paginas=None, timeout=None, max_mb=None):
+    """
+    Texto do começo do PDF, até `max_caracteres` (o texto da última página
+    lida não é cortado). Levanta PDFInvalido se o arquivo passa de `max_mb`
+    ou não é um PDF legível.
+    """
+    max_caracteres = max_caracteres or MAX_CARACTERES
+    max_paginas = max_paginas or MAX_PAGINAS
+    prazo = time.monotonic() + (timeout or TIMEOUT)
+    max_mb = max_mb or MAX_MB
+
+    tamanho = os.path.getsize(caminho)
+    if tamanho > max_mb * 1024 * 1024:
+        raise PDFInvalido(f"PDF com {tamanho / 1024 / 1024:.1f} MB excede o limite de {max_mb:g} MB")
+
+    with open(caminho, "rb") as f:
+        dados = f.read()
+
+    chave = _chave(dados, max_caracteres, max_paginas) if _cache is not None else None
+    if chave:
+        salvo = _cache.get(chave)
+        if salvo is not None:
+            return salvo
+
+    try:
+        doc = fitz.open(stream=dados, filetype="pdf")
+    except Exception as e:
+        raise PDFInvalido(f"Não foi possível abrir o PDF: {e}")
+
+    with doc:
+        if doc.needs_pass:
+            raise PDFInvalido("PDF protegido por senha")
+        paginas = min(doc.page_count, max_paginas)
+    simultaneos = PROCESSOS if paginas > PAGINAS_PARALELO else 1
+    partes, interrompida = _extrair(caminho, paginas, max_caracteres, prazo, max(simultaneos, 1))
+
+    texto = "".join(partes).strip()
+    if chave and not interrompida:  # texto parcial por tempo não vai para o cache
+        _cache.set(chave, texto)
+    return texto
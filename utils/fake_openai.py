@@ -0,0 +1,260 @@
+"""
+Substituto local do cliente OpenAI, usado em benchmarks e testes manuais.
+
+Expõe o mesmo formato de `client.chat.completions.create(...)` e devolve
+respostas determinísticas (derivadas do próprio prompt) depois de uma
+latência simulada, sem consumir a API nem exigir OPENAI_API_KEY. Com
+`tools`, o texto da resposta vem como argumentos da função chamada.
+
+Com `pasta`, também simula `files` e `batches` (Batch API) em disco: o
+lote avança um status a cada `batches.retrieve` (validating -> in_progress
+-> completed) e, ao concluir, grava o arquivo de saída com uma linha por
+requisição. Como o estado fica nos arquivos, outro processo com a mesma
+pasta continua o mesmo lote.
+"""
+import hashlib
+import json
+import os
+import random
+import tempfile
+import uuid
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+def _estimar_tokens(texto):
+    # Aproximação grosseira (~4 caracteres por token), suficiente para o fake
+    return max(1, len(texto) // 4)
+
+
+def _score_deterministico(*partes):
+    digest = hashlib.sha256("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+    return round(int(digest[:8], 16) % 1000 / 10, 1)
+
+
+def _resultado_par(job_id, applicant_id):
+    return {
+        "jobid": job_id,
+        "aplicantid": applicant_id,
+        "nome": f"Candidato {applicant_id}",
+        "score": _score_deterministico(job_id, applicant_id),
+        "keywords": "Python, SQL, Comunicação"
+    }
+
+
+def resposta_triagem_padrao(prompt):
+    """
+    Gera uma resposta no formato esperado pelos prompts de triagem
+    (`build_prompt`, `build_prompt_lote` e `agente_triagem_cvs`), com score
+    estável por par. Prompts com vários candidatos recebem {"resultados": [...]}.
+    """
+    job = re.search(r"ID da vaga:\s*(\S+)", prompt)
+    job_id = job.group(1) if job else "0"
+    applicants = re.findall(r"ID do candidato:\s*(\S+)", prompt) or ["0"]
+
+    if len(applicants) > 1:
+        resultados = [_resultado_par(job_id, a) for a in dict.fromkeys(applicants)]
+        return json.dumps({"resultados": resultados}, ensure_ascii=False)
+    return json.dumps(_resultado_par(job_id, applicants[0]), ensure_ascii=False)
+
+
+class _Completions:
+    def __init__(self, fake):
+        self._fake = fake
+
+    def create(self, model, messages, **kwargs):
+        return self._fake._responder_chat(model, messages, **kwargs)
+
+
+class _Files:
+    def __init__(self, pasta):
+        self._pasta = pasta
+
+    def _caminho(self, file_id):
+        return os.path.join(self._pasta, f"{file_id}.jsonl")
+
+    def create(self, file, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        with open(self._caminho(file_id), "wb") as destino:
+            destino.write(file.read())
+        return SimpleNamespace(id=file_id, purpose=purpose, object="file")
+
+    def gravar(self, linhas):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        with open(self._caminho(file_id), "w", encoding="utf-8") as destino:
+            for linha in linhas:
+                destino.write(json.dumps(linha, ensure_ascii=False) + "\n")
+        return file_id
+
+    def content(self, file_id):
+        with open(self._caminho(file_id), "rb") as f:
+            dados = f.read()
+        return SimpleNamespace(read=lambda: dados, text=dados.decode("utf-8"))
+
+
+class _Batches:
+    def __init__(self, fake, pasta):
+        self._fake = fake
+        self._pasta = pasta
+
+    def _caminho(self, batch_id):
+        return os.path.join(self._pasta, f"{batch_id}.json")
+
+    def _gravar(self, batch):
+        with open(self._caminho(batch["id"]), "w", encoding="utf-8") as f:
+            json.dump(batch, f)
+
+    def _objeto(self, batch):
+        return SimpleNamespace(**{**batch, "request_counts": SimpleNamespace(**batch["request_counts"])})
+
+    def create(self, input_file_id, endpoint, completion_window, metadata=None):
+        with open(self._fake.files._caminho(input_file_id), encoding="utf-8") as f:
+            total = sum(1 for linha in f if linha.strip())
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:24]}", "object": "batch", "endpoint": endpoint,
+            "status": "validating", "input_file_id": input_file_id, "output_file_id": None,
+            "error_file_id": None, "completion_window": completion_window, "metadata": metadata or {},
+            "created_at": int(time.time()), "request_counts": {"total": total, "completed": 0, "failed": 0}
+        }
+        self._gravar(batch)
+        return self._objeto(batch)
+
+    def retrieve(self, batch_id):
+        with open(self._caminho(batch_id), encoding="utf-8") as f:
+            batch = json.load(f)
+        if batch["status"] == "validating":
+            batch["status"] = "in_progress"
+        elif batch["status"] == "in_progress":
+            self._processar(batch)
+            batch["status"] = "completed"
+        self._gravar(batch)
+        return self._objeto(batch)
+
+    def _processar(self, batch):
+        saida = []
+        with open(self._fake.files._caminho(batch["input_file_id"]), encoding="utf-8") as f:
+            for linha in f:
+                if not linha.strip():
+                    continue
+                requisicao = json.loads(linha)
+                saida.append({
+                    "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                    "custom_id": requisicao["custom_id"],
+                    "response": {"status_code": 200, "request_id": uuid.uuid4().hex,
+                                 "body": self._fake._corpo_resposta(**requisicao["body"])},
+                    "error": None
+                })
+        batch["output_file_id"] = self._fake.files.gravar(saida)
+        batch["request_counts"]["completed"] = len(saida)
+
+
+class FakeOpenAI:
+    """
+    Cliente falso compatível com o subconjunto da API OpenAI usado no projeto.
+
+    Args:
+        latencia (float): Latência média simulada por chamada, em segundos
+        jitter (float): Variação máxima (+/-) aplicada à latência
+        responder (callable): Função prompt -> texto da resposta
+        seed (int): Semente do gerador de jitter, para execuções reproduzíveis
+        latencia_por_token (float): Tempo extra por token gerado na resposta
+        pasta (str): Diretório dos arquivos e lotes simulados (padrão: temporário)
+    """
+
+    def __init__(self, latencia=0.5, jitter=0.1, responder=None, seed=42, latencia_por_token=0.0, pasta=None):
+        self.latencia = latencia
+        self.latencia_por_token = latencia_por_token
+        self.jitter = jitter
+        self.responder = responder or resposta_triagem_padrao
+        self.chamadas = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        pasta = pasta or os.path.join(tempfile.gettempdir(), "fake_openai")
+        os.makedirs(pasta, exist_ok=True)
+        self.files = _Files(pasta)
+        self.batches = _Batches(self, pasta)
+
+    def _dormir(self, tokens_gerados=0):
+        with self._lock:
+            self.chamadas += 1
+            atraso = self.latencia + self._random.uniform(-self.jitter, self.jitter)
+            atraso += tokens_gerados * self.latencia_por_token
+        if atraso > 0:
+            time.sleep(atraso)
+
+    def _responder_stream(self, model, content):
+        # Primeiro token após ~30% da latência; o restante chega em pedaços
+        pedacos = re.findall(r"\S+\s*", content) or [content]
+        time.sleep(self.latencia * 0.3)
+        intervalo = self.latencia * 0.7 / len(pedacos)
+        for pedaco in pedacos:
+            yield SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(
+                    index=0,
+                    finish_reason=None,
+                    delta=SimpleNamespace(role="assistant", content=pedaco)
+                )]
+            )
+            time.sleep(intervalo)
+
+    def _responder_chat(self, model, messages, **kwargs):
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        if kwargs.get("stream"):
+            with self._lock:
+                self.chamadas += 1
+            return self._responder_stream(model, self.responder(prompt))
+
+        content = self.responder(prompt)
+        prompt_tokens = _estimar_tokens(prompt)
+        completion_tokens = _estimar_tokens(content)
+        self._dormir(completion_tokens)
+
+        message = SimpleNamespace(role="assistant", content=content, tool_calls=None)
+        if kwargs.get("tools"):
+            funcao = kwargs["tools"][0]["function"]["name"]
+            message = SimpleNamespace(role="assistant", content=None, tool_calls=[SimpleNamespace(
+                id=f"call_{self.chamadas}",
+                type="function",
+                function=SimpleNamespace(name=funcao, arguments=content)
+            )])
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(
+                index=0,
+                finish_reason="tool_calls" if kwargs.get("tools") else "stop",
+                message=message
+            )],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens
+            )
+        )
+
+    def _corpo_resposta(self, model, messages, **kwargs):
+        """Resposta de chat em JSON, como no arquivo de saída da Batch API (sem latência)."""
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        content = self.responder(prompt)
+        prompt_tokens = _estimar_tokens(prompt)
+        completion_tokens = _estimar_tokens(content)
+
+        message = {"role": "assistant", "content": content}
+        if kwargs.get("tools"):
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": kwargs["tools"][0]["function"]["name"], "arguments": content}
+            }]}
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if kwargs.get("tools") else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }
@@ -0,0 +1,334 @@
+"""
+Fila de tarefas em segundo plano, persistida em SQLite (data/fila.db), sem
+broker externo.
+
+As rotas enfileiram com `enfileirar(tipo, payload)` e respondem na hora; os
+workers (threads no próprio processo do app ou processos de
+`worker_fila.py`) reservam as tarefas pendentes, executam o handler
+registrado com `@tarefa(tipo)` e gravam o resultado. A reserva é atômica
+(UPDATE ... RETURNING), então vários processos podem consumir a mesma fila.
+Tarefas que falham voltam para a fila com espera exponencial até
+`max_tentativas`; tarefas "executando" de um worker que morreu são
+devolvidas após `FILA_TIMEOUT` segundos (ou marcadas como erro, se já
+esgotaram as tentativas).
+
+Configuração por variáveis de ambiente:
+    FILA_PATH              arquivo SQLite (padrão: data/fila.db)
+    FILA_WORKERS           threads de worker dentro do app (padrão: 1; 0 = só workers externos),
+                           iniciadas por `iniciar_workers()` no processo que serve o app
+    FILA_TIMEOUT           segundos até uma tarefa "executando" ser considerada órfã (padrão: 600)
+"""
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import threading
+import time
+import traceback
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+HANDLERS = {}
+_execucao = threading.local()
+
+
+class ErroDefinitivo(Exception):
+    """Falha que se repetiria em qualquer nova tentativa: a tarefa vai direto para erro, sem retentativas."""
+
+
+def tarefa(tipo):
+    """Decorador que registra o handler de um tipo de tarefa: handler(payload) -> resultado (JSON)."""
+    def decorador(func):
+        HANDLERS[tipo] = func
+        return func
+    return decorador
+
+
+def tarefa_atual():
+    """
+    ID da tarefa que o worker desta thread está executando (None fora de um
+    handler). Serve para os handlers gravarem de forma idempotente: uma
+    retentativa encontra o que a execução anterior da mesma tarefa já gravou.
+    """
+    return getattr(_execucao, "tarefa_id", None)
+
+
+class FilaTarefas:
+    """
+    Args:
+        caminho (str): Caminho do arquivo .db
+        timeout (float): Segundos até uma tarefa em execução ser devolvida à fila
+    """
+
+    def __init__(self, caminho, timeout=600):
+        self.caminho = caminho
+        self.timeout = timeout
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with self._conexao() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tarefas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tipo TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    resultado TEXT,
+                    erro TEXT,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    max_tentativas INTEGER NOT NULL DEFAULT 3,
+                    worker TEXT,
+                    criada_em REAL NOT NULL,
+                    disponivel_em REAL NOT NULL,
+                    iniciada_em REAL,
+                    concluida_em REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_tarefas_status_disponivel ON tarefas (status, disponivel_em)")
+
+    def _conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enfileirar(self, tipo, payload, max_tentativas=3, unica=False):
+        """
+        Grava a tarefa como pendente e devolve o id. Com `unica`, não enfileira
+        se já há uma tarefa pendente ou em execução do mesmo tipo e payload, e
+        devolve o id dela.
+        """
+        agora = time.time()
+        payload = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        conn = self._conexao()
+        if not unica:
+            return conn.execute(
+                "INSERT INTO tarefas (tipo, payload, status, max_tentativas, criada_em, disponivel_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tipo, payload, PENDENTE, max_tentativas, agora, agora)
+            ).lastrowid
+
+        while True:
+            # INSERT ... WHERE NOT EXISTS em um único comando: dois processos não enfileiram a mesma tarefa
+            linha = conn.execute(
+                "INSERT INTO tarefas (tipo, payload, status, max_tentativas, criada_em, disponivel_em) "
+                "SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS ("
+                "    SELECT 1 FROM tarefas WHERE tipo = ? AND payload = ? AND status IN (?, ?)"
+                ") RETURNING id",
+                (tipo, payload, PENDENTE, max_tentativas, agora, agora, tipo, payload, PENDENTE, EXECUTANDO)
+            ).fetchone()
+            if linha is None:
+                linha = conn.execute(
+                    "SELECT id FROM tarefas WHERE tipo = ? AND payload = ? AND status IN (?, ?) "
+                    "ORDER BY id DESC LIMIT 1",
+                    (tipo, payload, PENDENTE, EXECUTANDO)
+                ).fetchone()
+            if linha is not None:  # None: a existente terminou entre os dois comandos
+                return linha[0]
+
+    def obter(self, tarefa_id):
+        linha = self._conexao().execute("SELECT * FROM tarefas WHERE id = ?", (tarefa_id,)).fetchone()
+        if linha is None:
+            return None
+        dados = dict(linha)
+        dados["payload"] = json.loads(dados["payload"])
+        dados["resultado"] = json.loads(dados["resultado"]) if dados["resultado"] else None
+        if dados["status"] == PENDENTE:
+            dados["posicao"] = self._conexao().execute(
+                "SELECT COUNT(*) FROM tarefas WHERE status = ? AND id <= ?", (PENDENTE, tarefa_id)
+            ).fetchone()[0]
+        return dados
+
+    def reservar(self, worker, tipos=None):
+        """Marca a próxima tarefa disponível como "executando" para `worker`; None se a fila está vazia."""
+        agora = time.time()
+        tipos = list(tipos or HANDLERS)
+        if not tipos:
+            return None
+        marcadores = ",".join("?" * len(tipos))
+        linha = self._conexao().execute(f"""
+            UPDATE tarefas
+               SET status = ?, worker = ?, iniciada_em = ?, tentativas = tentativas + 1
+             WHERE id = (
+                   SELECT id FROM tarefas
+                    WHERE status = ? AND disponivel_em <= ? AND tipo IN ({marcadores})
+                    ORDER BY disponivel_em, id LIMIT 1
+             ) AND status = ?
+            RETURNING id, tipo, payload, tentativas, max_tentativas
+        """, (EXECUTANDO, worker, agora, PENDENTE, agora, *tipos, PENDENTE)).fetchone()
+        if linha is None:
+            return None
+        dados = dict(linha)
+        dados["payload"] = json.loads(dados["payload"])
+        return dados
+
+    def concluir(self, tarefa_id, resultado):
+        self._conexao().execute(
+            "UPDATE tarefas SET status = ?, resultado = ?, erro = NULL, concluida_em = ? WHERE id = ?",
+            (CONCLUIDA, json.dumps(resultado, ensure_ascii=False), time.time(), tarefa_id)
+        )
+
+    def falhar(self, tarefa_id, erro, tentativas, max_tentativas):
+        """Devolve à fila com espera exponencial, ou marca como erro na última tentativa."""
+        agora = time.time()
+        if tentativas < max_tentativas:
+            self._conexao().execute(
+                "UPDATE tarefas SET status = ?, erro = ?, worker = NULL, disponivel_em = ? WHERE id = ?",
+                (PENDENTE, erro, agora + 2 ** tentativas, tarefa_id)
+            )
+        else:
+            self._conexao().execute(
+                "UPDATE tarefas SET status = ?, erro = ?, concluida_em = ? WHERE id = ?",
+                (ERRO, erro, agora, tarefa_id)
+            )
+
+    def recuperar_orfas(self):
+        """
+        Devolve à fila as tarefas "executando" há mais de `timeout` segundos
+        (worker morto), com a mesma regra de `falhar`: as que já esgotaram as
+        tentativas (ex.: um PDF que derruba o worker) são marcadas como erro.
+        """
+        agora = time.time()
+        limite = agora - self.timeout
+        conn = self._conexao()
+        esgotadas = conn.execute(
+            "UPDATE tarefas SET status = ?, erro = ?, concluida_em = ? "
+            "WHERE status = ? AND iniciada_em < ? AND tentativas >= max_tentativas",
+            (ERRO, "worker interrompido durante a execução", agora, EXECUTANDO, limite)
+        ).rowcount
+        devolvidas = conn.execute(
+            "UPDATE tarefas SET status = ?, worker = NULL WHERE status = ? AND iniciada_em < ?",
+            (PENDENTE, EXECUTANDO, limite)
+        ).rowcount
+        return devolvidas + esgotadas
+
+    def metricas(self, ultimas=500):
+        """Profundidade por status e latências (espera na fila e execução) das últimas tarefas concluídas."""
+        conn = self._conexao()
+        profundidade = dict(conn.execute("SELECT status, COUNT(*) FROM tarefas GROUP BY status").fetchall())
+        mais_antiga = conn.execute(
+            "SELECT MIN(criada_em) FROM tarefas WHERE status = ?", (PENDENTE,)
+        ).fetchone()[0]
+        linhas = conn.execute(
+            "SELECT criada_em, iniciada_em, concluida_em FROM tarefas "
+            "WHERE status = ? ORDER BY concluida_em DESC LIMIT ?", (CONCLUIDA, ultimas)
+        ).fetchall()
+
+        def percentis(valores):
+            if not valores:
+                return None
+            valores = sorted(valores)
+            return {
+                "p50": round(statistics.median(valores), 3),
+                "p95": round(valores[min(len(valores) - 1, int(len(valores) * 0.95))], 3),
+                "max": round(valores[-1], 3)
+            }
+
+        return {
+            "profundidade": {s: profundidade.get(s, 0) for s in (PENDENTE, EXECUTANDO, CONCLUIDA, ERRO)},
+            "espera_mais_antiga_s": round(time.time() - mais_antiga, 3) if mais_antiga else 0,
+            "espera_s": percentis([l["iniciada_em"] - l["criada_em"] for l in linhas]),
+            "execucao_s": percentis([l["concluida_em"] - l["iniciada_em"] for l in linhas]),
+            "total_s": percentis([l["concluida_em"] - l["criada_em"] for l in linhas])
+        }
+
+
+class Worker:
+    """
+    Consome a fila até `parar` ser sinalizado.
+
+    Args:
+        fila (FilaTarefas): Fila consumida
+        nome (str): Identificação gravada nas tarefas reservadas
+        intervalo (float): Espera entre consultas quando a fila está vazia
+    """
+
+    def __init__(self, fila, nome=None, intervalo=0.5):
+        self.fila = fila
+        self.nome = nome or f"{socket.gethostname()}:{os.getpid()}"
+        self.intervalo = intervalo
+
+    def executar_uma(self):
+        """Executa a próxima tarefa disponível; devolve False se a fila está vazia."""
+        reservada = self.fila.reservar(self.nome)
+        if reservada is None:
+            return False
+
+        _execucao.tarefa_id = reservada["id"]
+        try:
+            resultado = HANDLERS[reservada["tipo"]](reservada["payload"])
+        except ErroDefinitivo as e:
+            print(f"❌ Tarefa {reservada['id']} ({reservada['tipo']}) falhou sem retentativa: {e}")
+            self.fila.falhar(reservada["id"], str(e), reservada["max_tentativas"], reservada["max_tentativas"])
+        except Exception as e:
+            print(f"❌ Tarefa {reservada['id']} ({reservada['tipo']}) falhou: {e}")
+            traceback.print_exc()
+            self.fila.falhar(reservada["id"], str(e), reservada["tentativas"], reservada["max_tentativas"])
+        else:
+            self.fila.concluir(reservada["id"], resultado)
+        finally:
+            _execucao.tarefa_id = None
+        return True
+
+    def executar(self, parar=None):
+        parar = parar or threading.Event()
+        ultima_recuperacao = 0
+        while not parar.is_set():
+            if time.time() - ultima_recuperacao > 60:
+                self.fila.recuperar_orfas()
+                ultima_recuperacao = time.time()
+            try:
+                ocupado = self.executar_uma()
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ Fila indisponível: {e}")
+                ocupado = False
+            if not ocupado:
+                parar.wait(self.intervalo)
+
+
+def _fila_padrao():
+    caminho = os.environ.get("FILA_PATH", os.path.join(basedir, "data", "fila.db"))
+    return FilaTarefas(caminho, timeout=float(os.environ.get("FILA_TIMEOUT", 600)))
+
+
+_fila = _fila_padrao()
+_threads = []
+
+
+def obter_fila():
+    return _fila
+
+
+def enfileirar(tipo, payload, max_tentativas=3, unica=False):
+    return _fila.enfileirar(tipo, payload, max_tentativas=max_tentativas, unica=unica)
+
+
+def obter_tarefa(tarefa_id):
+    return _fila.obter(tarefa_id)
+
+
+def metricas_fila():
+    dados = _fila.metricas()
+    dados["workers_embutidos"] = sum(t.is_alive() for t in _threads)
+    return dados
+
+
+def iniciar_workers(quantidade=None):
+    """Inicia `quantidade` threads de worker no processo atual (padrão: FILA_WORKERS)."""
+    if quantidade is None:
+        quantidade = int(os.environ.get("FILA_WORKERS", 1))
+    for i in range(quantidade - sum(t.is_alive() for t in _threads)):
+        nome = f"{socket.gethostname()}:{os.getpid()}:thread-{len(_threads) + i}"
+        thread = threading.Thread(target=Worker(_fila, nome=nome).executar, daemon=True, name="fila-worker")
+        thread.start()
+        _threads.append(thread)
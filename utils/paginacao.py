@@ -0,0 +1,135 @@
+"""
+Paginação, busca e ordenação no servidor para as APIs de listagem.
+
+O modo é escolhido pelos parâmetros da requisição:
+
+- DataTables (server-side processing), quando há `draw`: lê start/length,
+  search[value], columns[i][search][value] e order[i][column|dir] e devolve
+  {draw, recordsTotal, recordsFiltered, data}. A página é obtida em duas
+  etapas ("deferred join"): primeiro só as chaves da página (ORDER BY +
+  LIMIT/OFFSET sobre a chave), depois as colunas completas apenas dessas
+  linhas.
+- Keyset, quando há `limite`: percorre em ordem da chave indexada a partir
+  do cursor `apos` (WHERE chave > :apos, sem OFFSET) e devolve
+  {dados, proximo}; `proximo` é o cursor da página seguinte ou null.
+- Sem nenhum dos dois, a lista completa, como antes.
+"""
+from flask import jsonify
+from sqlalchemy import func, or_
+
+MAX_POR_PAGINA = 500
+
+
+class Paginador:
+    """
+    Args:
+        chave: Coluna única e indexada (ex.: MatchResult.id), usada no
+            keyset e como desempate da ordenação
+        colunas (dict): Campo do JSON -> expressão SQL, para ordenar pelas
+            colunas do DataTables (columns[i][data])
+        busca (list): Expressões pesquisadas pela busca global (LIKE)
+        filtros (dict): Campo do JSON -> expressão comparada por igualdade
+            com a busca por coluna do DataTables
+    """
+
+    def __init__(self, chave, colunas, busca=(), filtros=None):
+        self.chave = chave
+        self.colunas = colunas
+        self.busca = list(busca)
+        self.filtros = filtros or {}
+
+    def responder(self, query, args, serializar):
+        """
+        Args:
+            query: Consulta completa (joins e filtros), sem paginação
+            args: request.args
+            serializar (callable): Linha da consulta -> dict
+        """
+        if "draw" in args:
+            return jsonify(self.datatables(query, args, serializar))
+        if "limite" in args:
+            return jsonify(self.keyset(query, args, serializar))
+        return jsonify([serializar(r) for r in query])
+
+    def _contar(self, query):
+        return query.with_entities(func.count(self.chave)).order_by(None).scalar()
+
+    def _colunas_datatables(self, args):
+        """Lista de (campo, busca da coluna) na ordem de columns[i]."""
+        colunas = []
+        while f"columns[{len(colunas)}][data]" in args:
+            i = len(colunas)
+            colunas.append((args.get(f"columns[{i}][data]"), args.get(f"columns[{i}][search][value]", "").strip()))
+        return colunas
+
+    def _filtrar(self, query, args, colunas):
+        termo = args.get("search[value]", "").strip()
+        if termo and self.busca:
+            query = query.filter(or_(*[
+                func.coalesce(expr, "").icontains(termo, autoescape=True) for expr in self.busca
+            ]))
+        for campo, valor in colunas:
+            if valor and campo in self.filtros:
+                query = query.filter(self.filtros[campo] == valor)
+        return query
+
+    def _ordenacao(self, args, colunas):
+        ordem = []
+        i = 0
+        while f"order[{i}][column]" in args:
+            indice = args.get(f"order[{i}][column]", type=int)
+            campo = colunas[indice][0] if indice is not None and 0 <= indice < len(colunas) else None
+            if campo in self.colunas:
+                expr = self.colunas[campo]
+                ordem.append(expr.desc() if args.get(f"order[{i}][dir]") == "desc" else expr.asc())
+            i += 1
+        return ordem + [self.chave.asc()]
+
+    def _hidratar(self, query, chaves, serializar):
+        """Colunas completas só das linhas da página, na ordem das chaves."""
+        chaves = list(dict.fromkeys(chaves))
+        if not chaves:
+            return []
+        linhas = query.add_columns(self.chave.label("_chave"))\
+            .filter(self.chave.in_(chaves)).order_by(None).all()
+        por_chave = {}
+        for linha in linhas:
+            por_chave.setdefault(linha._chave, linha)
+        return [serializar(por_chave[c]) for c in chaves if c in por_chave]
+
+    def datatables(self, query, args, serializar):
+        start = max(args.get("start", 0, type=int), 0)
+        length = args.get("length", 25, type=int)
+        if length < 0 or length > MAX_POR_PAGINA:  # -1 = "todos" no DataTables
+            length = MAX_POR_PAGINA
+
+        colunas = self._colunas_datatables(args)
+        filtrada = self._filtrar(query, args, colunas)
+        total = self._contar(query)
+        filtrados = total if filtrada is query else self._contar(filtrada)
+
+        chaves = [
+            c for (c,) in filtrada.with_entities(self.chave).order_by(None)
+            .order_by(*self._ordenacao(args, colunas)).offset(start).limit(length)
+        ]
+        return {
+            "draw": args.get("draw", 0, type=int),
+            "recordsTotal": total,
+            "recordsFiltered": filtrados,
+            "data": self._hidratar(query, chaves, serializar)
+        }
+
+    def keyset(self, query, args, serializar):
+        limite = min(max(args.get("limite", 50, type=int), 1), MAX_POR_PAGINA)
+        apos = args.get("apos")
+
+        chaves_query = query.with_entities(self.chave).order_by(None).order_by(self.chave.asc())
+        if apos:
+            chaves_query = chaves_query.filter(self.chave > apos)
+        chaves = [c for (c,) in chaves_query.limit(limite + 1)]
+
+        proximo = str(chaves[limite - 1]) if len(chaves) > limite else None
+        return {
+            "dados": self._hidratar(query, chaves[:limite], serializar),
+            "proximo": proximo
+        }
@@ -1,13 +1,96 @@
 import speech_recognition as sr
+from concurrent.futures import ThreadPoolExecutor
+import io
+import numpy as np
+from utils.stt_backends import transcrever_com_fallback
 
-def listen(audio_path):
+# Respostas longas são cortadas em pausas (silêncio) e os trechos são
+# reconhecidos em paralelo; a API do Google também recusa áudios longos.
+MAX_SEGUNDOS_SEGMENTO = 25
+JANELA_MS = 30
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="stt")
+
+
+def _abrir(audio):
+    """Aceita caminho, bytes ou objeto file-like (ex.: request.files[...].stream)."""
+    if isinstance(audio, (bytes, bytearray)):
+        return io.BytesIO(audio)
+    return audio
+
+
+def _energias(raw, sample_rate, sample_width):
+    """RMS de cada janela de JANELA_MS milissegundos do áudio PCM de 16 bits."""
+    amostras = np.frombuffer(raw[:len(raw) - len(raw) % sample_width], dtype="<i2").astype(np.float64)
+    por_janela = max(1, int(sample_rate * JANELA_MS / 1000))
+
+    completas = len(amostras) // por_janela * por_janela
+    quadrados = np.square(amostras)
+    energias = np.sqrt(quadrados[:completas].reshape(-1, por_janela).mean(axis=1))
+    if completas < len(amostras):  # última janela, mais curta
+        energias = np.append(energias, np.sqrt(quadrados[completas:].mean()))
+    return energias, por_janela
+
+
+def segmentar_por_silencio(audio, max_segundos=MAX_SEGUNDOS_SEGMENTO):
+    """
+    Divide um AudioData em trechos de até `max_segundos`, cortando na janela
+    mais silenciosa dentro dos últimos 40% de cada trecho, para não partir
+    palavras ao meio.
+    """
+    # A maioria das respostas cabe em um trecho: nem calcula as energias
+    if len(audio.frame_data) / (audio.sample_rate * audio.sample_width) <= max_segundos:
+        return [audio]
+
+    raw = audio.get_raw_data(convert_width=2)
+    energias, por_janela = _energias(raw, audio.sample_rate, 2)
+    janelas_max = max(1, int(max_segundos * 1000 / JANELA_MS))
+
+    if len(energias) <= janelas_max:
+        return [audio]
+
+    cortes = [0]
+    while len(energias) - cortes[-1] > janelas_max:
+        inicio_busca = cortes[-1] + int(janelas_max * 0.6)
+        fim_busca = cortes[-1] + janelas_max
+        corte = inicio_busca + int(np.argmin(energias[inicio_busca:fim_busca]))
+        cortes.append(corte)
+    cortes.append(len(energias))
+
+    bytes_por_janela = por_janela * 2
+    return [
+        sr.AudioData(raw[a * bytes_por_janela:b * bytes_por_janela], audio.sample_rate, 2)
+        for a, b in zip(cortes, cortes[1:])
+    ]
+
+
+def listen(audio, segmentar=True, max_segundos=MAX_SEGUNDOS_SEGMENTO, backends=None):
+    """
+    Transcreve o áudio WAV/AIFF/FLAC direto da memória, sem gravar em disco.
+
+    Args:
+        audio: Caminho, bytes ou objeto file-like com o áudio
+        segmentar (bool): Divide respostas longas nas pausas e reconhece os
+            trechos em paralelo
+        max_segundos (int): Duração máxima de cada trecho
+        backends (list): Cadeia de backends (padrão: variável STT_BACKENDS,
+            ver utils/stt_backends.py)
+    """
     r = sr.Recognizer()
-    with sr.AudioFile(audio_path) as source:
-        audio = r.record(source)
+    with sr.AudioFile(_abrir(audio)) as source:
+        audio_data = r.record(source)
+
+    segmentos = segmentar_por_silencio(audio_data, max_segundos) if segmentar else [audio_data]
+
+    def reconhecer(segmento):
+        return transcrever_com_fallback(segmento, backends)
 
     try:
-        return r.recognize_google(audio, language="pt-BR")
-    except sr.UnknownValueError:
-        return "[Não entendi o que foi dito]"
+        if len(segmentos) == 1:
+            texto = reconhecer(segmentos[0])
+        else:
+            texto = " ".join(t for t in _executor.map(reconhecer, segmentos) if t)
     except sr.RequestError:
         return "[Erro ao acessar serviço de transcrição]"
+
+    return texto or "[Não entendi o que foi dito]"
@@ -0,0 +1,195 @@
+"""
+Backends de reconhecimento de fala (speech-to-text) plugáveis.
+
+Cada backend recebe um `speech_recognition.AudioData` e devolve o texto
+reconhecido ("" quando não há fala inteligível). A cadeia usada por
+`utils.stt.listen` vem da variável STT_BACKENDS, em ordem de preferência,
+e cai para o próximo backend em caso de erro ou de estouro de STT_TIMEOUT:
+
+    STT_BACKENDS=vosk,google      # local primeiro, Google como reserva
+    STT_TIMEOUT=10                # segundos por backend
+    STT_WORKERS=4                 # transcrições simultâneas por backend
+    STT_FALHA_ESPERA=60           # segundos até tentar de novo carregar um backend que falhou
+
+Backends disponíveis:
+    google          API web do Google (padrão, exige rede)
+    vosk            Modelo Kaldi offline em CPU (pip install vosk; VOSK_MODEL_PATH)
+    faster_whisper  Whisper quantizado em CPU (pip install faster-whisper; WHISPER_MODEL)
+    fake            Determinístico, sem rede nem modelo (testes e benchmarks)
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import speech_recognition as sr
+
+_registro = {}
+_instancias = {}
+_lock = threading.Lock()  # só para os dicionários; a carga de cada backend usa o lock dele
+_locks_backend = {}
+_falhas_carga = {}  # nome -> (instante, erro) da última carga que falhou
+# Um pool por backend: chamadas presas em um backend lento (que seguem ocupando a
+# thread após o timeout) não atrasam as submissões aos backends de reserva
+_executores = {}
+
+
+def registrar_backend(nome):
+    """Decorador que registra uma classe de backend sob `nome`."""
+    def decorador(cls):
+        _registro[nome] = cls
+        cls.nome = nome
+        return cls
+    return decorador
+
+
+def backends_disponiveis():
+    return sorted(_registro)
+
+
+def obter_backend(nome):
+    """
+    Instância única (por processo) do backend, para carregar modelos uma vez.
+    A carga segura só o lock do próprio backend; se falhar, novas tentativas
+    falham direto por STT_FALHA_ESPERA segundos, sem recarregar o modelo.
+    """
+    if nome not in _registro:
+        raise ValueError(f"Backend de STT desconhecido: {nome} (disponíveis: {', '.join(backends_disponiveis())})")
+    with _lock:
+        instancia = _instancias.get(nome)
+        lock = _locks_backend.setdefault(nome, threading.Lock())
+    if instancia is not None:
+        return instancia
+
+    with lock:
+        if nome in _instancias:
+            return _instancias[nome]
+        falha = _falhas_carga.get(nome)
+        espera = float(os.environ.get("STT_FALHA_ESPERA", 60))
+        if falha is not None and time.monotonic() - falha[0] < espera:
+            raise RuntimeError(f"carga falhou há {time.monotonic() - falha[0]:.0f}s ({falha[1]})")
+        try:
+            instancia = _registro[nome]()
+        except Exception as e:
+            _falhas_carga[nome] = (time.monotonic(), e)
+            raise
+        _falhas_carga.pop(nome, None)
+        with _lock:
+            _instancias[nome] = instancia
+        return instancia
+
+
+def _executor(nome):
+    with _lock:
+        if nome not in _executores:
+            _executores[nome] = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("STT_WORKERS", 4)), thread_name_prefix=f"stt-{nome}"
+            )
+        return _executores[nome]
+
+
+class BackendSTT:
+    nome = None
+
+    def transcrever(self, audio):
+        raise NotImplementedError
+
+
+@registrar_backend("google")
+class GoogleBackend(BackendSTT):
+    def __init__(self, language="pt-BR"):
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def transcrever(self, audio):
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+
+@registrar_backend("vosk")
+class VoskBackend(BackendSTT):
+    def __init__(self, model_path=None):
+        from vosk import Model, SetLogLevel
+
+        SetLogLevel(-1)
+        self.model = Model(model_path or os.environ.get("VOSK_MODEL_PATH", "model"))
+
+    def transcrever(self, audio):
+        from vosk import KaldiRecognizer
+
+        rec = KaldiRecognizer(self.model, 16000)
+        rec.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+        return json.loads(rec.FinalResult()).get("text", "")
+
+
+@registrar_backend("faster_whisper")
+class FasterWhisperBackend(BackendSTT):
+    def __init__(self, model_size=None, language="pt"):
+        from faster_whisper import WhisperModel
+
+        self.language = language
+        self.model = WhisperModel(
+            model_size or os.environ.get("WHISPER_MODEL", "base"),
+            device="cpu",
+            compute_type="int8"
+        )
+
+    def transcrever(self, audio):
+        wav = io.BytesIO(audio.get_wav_data(convert_rate=16000, convert_width=2))
+        segments, _ = self.model.transcribe(wav, language=self.language)
+        return " ".join(s.text.strip() for s in segments).strip()
+
+
+@registrar_backend("fake")
+class FakeBackend(BackendSTT):
+    """
+    Devolve um texto derivado do hash do áudio após uma latência
+    proporcional à duração (STT_FAKE_RTF, padrão 0.1x tempo real).
+    """
+
+    def __init__(self, rtf=None):
+        self.rtf = float(rtf if rtf is not None else os.environ.get("STT_FAKE_RTF", 0.1))
+
+    def transcrever(self, audio):
+        raw = audio.get_raw_data()
+        duracao = len(raw) / (audio.sample_rate * audio.sample_width)
+        time.sleep(duracao * self.rtf)
+        digest = hashlib.sha1(raw).hexdigest()[:8]
+        return f"resposta simulada {digest} com {duracao:.1f} segundos"
+
+
+def _transcrever(nome, audio):
+    # A carga do modelo roda no pool do backend, dentro do STT_TIMEOUT da chamada
+    return obter_backend(nome).transcrever(audio)
+
+
+def cadeia_configurada():
+    nomes = os.environ.get("STT_BACKENDS", "google")
+    return [n.strip() for n in nomes.split(",") if n.strip()]
+
+
+def transcrever_com_fallback(audio, backends=None, timeout=None):
+    """
+    Tenta cada backend em ordem. Erros (incluindo modelo/pacote ausente) e
+    estouro de tempo passam para o próximo; se todos falharem, levanta
+    `sr.RequestError` com o último erro.
+    """
+    backends = backends or cadeia_configurada()
+    timeout = float(timeout if timeout is not None else os.environ.get("STT_TIMEOUT", 10))
+
+    ultimo_erro = None
+    for nome in backends:
+        try:
+            return _executor(nome).submit(_transcrever, nome, audio).result(timeout=timeout)
+        except TimeoutError:
+            ultimo_erro = f"{nome}: tempo esgotado após {timeout:g}s"
+        except Exception as e:
+            ultimo_erro = f"{nome}: {e}"
+        print(f"Falha no backend de STT {ultimo_erro}")
+
+    raise sr.RequestError(ultimo_erro)
@@ -1,18 +1,206 @@
 from gtts import gTTS
+from gtts.tts import gTTSError
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+import hashlib
+import json
 import os
+import re
+import threading
 import time
 
-def speak(text):
-    os.makedirs("static/audio", exist_ok=True)
-    
-    # Gerar um nome de arquivo único com timestamp
-    timestamp = int(time.time())
-    filename = f"tts_output_{timestamp}.mp3"
-    
-    audio_file = os.path.join("static/audio", filename)
-    
-    tts = gTTS(text=text, lang='pt-br', slow=False)
-    tts.save(audio_file)
-    
-    # Retornar o caminho com o timestamp para evitar cache
-    return f"/static/audio/{filename}"
+# Áudios ficam em cache endereçado por conteúdo: o mesmo trecho (saudação,
+# perguntas padrão) é sintetizado uma única vez e reaproveitado.
+AUDIO_DIR = os.path.join("static", "audio")
+CACHE_DIR = os.path.join(AUDIO_DIR, "cache")
+CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_MB", 200)) * 1024 * 1024
+INTERVALO_GC = 50
+
+CHAVE_VALIDA = re.compile(r"^[0-9a-f]{32}$")
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("TTS_WORKERS", 4)), thread_name_prefix="tts")
+_pendentes = {}
+_lock = threading.Lock()
+_sinteses = 0
+
+
+class AudioIndisponivel(Exception):
+    """Trecho desconhecido ou cuja síntese falhou/estourou o tempo."""
+
+
+def dividir_sentencas(text, min_chars=25):
+    """
+    Divide o texto em frases para síntese independente. Frases muito curtas
+    são agrupadas com a seguinte para evitar trechos de áudio picotados.
+    """
+    frases = [f.strip() for f in re.split(r"(?<=[.!?;:])\s+", text.strip()) if f.strip()]
+
+    trechos = []
+    atual = ""
+    for frase in frases:
+        if len(atual) >= min_chars:
+            trechos.append(atual)
+            atual = frase
+        else:
+            atual = f"{atual} {frase}".strip()
+
+    if atual:
+        if trechos and len(atual) < min_chars:
+            trechos[-1] = f"{trechos[-1]} {atual}"
+        else:
+            trechos.append(atual)
+    return trechos
+
+
+def chave_audio(texto, lang="pt-br"):
+    normalizado = " ".join(texto.split())
+    return hashlib.sha256(f"{lang}|{normalizado}".encode("utf-8")).hexdigest()[:32]
+
+
+def _caminho(chave, ext="mp3"):
+    return os.path.join(CACHE_DIR, f"{chave}.{ext}")
+
+
+def _registrar(texto, lang):
+    """Grava o texto ao lado do áudio para que qualquer worker possa sintetizá-lo."""
+    chave = chave_audio(texto, lang)
+    meta = _caminho(chave, "json")
+    if not os.path.exists(meta):
+        tmp = f"{meta}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"texto": texto, "lang": lang}, f, ensure_ascii=False)
+        os.replace(tmp, meta)
+    return chave
+
+
+def _sintetizar(chave, texto, lang):
+    global _sinteses
+    destino = _caminho(chave)
+    tmp = f"{destino}.{threading.get_ident()}.tmp"
+
+    tts = gTTS(text=texto, lang=lang, slow=False)
+    tts.save(tmp)
+    os.replace(tmp, destino)
+
+    with _lock:
+        _sinteses += 1
+        executar_gc = _sinteses % INTERVALO_GC == 0
+    if executar_gc:
+        coletar_lixo()
+    return destino
+
+
+def _agendar(texto, lang):
+    chave = _registrar(texto, lang)
+    if os.path.exists(_caminho(chave)):
+        os.utime(_caminho(chave))
+        return chave
+
+    with _lock:
+        if chave not in _pendentes:
+            futuro = _executor.submit(_sintetizar, chave, texto, lang)
+            _pendentes[chave] = futuro
+            futuro.add_done_callback(lambda _: _pendentes.pop(chave, None))
+    return chave
+
+
+def audio_registrado(chave):
+    """True se o trecho já foi sintetizado ou tem o texto registrado para síntese."""
+    return bool(CHAVE_VALIDA.match(chave or "")) and (
+        os.path.exists(_caminho(chave)) or os.path.exists(_caminho(chave, "json"))
+    )
+
+
+def obter_audio(chave, timeout=30):
+    """
+    Caminho absoluto do MP3 de um trecho, aguardando a síntese em andamento
+    ou sintetizando-o a partir do texto registrado. None se a chave for
+    desconhecida; AudioIndisponivel se a síntese falhar ou passar de `timeout`.
+    """
+    if not CHAVE_VALIDA.match(chave or ""):
+        return None
+
+    destino = _caminho(chave)
+    try:
+        if not os.path.exists(destino):
+            futuro = _pendentes.get(chave)
+            if futuro is not None:
+                futuro.result(timeout=timeout)
+            else:
+                meta = _caminho(chave, "json")
+                if not os.path.exists(meta):
+                    return None
+                with open(meta, encoding="utf-8") as f:
+                    dados = json.load(f)
+                _sintetizar(chave, dados["texto"], dados["lang"])
+        os.utime(destino)
+    except (gTTSError, FuturesTimeout, OSError) as e:
+        # OSError também cobre o MP3 removido pela coleta entre a síntese e a leitura
+        raise AudioIndisponivel(f"{chave}: {e or type(e).__name__}") from e
+    return os.path.abspath(destino)
+
+
+def ler_em_sequencia(chaves):
+    """
+    Gera os bytes dos trechos em ordem, cada um assim que fica pronto. Um
+    trecho ausente ou que falhou interrompe o stream com AudioIndisponivel,
+    em vez de ser pulado (o que entregaria um áudio incompleto).
+    """
+    for chave in chaves:
+        caminho = obter_audio(chave)
+        if caminho is None:
+            raise AudioIndisponivel(f"{chave}: trecho desconhecido")
+        with open(caminho, "rb") as f:
+            yield f.read()
+
+
+def speak(text, lang="pt-br"):
+    """
+    Divide o texto em frases e agenda a síntese concorrente de todas elas,
+    sem esperar a conclusão. Retorna as chaves dos trechos, em ordem; o
+    áudio é servido por `obter_audio`/`ler_em_sequencia` à medida que cada
+    trecho fica pronto.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return [_agendar(trecho, lang) for trecho in dividir_sentencas(text)]
+
+
+def coletar_lixo(max_bytes=None):
+    """
+    Mantém o diretório de áudio abaixo da cota, removendo primeiro os
+    trechos usados há mais tempo (o mtime é atualizado a cada acerto).
+    Também remove os arquivos tts_output_*.mp3 do formato antigo.
+    """
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    if os.path.isdir(AUDIO_DIR):
+        for nome in os.listdir(AUDIO_DIR):
+            if nome.startswith("tts_output_") and nome.endswith(".mp3"):
+                os.remove(os.path.join(AUDIO_DIR, nome))
+
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+
+    arquivos = []
+    limite_orfaos = time.time() - 24 * 3600
+    for entrada in os.scandir(CACHE_DIR):
+        stat = entrada.stat()
+        if entrada.name.endswith(".mp3"):
+            arquivos.append((stat.st_mtime, stat.st_size, entrada.name[:-4]))
+        elif entrada.name.endswith(".json") and stat.st_mtime < limite_orfaos \
+                and not os.path.exists(_caminho(entrada.name[:-5])):
+            # Texto registrado cujo áudio nunca chegou a ser pedido
+            os.remove(entrada.path)
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    removidos = 0
+    for _, tamanho, chave in sorted(arquivos):
+        if total <= max_bytes:
+            break
+        for ext in ("mp3", "json"):
+            try:
+                os.remove(_caminho(chave, ext))
+            except FileNotFoundError:
+                pass
+        total -= tamanho
+        removidos += 1
+    return removidos
@@ -0,0 +1,168 @@
+"""
+Armazenamento dos currículos enviados, endereçado por conteúdo.
+
+Cada arquivo é gravado uma única vez em
+`uploads/<sha[:2]>/<sha[2:4]>/<sha>.pdf` e registrado em `ArquivoUpload`;
+envios repetidos do mesmo PDF (por qualquer candidato, com qualquer nome)
+apontam para o mesmo blob, e o texto extraído fica na própria linha para
+ser reaproveitado.
+
+Retenção (variáveis de ambiente):
+    UPLOADS_MAX_MB           espaço máximo ocupado pelos blobs (padrão: 500)
+    UPLOADS_RETENCAO_DIAS    blobs sem uso há mais dias que isso são apagados (padrão: 30)
+
+`coletar()` apaga do disco os blobs expirados e, acima da cota, os menos
+usados recentemente. A linha de `ArquivoUpload` (com o texto) é mantida e
+marcada em `removido_em`, então um reenvio do mesmo arquivo ainda reaproveita
+a extração.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from db.database import db, ArquivoUpload
+
+MAX_MB = float(os.environ.get("UPLOADS_MAX_MB", 500))
+RETENCAO_DIAS = float(os.environ.get("UPLOADS_RETENCAO_DIAS", 30))
+TAMANHO_BLOCO = 64 * 1024
+
+
+class ArmazenamentoUploads:
+    """
+    Args:
+        raiz (str): Pasta base (app.config["UPLOAD_FOLDER"])
+    """
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self.temporaria = os.path.join(raiz, "tmp")
+        os.makedirs(self.temporaria, exist_ok=True)
+
+    def caminho(self, sha256):
+        return os.path.join(self.raiz, sha256[:2], sha256[2:4], f"{sha256}.pdf")
+
+    def salvar(self, arquivo):
+        """
+        Grava o stream `arquivo` (ex.: FileStorage do Flask) calculando o
+        SHA-256 durante a cópia. Devolve (sha256, tamanho); se o blob já
+        existe, a cópia temporária é descartada.
+        """
+        digest = hashlib.sha256()
+        tamanho = 0
+        fd, temporario = tempfile.mkstemp(dir=self.temporaria, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                while True:
+                    bloco = arquivo.read(TAMANHO_BLOCO)
+                    if not bloco:
+                        break
+                    digest.update(bloco)
+                    destino.write(bloco)
+                    tamanho += len(bloco)
+
+            sha256 = digest.hexdigest()
+            final = self.caminho(sha256)
+            if os.path.exists(final):
+                os.remove(temporario)
+            else:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.replace(temporario, final)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        return sha256, tamanho
+
+    def remover(self, sha256):
+        try:
+            os.remove(self.caminho(sha256))
+        except FileNotFoundError:
+            pass
+
+    def limpar_temporarios(self, idade=3600):
+        """Remove cópias parciais de envios interrompidos."""
+        limite = time.time() - idade
+        for nome in os.listdir(self.temporaria):
+            caminho = os.path.join(self.temporaria, nome)
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+
+
+def registrar_upload(armazenamento, arquivo):
+    """Salva o arquivo (FileStorage) e cria ou atualiza sua linha em ArquivoUpload, com commit."""
+    sha256, tamanho = armazenamento.salvar(arquivo.stream)
+
+    for tentativa in range(2):
+        agora = datetime.utcnow()
+        blob = ArquivoUpload.query.get(sha256)
+        if blob is None:
+            blob = ArquivoUpload(sha256=sha256, tamanho=tamanho, nome_original=arquivo.filename,
+                                 criado_em=agora, ultimo_uso_em=agora)
+            db.session.add(blob)
+        else:
+            blob.ultimo_uso_em = agora
+            blob.removido_em = None  # o arquivo voltou ao disco
+        try:
+            db.session.commit()
+            return blob
+        except IntegrityError:
+            # Outra requisição registrou o mesmo arquivo ao mesmo tempo; na segunda volta ele já existe
+            db.session.rollback()
+            if tentativa:
+                raise
+
+
+def espaco_ocupado():
+    return db.session.query(db.func.coalesce(db.func.sum(ArquivoUpload.tamanho), 0))\
+        .filter(ArquivoUpload.removido_em.is_(None)).scalar()
+
+
+def precisa_coletar(max_mb=None):
+    return espaco_ocupado() > (max_mb or MAX_MB) * 1024 * 1024
+
+
+def coletar(armazenamento, max_mb=None, retencao_dias=None):
+    """
+    Aplica a política de retenção e devolve {"removidos", "bytes_liberados"}.
+    Blobs usados pela última vez há mais de `retencao_dias` saem primeiro;
+    depois, enquanto o total passar de `max_mb`, os menos usados recentemente.
+    """
+    limite_bytes = (max_mb or MAX_MB) * 1024 * 1024
+    expiracao = datetime.utcnow() - timedelta(days=retencao_dias or RETENCAO_DIAS)
+
+    ativos = ArquivoUpload.query.filter(ArquivoUpload.removido_em.is_(None))\
+        .order_by(ArquivoUpload.ultimo_uso_em.asc()).all()
+    total = sum(b.tamanho or 0 for b in ativos)
+
+    removidos, liberados = 0, 0
+    agora = datetime.utcnow()
+    for blob in ativos:
+        if blob.ultimo_uso_em >= expiracao and total <= limite_bytes:
+            break
+        armazenamento.remover(blob.sha256)
+        blob.removido_em = agora
+        total -= blob.tamanho or 0
+        liberados += blob.tamanho or 0
+        removidos += 1
+
+    db.session.commit()
+    armazenamento.limpar_temporarios()
+    if removidos:
+        print(f"🧹 {removidos} currículos removidos do disco ({liberados / 1024 / 1024:.1f} MB liberados).")
+    return {"removidos": removidos, "bytes_liberados": liberados}
+
+
+_ultima_coleta = 0
+
+
+def coletar_se_necessario(armazenamento, intervalo=3600):
+    """Roda `coletar()` se a cota foi ultrapassada ou a cada `intervalo` segundos (por processo)."""
+    global _ultima_coleta
+    if precisa_coletar() or time.time() - _ultima_coleta > intervalo:
+        _ultima_coleta = time.time()
+        return coletar(armazenamento)
+    return None
@@ -0,0 +1,54 @@
+"""
+Worker da fila de tarefas (utils/fila.py) em processos separados do app.
+
+Com vários workers do gunicorn, rode o app com FILA_WORKERS=0 e consuma a
+fila aqui, para que a triagem do /tryit/apply não dispute CPU e memória
+com as requisições:
+
+    FILA_WORKERS=0 gunicorn app:app
+    python worker_fila.py --processos 2
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import threading
+
+
+def executar_worker(indice):
+    # O import do app registra os handlers das tarefas (não inicia threads embutidas)
+    from app import app  # noqa: F401
+    from utils.fila import Worker, obter_fila
+
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+
+    worker = Worker(obter_fila(), nome=f"worker_fila:{os.getpid()}:{indice}")
+    print(f"👷 Worker {worker.nome} aguardando tarefas...")
+    worker.executar(parar)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processos", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.processos == 1:
+        executar_worker(0)
+        return
+
+    processos = [multiprocessing.Process(target=executar_worker, args=(i,)) for i in range(args.processos)]
+    for p in processos:
+        p.start()
+    try:
+        for p in processos:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processos:
+            p.terminate()
+            p.join()
+
+
+if __name__ == "__main__":
+    main()